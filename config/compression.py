@@ -0,0 +1,69 @@
+"""
+レスポンスの圧縮処理
+
+Accept-Encoding に応じて brotli（brotli パッケージがインストールされている場合）または gzip で圧縮します。
+CompressionMiddleware、人気マンガリストのキャッシュ、静的スナップショットの出力で共通して使用します。
+"""
+import gzip
+import re
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# 圧縮しても効果が小さいため、これより短いレスポンスは圧縮しない
+MIN_COMPRESS_LENGTH = 200
+
+_ACCEPT_ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def supported_encodings():
+    """利用可能な圧縮形式（優先度の高い順）"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """
+    Accept-Encoding ヘッダーから使用する圧縮形式を選ぶ
+
+    Args:
+        accept_encoding (str): Accept-Encoding ヘッダーの値
+
+    Returns:
+        str or None: 'br' / 'gzip'（圧縮できない場合はNone）
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        match = _ACCEPT_ENCODING_RE.fullmatch(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2)) if match.group(2) is not None else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(content, encoding, best=False):
+    """
+    バイト列を圧縮する
+
+    Args:
+        content (bytes): 圧縮するバイト列
+        encoding (str): 'br' / 'gzip'
+        best (bool): Trueの場合は最大の圧縮率で圧縮する（キャッシュ・静的ファイル用）
+
+    Returns:
+        bytes: 圧縮したバイト列
+    """
+    if encoding == 'br':
+        return brotli.compress(content, quality=11 if best else 5)
+    if encoding == 'gzip':
+        # 同じ内容から同じバイト列を作るため mtime は固定する
+        return gzip.compress(content, compresslevel=9 if best else 6, mtime=0)
+    raise ValueError(f"未対応の圧縮形式です: {encoding}")
@@ -0,0 +1,149 @@
+"""
+接続の再利用・ヘルスチェック・プーリングに対応したMySQLバックエンド
+
+settings.DATABASES で次のキーを指定できます:
+    CONN_MAX_AGE         接続を再利用する秒数（Django標準）
+    CONN_HEALTH_CHECKS   再利用する接続をリクエストの最初の利用前に ping で確認する
+    POOL_SIZE            プロセス内で保持する接続の上限（0でプーリングしない）
+    POOL_MAX_LIFETIME    プールした接続を再利用する最大秒数
+
+プールはプロセスごとに保持し、fork された子プロセスでは親の接続を使わずに新しく接続します。
+接続の作成・再利用・切断の回数は config.db.stats.get_connection_stats() で取得できます。
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.db.backends.mysql import base
+from django.db.backends.mysql.base import Database
+
+from config.db.stats import count as _count
+
+
+class ConnectionPool:
+    """プロセス内で MySQLdb の接続を使い回すためのプール（DBエイリアスごと）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connections = defaultdict(deque)
+        # fork前に作成された接続は子プロセスで閉じると親の接続まで切断されるため、参照を保持したまま使わない
+        self._inherited = []
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            for connections in self._connections.values():
+                self._inherited.extend(connections)
+            self._connections = defaultdict(deque)
+            self._pid = os.getpid()
+
+    def get(self, alias, max_lifetime):
+        """
+        プールから使用可能な接続を取り出す
+
+        Returns:
+            tuple or None: (接続, 作成時刻)。使用可能な接続がない場合は None
+        """
+        while True:
+            with self._lock:
+                self._check_pid()
+                if not self._connections[alias]:
+                    return None
+                connection, created_at = self._connections[alias].pop()
+            if max_lifetime is not None and time.monotonic() - created_at >= max_lifetime:
+                self._discard(connection)
+                continue
+            try:
+                connection.ping()
+            except Database.Error:
+                _count('health_check_failed')
+                self._discard(connection)
+                continue
+            return connection, created_at
+
+    def put(self, alias, connection, created_at, size):
+        """
+        接続をプールに返却する
+
+        Returns:
+            bool: 返却した場合はTrue（プールが満杯の場合はFalse）
+        """
+        with self._lock:
+            self._check_pid()
+            if len(self._connections[alias]) >= size:
+                return False
+            self._connections[alias].append((connection, created_at))
+            return True
+
+    def clear(self):
+        """プール内の接続をすべて切断する"""
+        with self._lock:
+            self._check_pid()
+            connections = [c for pool in self._connections.values() for c, _ in pool]
+            self._connections.clear()
+        for connection in connections:
+            self._discard(connection)
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except Database.Error:
+            pass
+        _count('closed')
+
+
+connection_pool = ConnectionPool()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._health_check_pending = False
+        self._connection_created_at = None
+
+    @property
+    def pool_size(self):
+        return int(self.settings_dict.get('POOL_SIZE') or 0)
+
+    def get_new_connection(self, conn_params):
+        if self.pool_size:
+            pooled = connection_pool.get(self.alias, self.settings_dict.get('POOL_MAX_LIFETIME'))
+            if pooled is not None:
+                _count('reused')
+                connection, self._connection_created_at = pooled
+                return connection
+        connection = super().get_new_connection(conn_params)
+        self._connection_created_at = time.monotonic()
+        _count('opened')
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # トランザクション中やエラー発生後の接続は状態が不明なためプールに戻さない
+        if (self.pool_size and self.autocommit and not self.in_atomic_block
+                and not self.errors_occurred):
+            if connection_pool.put(self.alias, self.connection, self._connection_created_at, self.pool_size):
+                _count('pooled')
+                return
+        _count('closed')
+        return super()._close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # 再利用する接続は、次に使う前にサーバー側で切断されていないか確認する
+        if self.connection is not None and self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            self._health_check_pending = True
+
+    def ensure_connection(self):
+        if self._health_check_pending:
+            self._health_check_pending = False
+            if self.connection is not None and not self.in_atomic_block and not self.is_usable():
+                _count('health_check_failed')
+                # 切断済みの接続をプールに戻さないようにする
+                self.errors_occurred = True
+                self.close()
+        super().ensure_connection()
@@ -0,0 +1,38 @@
+"""
+DB接続の作成・再利用・切断の回数（プロセス単位）
+
+MySQLバックエンド（config/db/backends/mysql）が更新します。
+バックエンドに依存しないため、SQLiteなど他のDBを使っている場合も読み込めます（その場合は常に0）。
+回数は Prometheus のカウンタ manga_db_connection_events_total{event="..."} としても記録し、
+/metrics で全ワーカー分を合計して公開します（config/metrics.py）。
+"""
+import os
+import threading
+from collections import Counter
+
+from config import metrics
+
+STAT_NAMES = ('opened', 'reused', 'closed', 'pooled', 'health_check_failed')
+
+_stats = Counter()
+_lock = threading.Lock()
+
+
+def count(name, value=1):
+    with _lock:
+        _stats[name] += value
+    metrics.count_connection(name, value)
+
+
+def get_connection_stats():
+    """
+    このプロセスでの接続の統計を取得する
+
+    Returns:
+        dict: opened（新規接続）, reused（プールからの再利用）, closed（切断）,
+              pooled（プールへの返却）, health_check_failed（ヘルスチェックで切断）の回数と pid
+    """
+    with _lock:
+        stats = {name: _stats[name] for name in STAT_NAMES}
+    stats['pid'] = os.getpid()
+    return stats
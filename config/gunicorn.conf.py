@@ -0,0 +1,82 @@
+"""
+本番環境用のGunicorn設定
+
+Usage:
+    gunicorn -c config/gunicorn.conf.py
+
+主な設定は環境変数で上書きできます:
+    GUNICORN_BIND            待ち受けアドレス（既定: 0.0.0.0:8000）
+    GUNICORN_WORKERS         ワーカー数（既定: CPUコア数 * 2 + 1）
+    GUNICORN_WORKER_CLASS    ワーカークラス（既定: gthread）
+                             ASGIで動かす場合は uvicorn.workers.UvicornWorker
+    GUNICORN_THREADS         gthreadワーカーのスレッド数（既定: 4）
+    GUNICORN_KEEPALIVE       Keep-Aliveの待機秒数（既定: 5）
+    GUNICORN_TIMEOUT         リクエストのタイムアウト秒数（既定: 30）
+    GUNICORN_PRELOAD         アプリケーションを事前読み込みするか（既定: true）
+    GUNICORN_MAX_REQUESTS    ワーカーを再起動するまでのリクエスト数（既定: 1000、0で無効）
+    PROMETHEUS_MULTIPROC_DIR メトリクス（/metrics）をワーカー間で集計するためのディレクトリ
+                             アプリケーションの読み込み前に空にする必要があるため、gunicornの起動前に
+                             削除します（Dockerfile の CMD・docker-compose の command）
+
+グレースフルリロード:
+    kill -HUP <masterのPID>  ワーカーを順に入れ替えます（GUNICORN_PRELOAD=false の場合はコードも再読み込み）
+    kill -USR2 <masterのPID> 新しいmasterを起動します。起動後に旧masterへ WINCH → QUIT を送るとコードの更新を無停止で反映できます
+"""
+import multiprocessing
+import os
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# ASGIワーカーの場合はASGIアプリケーションを読み込む
+if 'uvicorn' in worker_class.lower():
+    wsgi_app = 'config.asgi:application'
+else:
+    wsgi_app = 'config.wsgi:application'
+
+# 起動時にアプリケーションを読み込んでからforkし、ワーカーの起動時間とメモリを節約する
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+
+# Keep-Alive（ロードバランサのアイドルタイムアウトより短くする）
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# メモリリーク対策として一定リクエストごとにワーカーを再起動（一斉に再起動しないようにずらす）
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10))
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+forwarded_allow_ips = os.environ.get('GUNICORN_FORWARDED_ALLOW_IPS', '*')
+
+
+def post_fork(server, worker):
+    """preload時にmasterで開いたDB接続をワーカー間で共有しないよう破棄する"""
+    from django.db import connections
+    for connection in connections.all():
+        connection.close()
+
+
+def worker_exit(server, worker):
+    """ワーカー終了時にDB接続の作成・再利用の回数を出力する（接続の使い回しの確認用）"""
+    from config.db.stats import get_connection_stats
+    server.log.info(f"DB接続の統計: {get_connection_stats()}")
+
+
+def child_exit(server, worker):
+    """終了したワーカーのメトリクスのうちプロセスごとの値（Gauge）を集計対象から外す"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,151 @@
+"""
+Prometheus形式のメトリクス
+
+APIのリクエストごとのレイテンシ・DBクエリ数/時間（MetricsMiddleware が記録）、
+レスポンスキャッシュのヒット数（CompressedResponseCache が記録）と、
+DB接続の作成・再利用・切断の回数（config.db.stats が記録）と、
+スクレイピング・レーティング更新ジョブの直近の実行結果（/metrics の取得時にDBから集計）を /metrics で公開します。
+
+gunicorn で複数ワーカーを起動する場合は環境変数 PROMETHEUS_MULTIPROC_DIR に空のディレクトリを指定してください。
+各ワーカーの値をファイルに書き出し、/metrics の取得時に全ワーカー分を合計します（prometheus_client のマルチプロセスモード）。
+prometheus_client がインストールされていない場合、メトリクスは記録されず /metrics は404を返します。
+"""
+import os
+from django.conf import settings
+from django.db.models import Count
+from django.http import Http404, HttpResponse
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # pragma: no cover
+    prometheus_client = None
+
+# レイテンシのバケット（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 1リクエストあたりのクエリ数のバケット
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def enabled():
+    """メトリクスを記録するかどうか"""
+    return prometheus_client is not None and getattr(settings, 'METRICS_ENABLED', True)
+
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'manga_api_request_duration_seconds', 'APIリクエストの処理時間',
+        ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_DB_QUERIES = Histogram(
+        'manga_api_request_db_queries', '1リクエストあたりのDBクエリ数',
+        ['view'], buckets=QUERY_COUNT_BUCKETS,
+    )
+    REQUEST_DB_SECONDS = Histogram(
+        'manga_api_request_db_seconds', '1リクエストあたりのDBクエリの合計時間',
+        ['view'], buckets=LATENCY_BUCKETS,
+    )
+    RESPONSE_CACHE_REQUESTS = Counter(
+        'manga_api_response_cache_requests', 'レスポンスキャッシュの参照回数',
+        ['cache', 'result'],
+    )
+    DB_CONNECTION_EVENTS = Counter(
+        'manga_db_connection_events', 'DB接続の作成・再利用・切断などの回数（config/db/stats.py の STAT_NAMES）',
+        ['event'],
+    )
+
+
+def observe_request(view, method, status, seconds, query_count, query_seconds):
+    """1リクエストの処理時間とDBクエリ数/時間を記録する"""
+    if not enabled():
+        return
+    REQUEST_LATENCY.labels(view, method, str(status)).observe(seconds)
+    REQUEST_DB_QUERIES.labels(view).observe(query_count)
+    REQUEST_DB_SECONDS.labels(view).observe(query_seconds)
+
+
+def count_cache(cache_name, hit):
+    """レスポンスキャッシュのヒット・ミスを記録する"""
+    if not enabled():
+        return
+    RESPONSE_CACHE_REQUESTS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+def count_connection(event, value=1):
+    """DB接続の作成・再利用・切断などを記録する"""
+    if not enabled():
+        return
+    DB_CONNECTION_EVENTS.labels(event).inc(value)
+
+
+class JobCollector:
+    """
+    スクレイピング・レーティング更新ジョブの直近の実行結果
+
+    /metrics の取得時にDBから集計するため、どのワーカーで取得しても同じ値になります。
+    """
+
+    def collect(self):
+        from manga.models import DataGeneration, MangaDailyRanking, ScrapedManga, ScrapingHistory
+
+        duration = GaugeMetricFamily(
+            'manga_scrape_last_duration_seconds', '直近のスクレイピングの処理時間', labels=['store'])
+        items = GaugeMetricFamily(
+            'manga_scrape_last_items', '直近のスクレイピングで取得したマンガ数', labels=['store'])
+        success = GaugeMetricFamily(
+            'manga_scrape_last_success', '直近のスクレイピングが成功したか（1: 成功、0: 失敗）', labels=['store'])
+        finished = GaugeMetricFamily(
+            'manga_scrape_last_finished_timestamp_seconds', '直近のスクレイピングの終了時刻', labels=['store'])
+        stages = GaugeMetricFamily(
+            'manga_scrape_last_stage_seconds', '直近のスクレイピングの処理段階ごとの時間', labels=['store', 'stage'])
+
+        latest = {}
+        for history in ScrapingHistory.objects.select_related('store').order_by('store_id', '-scraping_date', '-id'):
+            latest.setdefault(history.store_id, history)
+        # 実行統計に取得件数がない（統計の記録前の）履歴の件数は1回のクエリでまとめて集計する
+        missing_ids = [history.id for history in latest.values() if 'items' not in (history.stats or {})]
+        counts = dict(
+            ScrapedManga.objects.filter(scraping_history_id__in=missing_ids)
+            .order_by().values('scraping_history_id').annotate(count=Count('id'))
+            .values_list('scraping_history_id', 'count')
+        ) if missing_ids else {}
+        for history in latest.values():
+            store = history.store.name
+            stats = history.stats or {}
+            if history.finished_at:
+                finished.add_metric([store], history.finished_at.timestamp())
+                duration.add_metric([store], stats.get('total_seconds', (history.finished_at - history.started_at).total_seconds()))
+            items.add_metric([store], stats['items'] if 'items' in stats else counts.get(history.id, 0))
+            success.add_metric([store], 1 if history.is_success else 0)
+            for stage, seconds in stats.get('stages', {}).items():
+                stages.add_metric([store, stage], seconds)
+        yield from (duration, items, success, finished, stages)
+
+        ratings = DataGeneration.objects.filter(name=DataGeneration.RATINGS).first()
+        generation = GaugeMetricFamily('manga_ratings_generation', 'レーティングの世代')
+        updated = GaugeMetricFamily('manga_ratings_last_updated_timestamp_seconds', '直近のレーティング更新の時刻')
+        rows = GaugeMetricFamily('manga_ratings_last_rows', '直近のレーティング更新で日次ランキング集計に記録したマンガ数')
+        if ratings is not None:
+            generation.add_metric([], ratings.generation)
+            updated.add_metric([], ratings.updated_at.timestamp())
+            last_date = MangaDailyRanking.objects.order_by('-date').values_list('date', flat=True).first()
+            rows.add_metric([], MangaDailyRanking.objects.filter(date=last_date).count() if last_date else 0)
+        yield from (generation, updated, rows)
+
+
+def metrics_view(request):
+    """Prometheus形式のメトリクスを返す"""
+    if not enabled():
+        raise Http404
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # 全ワーカーが書き出した値を合計する
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    jobs = CollectorRegistry()
+    jobs.register(JobCollector())
+    content = prometheus_client.generate_latest(registry) + prometheus_client.generate_latest(jobs)
+    return HttpResponse(content, content_type=prometheus_client.CONTENT_TYPE_LATEST)
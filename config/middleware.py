@@ -0,0 +1,212 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from rest_framework import generics, viewsets
+
+from config import metrics
+from config.compression import MIN_COMPRESS_LENGTH, choose_encoding, compress
+from config.query_profiler import QueryRecorder, build_profile, profile_buffer
+from config.routers import replica_available, reset_use_replica, set_use_replica
+
+# レプリカへ振り分ける読み取り専用のビュー
+READ_ONLY_VIEW_CLASSES = (viewsets.ReadOnlyModelViewSet, generics.ListAPIView, generics.RetrieveAPIView)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# 圧縮するレスポンスのパスの先頭とContent-Type
+COMPRESS_PATH_PREFIX = '/api/'
+COMPRESS_CONTENT_TYPES = ('application/json',)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    読み取り専用のAPIビューへのGETリクエストのクエリをレプリカDBへ送るミドルウェア
+
+    管理画面などで書き込みを行ったクライアントには Cookie を発行し、
+    READ_YOUR_WRITES_SECONDS 秒間はプライマリから読み込むようにします（レプリカの遅延対策）。
+    """
+    cookie_name = 'primary_until'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.replica_token = None
+        try:
+            response = self.get_response(request)
+        finally:
+            if request.replica_token is not None:
+                reset_use_replica(request.replica_token)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            window = getattr(settings, 'READ_YOUR_WRITES_SECONDS', 10)
+            if window:
+                response.set_cookie(
+                    self.cookie_name, str(int(time.time() + window)),
+                    max_age=window, httponly=True, samesite='Lax'
+                )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS:
+            return None
+        view_class = getattr(view_func, 'cls', None)
+        if view_class is None or not issubclass(view_class, READ_ONLY_VIEW_CLASSES):
+            return None
+        if self._recently_wrote(request) or not replica_available():
+            return None
+        request.replica_token = set_use_replica(True)
+        return None
+
+    def _recently_wrote(self, request):
+        try:
+            return int(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class CompressionMiddleware:
+    """
+    レスポンスを brotli / gzip で圧縮するミドルウェア（django.middleware.gzip.GZipMiddleware の brotli 対応版）
+
+    すでに Content-Encoding が設定されているレスポンス（キャッシュ済みの圧縮データなど）はそのまま返します。
+    ストリーミングレスポンスは圧縮しません。
+    CSRFトークンなどの秘密情報を含むHTML（管理画面・ブラウザブルAPI）を圧縮すると BREACH 攻撃の対象になるため、
+    COMPRESS_PATH_PREFIX 以下のJSONレスポンスのみ圧縮します。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not self._compressible(request, response):
+            return response
+        if len(response.content) < MIN_COMPRESS_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compressed = compress(response.content, encoding)
+        # 圧縮しても短くならない場合はそのまま返す
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+
+        # 強いETagは圧縮後の内容と一致しなくなるため弱いETagにする
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
+
+    def _compressible(self, request, response):
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        return request.path.startswith(COMPRESS_PATH_PREFIX) and content_type in COMPRESS_CONTENT_TYPES
+
+
+class QueryCounter:
+    """execute_wrapper としてDBクエリの実行回数と合計時間を数える"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def view_name(view_func):
+    """メトリクスのラベルに使うビュー名（ViewSetの場合は「クラス名.アクション名」）"""
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f"{view_class.__name__}.{'/'.join(sorted(set(actions.values())))}"
+    return view_class.__name__
+
+
+class MetricsMiddleware:
+    """
+    リクエストごとの処理時間・DBクエリ数/時間を Prometheus のメトリクスとして記録するミドルウェア（config.metrics）
+
+    ラベルの種類が増えすぎないよう、ビューに到達しなかったリクエスト（404など）は view="unmatched" にまとめます。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.enabled():
+            return self.get_response(request)
+
+        request.metrics_view_name = 'unmatched'
+        counter = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        if request.metrics_view_name != 'metrics_view':
+            metrics.observe_request(
+                request.metrics_view_name, request.method, response.status_code,
+                time.perf_counter() - start, counter.count, counter.seconds,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view_name = view_name(view_func)
+        return None
+
+
+class QueryProfilingMiddleware:
+    """
+    サンプリングしたリクエストのSQLクエリを記録するミドルウェア（config.query_profiler）
+
+    QUERY_PROFILING_SAMPLE_RATE（0〜1）の割合のリクエストについて、実行されたSQLと実行時間を記録し、
+    遅いクエリと同じ形のクエリの繰り返し（N+1クエリ）をまとめてリングバッファに保存します。
+    QUERY_PROFILING_SAMPLE_RATE が0の場合は読み込まれません。
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = getattr(settings, 'QUERY_PROFILING_SAMPLE_RATE', 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate or request.path.startswith('/admin/query-profiles/'):
+            return self.get_response(request)
+
+        request.profiling_view_name = 'unmatched'
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        profile_buffer.append(build_profile(
+            request, response, request.profiling_view_name, time.perf_counter() - start, recorder,
+        ))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profiling_view_name = view_name(view_func)
+        return None
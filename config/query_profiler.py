@@ -0,0 +1,158 @@
+"""
+リクエストごとのSQLクエリの記録（QueryProfilingMiddleware）
+
+サンプリングしたリクエストで実行されたSQLと実行時間を記録し、
+遅いクエリと、同じ形のクエリの繰り返し（N+1クエリ）をまとめた結果をワーカーごとのリングバッファに保存します。
+保存した結果は管理者のみ /admin/query-profiles/ で参照できます。
+"""
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+# SQLの文字列・数値リテラル、IN句のリスト
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?|NULL)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+# 1つのクエリとして保存するSQLの最大文字数
+MAX_SQL_LENGTH = 1000
+
+
+def fingerprint(sql):
+    """
+    パラメータの値を取り除いたSQLの形（同じ形のクエリの繰り返しの検出に使う）
+
+    Example:
+        SELECT ... WHERE id = 1 AND name IN (1, 2, 3)  → SELECT ... WHERE id = ? AND name IN (...)
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """execute_wrapper として実行されたSQLと実行時間を記録する"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def summarize(self, slow_seconds, duplicate_threshold):
+        """
+        記録したクエリを集計する
+
+        Args:
+            slow_seconds (float): この秒数以上かかったクエリを遅いクエリとして残す
+            duplicate_threshold (int): 同じ形のクエリがこの回数以上実行された場合に繰り返しとして残す
+
+        Returns:
+            dict: クエリ数・合計時間・遅いクエリ・繰り返されたクエリ
+        """
+        by_fingerprint = {}
+        for sql, seconds in self.queries:
+            entry = by_fingerprint.setdefault(fingerprint(sql), {'count': 0, 'seconds': 0.0, 'example': sql})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+        duplicates = sorted(
+            (
+                {'fingerprint': key[:MAX_SQL_LENGTH], 'count': entry['count'], 'seconds': round(entry['seconds'], 6)}
+                for key, entry in by_fingerprint.items()
+                if entry['count'] >= duplicate_threshold
+            ),
+            key=lambda entry: -entry['count'],
+        )
+        slow = sorted(
+            (
+                {'sql': sql[:MAX_SQL_LENGTH], 'seconds': round(seconds, 6)}
+                for sql, seconds in self.queries
+                if seconds >= slow_seconds
+            ),
+            key=lambda entry: -entry['seconds'],
+        )
+        return {
+            'queries': len(self.queries),
+            'query_seconds': round(sum(seconds for _, seconds in self.queries), 6),
+            'distinct_queries': len(by_fingerprint),
+            'slow_queries': slow,
+            'duplicate_queries': duplicates,
+        }
+
+
+class ProfileBuffer:
+    """直近のリクエストの集計結果を保持するリングバッファ（ワーカーごと）"""
+
+    def __init__(self, size):
+        self._lock = threading.Lock()
+        self._items = deque(maxlen=size)
+
+    def append(self, item):
+        with self._lock:
+            self._items.append(item)
+
+    def items(self):
+        """保存している結果（新しい順）"""
+        with self._lock:
+            return list(reversed(self._items))
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+profile_buffer = ProfileBuffer(getattr(settings, 'QUERY_PROFILING_BUFFER_SIZE', 200))
+
+
+def build_profile(request, response, view_name, seconds, recorder):
+    """1リクエストの集計結果を作成する"""
+    profile = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.get_full_path()[:500],
+        'view': view_name,
+        'status': response.status_code,
+        'seconds': round(seconds, 6),
+    }
+    profile.update(recorder.summarize(
+        getattr(settings, 'SLOW_QUERY_SECONDS', 0.1),
+        getattr(settings, 'DUPLICATE_QUERY_THRESHOLD', 3),
+    ))
+    return profile
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def query_profiles_view(request):
+    """
+    記録したリクエストごとのクエリの集計結果を返す（管理者のみ）
+
+    リングバッファはワーカープロセスごとに持つため、返すのはこのリクエストを処理したワーカーの記録のみです
+    （複数ワーカーで起動している場合は、何度か取得すると別のワーカーの記録が返ります）。
+
+    GET: 記録した結果を返す
+    - n_plus_one: 1 を指定すると同じ形のクエリが繰り返されたリクエストのみ返す
+    POST: 返した後にこのワーカーのバッファを空にする（CSRFトークンが必要）
+    """
+    profiles = profile_buffer.items()
+    if request.GET.get('n_plus_one') == '1':
+        profiles = [profile for profile in profiles if profile['duplicate_queries']]
+    if request.method == 'POST':
+        profile_buffer.clear()
+    return JsonResponse({
+        'sample_rate': getattr(settings, 'QUERY_PROFILING_SAMPLE_RATE', 0.0),
+        'profiles': profiles,
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,97 @@
+"""
+読み取り専用APIのクエリをレプリカDBへ振り分けるルーター
+
+settings.DATABASES にレプリカ（settings.REPLICA_DATABASE_ALIAS）が設定されている場合、
+use_replica() の中で実行された読み取りクエリをレプリカへ送ります。
+レプリカに接続できない場合は一定時間プライマリ（default）を使います。
+振り分けの対象となるビューは config.middleware.ReplicaRoutingMiddleware が決定します。
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+# レプリカへの接続に失敗した時刻（プロセス単位）
+_replica_failed_at = None
+
+
+def replica_alias():
+    """レプリカのDBエイリアス（設定されていない場合はNone）"""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def replica_available():
+    """
+    レプリカが使用可能かどうか
+
+    接続に失敗した場合は REPLICA_RETRY_SECONDS 秒間プライマリを使い、その後再度接続を試みます。
+    """
+    global _replica_failed_at
+    alias = replica_alias()
+    if alias is None:
+        return False
+    if _replica_failed_at is not None:
+        if time.monotonic() - _replica_failed_at < getattr(settings, 'REPLICA_RETRY_SECONDS', 30):
+            return False
+        _replica_failed_at = None
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as e:
+        logger.warning(f"レプリカ '{alias}' に接続できないためプライマリを使用します: {e}")
+        _replica_failed_at = time.monotonic()
+        return False
+    return True
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """ブロック内の読み取りクエリをレプリカへ送る"""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def set_use_replica(enabled):
+    """
+    現在のコンテキストでレプリカを使うかどうかを設定する
+
+    Returns:
+        contextvars.Token: reset_use_replica() で元に戻すためのトークン
+    """
+    return _use_replica.set(enabled)
+
+
+def reset_use_replica(token):
+    _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    """
+    use_replica() の中の読み取りクエリのみレプリカへ送り、それ以外はすべてプライマリを使う
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # レプリカはプライマリと同じデータを持つため、どちらから読み込んだオブジェクトも関連付けられる
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
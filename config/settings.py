@@ -38,7 +38,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.MetricsMiddleware',  # Prometheus形式のメトリクス（/metrics）の記録
+    'config.middleware.QueryProfilingMiddleware',  # サンプリングしたリクエストのSQLの記録（QUERY_PROFILING_SAMPLE_RATE > 0 の場合のみ）
     'django.middleware.security.SecurityMiddleware',
+    'config.middleware.CompressionMiddleware',  # brotli / gzip によるAPIのJSONレスポンスの圧縮
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORSミドルウェア（必ずCommonMiddlewareより前に配置）
     'django.middleware.common.CommonMiddleware',
@@ -46,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.middleware.ReplicaRoutingMiddleware',  # 読み取り専用APIのクエリをレプリカへ振り分け
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -91,6 +95,55 @@ else:
         }
     }
 
+# 読み取り専用APIで使うレプリカDB（DATABASE_REPLICA_URLが設定されている場合のみ）
+# ローカルでは2つのSQLiteファイルやMySQLのDBを指定して確認できます
+if 'DATABASE_REPLICA_URL' in os.environ:
+    DATABASES['replica'] = env.db('DATABASE_REPLICA_URL')
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica'
+# レプリカに接続できなかった場合にプライマリを使い続ける秒数
+REPLICA_RETRY_SECONDS = env.int('REPLICA_RETRY_SECONDS', default=30)
+# 書き込みを行ったクライアントがプライマリから読み込む秒数（レプリカの遅延対策）
+READ_YOUR_WRITES_SECONDS = env.int('READ_YOUR_WRITES_SECONDS', default=10)
+
+# DB接続の再利用（リクエストごとの接続・切断をなくす）
+# DB_CONN_MAX_AGE: 接続を再利用する秒数（0でリクエストごとに切断）
+# MySQLの場合は接続プールに対応したバックエンドを使用する（config/db/backends/mysql）
+# DB_HEALTH_CHECKS: 再利用する接続をリクエストの最初の利用前に確認する
+#   （Django 3.2 の標準のバックエンドは CONN_HEALTH_CHECKS に対応していないため、MySQLのバックエンドのみ設定する）
+# DB_POOL_SIZE: プロセス内で保持する接続の上限（0でプーリングしない）
+# DB_POOL_MAX_LIFETIME: プールした接続を再利用する最大秒数（MySQLの wait_timeout より短くする）
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+    if _database['ENGINE'] == 'django.db.backends.mysql':
+        _database.update({
+            'ENGINE': 'config.db.backends.mysql',
+            'CONN_HEALTH_CHECKS': env.bool('DB_HEALTH_CHECKS', default=True),
+            'POOL_SIZE': env.int('DB_POOL_SIZE', default=0),
+            'POOL_MAX_LIFETIME': env.int('DB_POOL_MAX_LIFETIME', default=3600),
+        })
+
+# キャッシュ（CACHE_URLが設定されていない場合はプロセス内のメモリを使用）
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+# レンダリング・圧縮済みのレスポンスをキャッシュする秒数
+RESPONSE_CACHE_TIMEOUT = env.int('RESPONSE_CACHE_TIMEOUT', default=3600)
+
+# Prometheus形式のメトリクス（/metrics）を記録・公開するか（prometheus_client が必要、config/metrics.py）
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+
+# SQLクエリを記録するリクエストの割合（0〜1、0で無効）。結果は管理者のみ /admin/query-profiles/ で参照できます（config/query_profiler.py）
+QUERY_PROFILING_SAMPLE_RATE = env.float('QUERY_PROFILING_SAMPLE_RATE', default=0.0)
+# 記録するリクエストの件数（ワーカーごと）
+QUERY_PROFILING_BUFFER_SIZE = env.int('QUERY_PROFILING_BUFFER_SIZE', default=200)
+# 遅いクエリとして記録する秒数
+SLOW_QUERY_SECONDS = env.float('SLOW_QUERY_SECONDS', default=0.1)
+# 同じ形のクエリがこの回数以上実行された場合にN+1クエリとして記録する
+DUPLICATE_QUERY_THRESHOLD = env.int('DUPLICATE_QUERY_THRESHOLD', default=3)
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -128,6 +181,9 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# 人気マンガリスト・マンガ詳細の静的なJSONファイルの出力先（scripts/export_popular_snapshots.py）
+SNAPSHOT_ROOT = env('SNAPSHOT_ROOT', default=os.path.join(BASE_DIR, 'snapshots'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -141,6 +197,10 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'manga.renderers.ORJSONRenderer',  # orjsonによる高速なJSON出力
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10
 }
@@ -3,6 +3,8 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from config.metrics import metrics_view
+from config.query_profiler import query_profiles_view
 
 # Swagger UI設定
 schema_view = get_schema_view(
@@ -19,8 +21,10 @@ schema_view = get_schema_view(
 )
 
 urlpatterns = [
+    path('admin/query-profiles/', query_profiles_view, name='query-profiles'),
     path('admin/', admin.site.urls),
     path('api/v1/', include('manga.urls')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,5 +1,42 @@
+import json
 from django.contrib import admin
-from .models import Manga, Category, EbookStore, ScrapingHistory, ScrapedManga, EbookStoreCategoryUrl, MangaEbookStore
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import Manga, Category, EbookStore, ScrapingHistory, ScrapedManga, EbookStoreCategoryUrl, MangaEbookStore, MangaDailyRanking, TrendingManga
+
+class EstimatedCountPaginator(Paginator):
+    """
+    件数の多いテーブル用のページネータ
+
+    絞り込みがない場合は COUNT(*) の代わりにテーブル統計（MySQLの information_schema.TABLES）の
+    推定件数を使い、絞り込みがある場合も最大 MAX_COUNT 件までしか数えません。
+    """
+    MAX_COUNT = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimated = self._estimated_table_rows(queryset)
+            if estimated is not None:
+                return estimated
+        return queryset.order_by()[:self.MAX_COUNT].count()
+
+    @staticmethod
+    def _estimated_table_rows(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'mysql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] is not None else None
+
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -14,6 +51,9 @@ class MangaAdmin(admin.ModelAdmin):
     search_fields = ('title', 'author', 'first_book_title', 'description')
     readonly_fields = ('created_at', 'updated_at')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('categories')
+
     def get_categories(self, obj):
         return ", ".join([c.name for c in obj.categories.all()])
     get_categories.short_description = 'カテゴリ'
@@ -21,17 +61,45 @@ class MangaAdmin(admin.ModelAdmin):
 
 @admin.register(EbookStore)
 class EbookStoreAdmin(admin.ModelAdmin):
-    list_display = ('name', 'url', 'created_at', 'updated_at', 'deleted_at')
+    list_display = ('name', 'url', 'rating_weight', 'created_at', 'updated_at', 'deleted_at')
     search_fields = ('name',)
     readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(ScrapingHistory)
 class ScrapingHistoryAdmin(admin.ModelAdmin):
-    list_display = ('store', 'scraping_date', 'started_at', 'finished_at', 'is_success')
+    list_display = ('store', 'scraping_date', 'started_at', 'finished_at', 'is_success', 'get_total_seconds', 'get_requests', 'get_slowest_stage')
     list_filter = ('store', 'scraping_date', 'is_success')
+    list_select_related = ('store',)
     search_fields = ('store__name', 'error_message')
-    readonly_fields = ('scraping_date', 'started_at')
+    readonly_fields = ('scraping_date', 'started_at', 'get_stats_display')
+    exclude = ('stats',)
+    
+    def get_total_seconds(self, obj):
+        seconds = (obj.stats or {}).get('total_seconds')
+        return f"{seconds:.1f}秒" if seconds is not None else '-'
+    get_total_seconds.short_description = '処理時間'
+    
+    def get_requests(self, obj):
+        stats = obj.stats or {}
+        if 'requests' not in stats:
+            return '-'
+        return f"{stats['requests']} (再試行: {stats.get('retries', 0)}, エラー: {stats.get('errors', 0)})"
+    get_requests.short_description = 'リクエスト数'
+    
+    def get_slowest_stage(self, obj):
+        stages = (obj.stats or {}).get('stages')
+        if not stages:
+            return '-'
+        name, seconds = max(stages.items(), key=lambda item: item[1])
+        return f"{name} ({seconds:.1f}秒)"
+    get_slowest_stage.short_description = '最も時間のかかった処理'
+    
+    def get_stats_display(self, obj):
+        if not obj.stats:
+            return '-'
+        return format_html('<pre>{}</pre>', json.dumps(obj.stats, ensure_ascii=False, indent=2))
+    get_stats_display.short_description = '実行統計'
 
 
 @admin.register(ScrapedManga)
@@ -40,6 +108,14 @@ class ScrapedMangaAdmin(admin.ModelAdmin):
     list_filter = ('manga__categories', 'scraping_history__store', 'scraping_history__scraping_date')
     search_fields = ('manga__title', 'manga__author')
     readonly_fields = ('created_at',)
+    raw_id_fields = ('manga', 'scraping_history')
+    list_select_related = ('manga', 'scraping_history__store')
+    # 件数が多いため COUNT(*) を避ける
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('manga__categories')
     
     def get_title(self, obj):
         return obj.manga.title
@@ -70,6 +146,7 @@ class EbookStoreCategoryUrlAdmin(admin.ModelAdmin):
     list_filter = ('store', 'category')
     search_fields = ('store__name', 'category__name', 'url')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('store', 'category')
 
 
 @admin.register(MangaEbookStore)
@@ -78,6 +155,8 @@ class MangaEbookStoreAdmin(admin.ModelAdmin):
     list_filter = ('ebookstore', 'manga__categories')
     search_fields = ('manga__title', 'manga__author', 'ebookstore__name', 'url')
     readonly_fields = ('created_at', 'updated_at')
+    raw_id_fields = ('manga',)
+    list_select_related = ('manga', 'ebookstore')
     
     def get_manga_title(self, obj):
         return obj.manga.title
@@ -87,4 +166,34 @@ class MangaEbookStoreAdmin(admin.ModelAdmin):
     def get_manga_author(self, obj):
         return obj.manga.author
     get_manga_author.short_description = '著者'
-    get_manga_author.admin_order_field = 'manga__author'
\ No newline at end of file
+    get_manga_author.admin_order_field = 'manga__author'
+
+
+@admin.register(MangaDailyRanking)
+class MangaDailyRankingAdmin(admin.ModelAdmin):
+    list_display = ('get_manga_title', 'date', 'best_rank', 'ranks', 'free_chapters', 'free_books')
+    list_filter = ('date',)
+    search_fields = ('manga__title',)
+    raw_id_fields = ('manga',)
+    list_select_related = ('manga',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    
+    def get_manga_title(self, obj):
+        return obj.manga.title
+    get_manga_title.short_description = 'マンガタイトル'
+    get_manga_title.admin_order_field = 'manga__title'
+
+
+@admin.register(TrendingManga)
+class TrendingMangaAdmin(admin.ModelAdmin):
+    list_display = ('category', 'position', 'get_manga_title', 'previous_rank', 'current_rank', 'rank_delta', 'date')
+    list_filter = ('category',)
+    search_fields = ('manga__title',)
+    raw_id_fields = ('manga',)
+    list_select_related = ('manga',)
+    
+    def get_manga_title(self, obj):
+        return obj.manga.title
+    get_manga_title.short_description = 'マンガタイトル'
+    get_manga_title.admin_order_field = 'manga__title'
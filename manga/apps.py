@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MangaConfig(AppConfig):
+    name = 'manga'
+    verbose_name = 'マンガ'
+
+    def ready(self):
+        # シグナルハンドラを登録
+        from . import signals  # noqa: F401
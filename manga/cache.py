@@ -0,0 +1,159 @@
+"""
+プロセス内で共有する参照系データのキャッシュ
+
+カテゴリとストアカテゴリURLはスクレイピング中にほとんど変化しないため、
+実行ごとに一度だけ読み込み、管理画面などで保存された場合はシグナルで破棄します。
+データの世代（DataGeneration）は一定間隔でのみDBを確認し、
+世代をキーにしたレスポンスのキャッシュは圧縮済みのバイト列で保存します。
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from config.compression import compress
+from config.metrics import count_cache
+from .models import Category, DataGeneration, EbookStoreCategoryUrl
+
+
+class CategoryCache:
+    """
+    Category と EbookStoreCategoryUrl の読み取り用キャッシュ
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (カテゴリID→Category, ストアID→カテゴリURLリスト) のタプル
+        self._data = None
+
+    def _get_data(self):
+        data = self._data
+        if data is not None:
+            return data
+        with self._lock:
+            if self._data is None:
+                categories = {category.id: category for category in Category.objects.all()}
+                store_urls = {}
+                for cat_url in EbookStoreCategoryUrl.objects.select_related('store', 'category'):
+                    # select_relatedで取得したカテゴリも同じインスタンスに揃える
+                    cat_url.category = categories.get(cat_url.category_id, cat_url.category)
+                    store_urls.setdefault(cat_url.store_id, []).append(cat_url)
+                self._data = (categories, store_urls)
+            return self._data
+
+    def invalidate(self):
+        """キャッシュを破棄する（次回アクセス時に再読み込みされます）"""
+        self._data = None
+
+    def get_category(self, category_id):
+        """
+        カテゴリを取得する
+
+        Raises:
+            Category.DoesNotExist: 指定されたカテゴリが存在しない場合
+        """
+        categories, _ = self._get_data()
+        try:
+            return categories[category_id]
+        except KeyError:
+            raise Category.DoesNotExist(f"カテゴリが見つかりません: {category_id}")
+
+    def get_category_name(self, category_id):
+        """カテゴリ名を取得する（存在しない場合はIDをそのまま返す）"""
+        try:
+            return self.get_category(category_id).name
+        except Category.DoesNotExist:
+            return category_id
+
+    def get_store_category_urls(self, store_id):
+        """
+        ストアのカテゴリURL一覧を取得する（store と category は取得済み）
+
+        Returns:
+            list: EbookStoreCategoryUrlのリスト
+        """
+        _, store_urls = self._get_data()
+        return list(store_urls.get(store_id, []))
+
+
+# プロセス内で共有するキャッシュ
+category_cache = CategoryCache()
+
+
+class GenerationCache:
+    """
+    DataGeneration の世代の読み取り用キャッシュ
+
+    リクエストごとにDBを確認しないよう、CHECK_INTERVAL 秒ごとにのみ読み込みます。
+    """
+    CHECK_INTERVAL = 30
+
+    def __init__(self):
+        # データ名 → (世代, 確認した時刻)
+        self._values = {}
+
+    def get(self, name):
+        """データの現在の世代を取得する"""
+        now = time.monotonic()
+        value = self._values.get(name)
+        if value is not None and now - value[1] < self.CHECK_INTERVAL:
+            return value[0]
+        generation = DataGeneration.objects.get_generation(name)
+        self._values[name] = (generation, now)
+        return generation
+
+    def invalidate(self):
+        self._values.clear()
+
+
+# プロセス内で共有する世代のキャッシュ
+generation_cache = GenerationCache()
+
+
+class CompressedResponseCache:
+    """
+    レンダリング済みのレスポンスを圧縮形式ごとに保存するキャッシュ（Djangoのキャッシュを使用）
+
+    同じ内容を毎回レンダリング・圧縮しないよう、未圧縮のバイト列と
+    圧縮形式（br / gzip）ごとの圧縮済みのバイト列をそれぞれ保存します。
+    キーにはデータの世代を含め、世代が変わったときに古いキャッシュを使わないようにしてください。
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def get_or_render(self, key, encoding, render):
+        """
+        キャッシュ済みのバイト列を取得する（ない場合はレンダリング・圧縮して保存する）
+
+        Args:
+            key (str): キャッシュキー
+            encoding (str or None): 圧縮形式（Noneの場合は未圧縮）
+            render (callable): 未圧縮のバイト列を返す関数
+
+        Returns:
+            bytes: レスポンスのバイト列
+        """
+        timeout = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 3600)
+        cache_key = f'{self.prefix}:{key}:{encoding or "identity"}'
+        body = cache.get(cache_key)
+        count_cache(self.prefix, body is not None)
+        if body is not None:
+            return body
+
+        identity_key = f'{self.prefix}:{key}:identity'
+        content = cache.get(identity_key) if encoding else None
+        if content is None:
+            content = render()
+            cache.set(identity_key, content, timeout)
+        if not encoding:
+            return content
+        body = compress(content, encoding, best=True)
+        cache.set(cache_key, body, timeout)
+        return body
+
+
+# 人気マンガリストのレスポンスのキャッシュ
+popular_list_cache = CompressedResponseCache('popular')
+
+# 急上昇マンガリストのレスポンスのキャッシュ
+trending_list_cache = CompressedResponseCache('trending')
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:53
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_title_key(title):
+    """
+    manga.normalization.normalize_title_key() のマイグレーション作成時点の実装
+
+    マイグレーションの結果が後の変更に影響されないよう、アプリケーションのコードを読み込まずに複製しています。
+    """
+    if not title:
+        return ''
+    normalized = unicodedata.normalize('NFKC', title).casefold()
+    key = ''.join(
+        ch for ch in normalized
+        if not ch.isspace() and unicodedata.category(ch)[0] not in ('P', 'Z')
+    )
+    return (key or normalized.strip())[:255]
+
+
+def populate_normalized_title(apps, schema_editor):
+    """
+    既存マンガの正規化タイトルを設定する
+    同じキーになるマンガが複数ある場合は最も古いものにのみ設定し、残りはNULLのままにします
+    （NULLのマンガは Manga.save() で再計算されず、scripts/merge_duplicate_mangas.py で統合できます）
+    """
+    Manga = apps.get_model('manga', 'Manga')
+    db_alias = schema_editor.connection.alias
+    seen = set()
+    batch = []
+    for manga in Manga.objects.using(db_alias).order_by('id').only('id', 'title').iterator():
+        key = normalize_title_key(manga.title)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        manga.normalized_title = key
+        batch.append(manga)
+        if len(batch) >= 500:
+            Manga.objects.using(db_alias).bulk_update(batch, ['normalized_title'])
+            batch = []
+    if batch:
+        Manga.objects.using(db_alias).bulk_update(batch, ['normalized_title'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0009_auto_20250618_1534'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manga',
+            name='normalized_title',
+            field=models.CharField(blank=True, editable=False, help_text='重複判定用のキー（NFKC正規化・空白/句読点除去）。保存時に自動設定されます。', max_length=255, null=True, verbose_name='正規化タイトル'),
+        ),
+        migrations.RunPython(populate_normalized_title, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='manga',
+            name='normalized_title',
+            field=models.CharField(blank=True, editable=False, help_text='重複判定用のキー（NFKC正規化・空白/句読点除去）。保存時に自動設定されます。', max_length=255, null=True, unique=True, verbose_name='正規化タイトル'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 02:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0010_manga_normalized_title'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MangaTitleBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_key', models.CharField(db_index=True, max_length=24, verbose_name='ブロッキングキー')),
+                ('manga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='title_blocks', to='manga.manga', verbose_name='マンガ')),
+            ],
+            options={
+                'verbose_name': '重複検出ブロッキングキー',
+                'verbose_name_plural': '重複検出ブロッキングキー',
+                'unique_together': {('manga', 'block_key')},
+            },
+        ),
+    ]
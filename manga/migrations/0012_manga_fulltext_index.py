@@ -0,0 +1,30 @@
+from django.db import migrations
+
+# manga.search.FULLTEXT_INDEX_NAME と同じ値（マイグレーションではアプリケーションのコードを読み込まない）
+FULLTEXT_INDEX_NAME = 'manga_manga_title_author_ft'
+
+
+def create_fulltext_index(apps, schema_editor):
+    """タイトル・著者の FULLTEXT インデックス（ngramパーサー）を作成する（MySQLのみ）"""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX `{FULLTEXT_INDEX_NAME}` ON `manga_manga` (`title`, `author`) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f'DROP INDEX `{FULLTEXT_INDEX_NAME}` ON `manga_manga`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0011_mangatitleblock'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0012_manga_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataGeneration',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='データ名')),
+                ('generation', models.PositiveBigIntegerField(default=0, verbose_name='世代')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+            ],
+            options={
+                'verbose_name': 'データ世代',
+                'verbose_name_plural': 'データ世代',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0013_datageneration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MangaDailyRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('ranks', models.JSONField(default=dict, verbose_name='ストア別順位')),
+                ('best_rank', models.PositiveIntegerField(verbose_name='最高順位')),
+                ('free_chapters', models.IntegerField(default=0, verbose_name='無料話数')),
+                ('free_books', models.IntegerField(default=0, verbose_name='無料冊数')),
+                ('manga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rankings', to='manga.manga', verbose_name='マンガ')),
+            ],
+            options={
+                'verbose_name': 'マンガ日次ランキング',
+                'verbose_name_plural': 'マンガ日次ランキング',
+                'ordering': ['manga', 'date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mangadailyranking',
+            index=models.Index(fields=['date'], name='manga_daily_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mangadailyranking',
+            unique_together={('manga', 'date')},
+        ),
+    ]
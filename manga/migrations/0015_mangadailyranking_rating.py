@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0014_mangadailyranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mangadailyranking',
+            name='rating',
+            field=models.PositiveIntegerField(default=0, verbose_name='レーティング'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0015_mangadailyranking_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingManga',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('all', '全て'), ('shounen', '少年マンガ'), ('shoujo', '少女マンガ'), ('seinen', '青年マンガ'), ('josei', '女性マンガ')], max_length=20, verbose_name='カテゴリ')),
+                ('position', models.PositiveIntegerField(verbose_name='表示順')),
+                ('date', models.DateField(verbose_name='対象日')),
+                ('current_rank', models.PositiveIntegerField(verbose_name='現在の順位')),
+                ('previous_rank', models.PositiveIntegerField(blank=True, null=True, verbose_name='比較日の順位')),
+                ('rank_delta', models.IntegerField(verbose_name='順位の上昇幅')),
+                ('manga', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_entries', to='manga.manga', verbose_name='マンガ')),
+            ],
+            options={
+                'verbose_name': '急上昇マンガ',
+                'verbose_name_plural': '急上昇マンガ',
+                'ordering': ['category', 'position'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingmanga',
+            index=models.Index(fields=['category', 'position'], name='manga_trending_position_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='trendingmanga',
+            unique_together={('category', 'manga')},
+        ),
+    ]
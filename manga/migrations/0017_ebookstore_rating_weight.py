@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0016_trendingmanga'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ebookstore',
+            name='rating_weight',
+            field=models.FloatField(default=1.0, help_text='このストアの順位の点数に掛ける係数です。', verbose_name='レーティングの重み'),
+        ),
+    ]
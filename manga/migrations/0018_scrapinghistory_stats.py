@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('manga', '0017_ebookstore_rating_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scrapinghistory',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict, verbose_name='実行統計'),
+        ),
+    ]
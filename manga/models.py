@@ -1,4 +1,8 @@
-from django.db import models
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.utils import timezone
+from .normalization import normalize_title_key, title_block_keys
 
 class Category(models.Model):
     """マンガのカテゴリモデル"""
@@ -21,10 +25,123 @@ class Category(models.Model):
         verbose_name_plural = 'カテゴリ'
 
 
+class MangaManager(models.Manager):
+    """マンガモデルのマネージャ"""
+
+    # 1回のINSERTに含める最大行数
+    UPSERT_BATCH_SIZE = 500
+
+    def popular(self, category):
+        """
+        カテゴリ別の人気マンガ（レーティングの高い順）
+
+        Args:
+            category (str): カテゴリID（'all' の場合はすべてのマンガ）
+        """
+        if category == 'all':
+            return self.all().order_by('-rating')
+        return self.filter(categories__id=category).order_by('-rating')
+
+    def upsert_by_normalized_title(self, rows, return_created=False):
+        """
+        正規化タイトルをキーにマンガを一括で登録する
+
+        INSERT ... ON DUPLICATE KEY UPDATE（SQLite/PostgreSQLでは ON CONFLICT）を使うため、
+        複数のワーカーが同時に同じタイトルを登録しても重複は作成されません。
+        既存のマンガは第1巻タイトル（指定がある場合）と更新日時のみ更新します。
+
+        Args:
+            rows (list): 以下のキーを含む辞書のリスト
+                - title (str): タイトル（NFKC正規化済み）
+                - author (str): 著者名
+                - cover_image (str, optional): 表紙画像URL
+                - description (str, optional): 概要
+                - first_book_title (str, optional): 第1巻タイトル
+                - rating (int, optional): レーティング
+            return_created (bool): この呼び出しで新規作成した正規化タイトルも返すかどうか
+
+        Returns:
+            dict: 正規化タイトル → マンガID
+            （return_created=True の場合は (正規化タイトル → マンガID, 新規作成した正規化タイトルのset)）
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        created_at = timezone.now()
+        now = connection.ops.adapt_datetimefield_value(created_at)
+
+        # 同じキーが複数ある場合は先頭の行を採用する
+        unique_rows = {}
+        for row in rows:
+            unique_rows.setdefault(normalize_title_key(row['title']), row)
+        keys = list(unique_rows)
+
+        columns = [
+            'title', 'normalized_title', 'author', 'cover_image', 'description',
+            'first_book_title', 'free_chapters', 'free_books', 'rating', 'created_at', 'updated_at',
+        ]
+        column_sql = ', '.join(quote(c) for c in columns)
+        placeholders = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        if connection.vendor == 'mysql':
+            conflict_sql = (
+                f"ON DUPLICATE KEY UPDATE "
+                f"{quote('first_book_title')} = COALESCE(NULLIF(VALUES({quote('first_book_title')}), ''), {quote('first_book_title')}), "
+                f"{quote('updated_at')} = VALUES({quote('updated_at')})"
+            )
+        else:
+            conflict_sql = (
+                f"ON CONFLICT ({quote('normalized_title')}) DO UPDATE SET "
+                f"{quote('first_book_title')} = COALESCE(NULLIF(excluded.{quote('first_book_title')}, ''), {table}.{quote('first_book_title')}), "
+                f"{quote('updated_at')} = excluded.{quote('updated_at')}"
+            )
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(keys), self.UPSERT_BATCH_SIZE):
+                batch = keys[start:start + self.UPSERT_BATCH_SIZE]
+                params = []
+                for key in batch:
+                    row = unique_rows[key]
+                    params.extend([
+                        row['title'], key, row['author'],
+                        row.get('cover_image') or '', row.get('description') or '',
+                        row.get('first_book_title') or None,
+                        0, 0, row.get('rating') or 0, now, now,
+                    ])
+                cursor.execute(
+                    f"INSERT INTO {table} ({column_sql}) VALUES "
+                    f"{', '.join([placeholders] * len(batch))} {conflict_sql}",
+                    params
+                )
+
+        ids = {}
+        created = set()
+        for start in range(0, len(keys), self.UPSERT_BATCH_SIZE):
+            batch = keys[start:start + self.UPSERT_BATCH_SIZE]
+            # 既存の行は作成日時を更新しないため、この呼び出しの作成日時と一致する行が新規作成分になる
+            # （他のワーカーが同時に作成した行は含まれない）
+            for key, manga_id, row_created_at in self.using(self.db).filter(
+                normalized_title__in=batch
+            ).values_list('normalized_title', 'id', 'created_at'):
+                ids[key] = manga_id
+                if row_created_at == created_at:
+                    created.add(key)
+
+        # upsertはシグナルを発行しないため、新規作成分のブロッキングキーをここで作成する
+        MangaTitleBlock.objects.db_manager(self.db).build_missing(ids.values())
+        if return_created:
+            return ids, created
+        return ids
+
+
 class Manga(models.Model):
     """マンガモデル"""
     id = models.BigAutoField(primary_key=True)
     title = models.CharField(max_length=255)
+    normalized_title = models.CharField(
+        max_length=255, unique=True, null=True, blank=True, editable=False,
+        verbose_name='正規化タイトル',
+        help_text='重複判定用のキー（NFKC正規化・空白/句読点除去）。保存時に自動設定されます。'
+    )
     isbn = models.CharField(max_length=50, blank=True, null=True, verbose_name='ISBN')
     author = models.CharField(max_length=100)
     cover_image = models.URLField()
@@ -41,9 +158,37 @@ class Manga(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = MangaManager()
+    
     def __str__(self):
         return self.title
     
+    def _normalized_title_taken(self, key):
+        """他のマンガが同じ正規化タイトルを持っているかどうか"""
+        return Manga.objects.filter(normalized_title=key).exclude(pk=self.pk).exists()
+
+    def _is_legacy_duplicate(self):
+        """正規化タイトルが重複するため、マイグレーション 0010 で正規化タイトルをNULLのまま残した既存のマンガかどうか"""
+        return self.pk is not None and self.normalized_title is None
+
+    def clean(self):
+        super().clean()
+        key = normalize_title_key(self.title)
+        if key and not self._is_legacy_duplicate() and key != self.normalized_title and self._normalized_title_taken(key):
+            raise ValidationError({'title': '同じタイトル（正規化後）のマンガが既に登録されています。'})
+
+    def save(self, *args, **kwargs):
+        # 正規化タイトルはタイトルから再計算する
+        # （重複のためNULLのまま残したマンガは、他のマンガと重複しないタイトルになった場合のみ設定する）
+        key = normalize_title_key(self.title) or None
+        if key and self._is_legacy_duplicate() and self._normalized_title_taken(key):
+            key = None
+        self.normalized_title = key
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'normalized_title'}
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = 'マンガ'
         verbose_name_plural = 'マンガ'
@@ -58,6 +203,8 @@ class EbookStore(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='作成日時')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日時')
     deleted_at = models.DateTimeField(null=True, blank=True, verbose_name='削除日時')
+    rating_weight = models.FloatField(default=1.0, verbose_name='レーティングの重み',
+                                      help_text='このストアの順位の点数に掛ける係数です。')
     
     def __str__(self):
         return self.name
@@ -94,6 +241,8 @@ class ScrapingHistory(models.Model):
     finished_at = models.DateTimeField(null=True, blank=True, verbose_name='終了時間')
     is_success = models.BooleanField(default=False, verbose_name='成功フラグ')
     error_message = models.TextField(null=True, blank=True, verbose_name='エラーメッセージ')
+    # 処理時間の内訳・リクエスト数など（scripts/scrapers/metrics.py の ScrapeMetrics.to_dict()）
+    stats = models.JSONField(default=dict, blank=True, verbose_name='実行統計')
     
     def __str__(self):
         return f"{self.store.name} - {self.scraping_date}"
@@ -143,3 +292,326 @@ class ScrapedManga(models.Model):
         verbose_name_plural = 'スクレイピングマンガデータ'
         ordering = ['scraping_history', 'rank']
         unique_together = ['scraping_history', 'manga']
+
+
+class MangaTitleBlockManager(models.Manager):
+    """重複タイトル検出用ブロッキングキーのマネージャ"""
+
+    def rebuild(self, mangas):
+        """
+        指定したマンガのブロッキングキーを作り直す
+
+        Args:
+            mangas (iterable): (id, title, author) のタプル
+        """
+        blocks = []
+        manga_ids = []
+        for manga_id, title, author in mangas:
+            manga_ids.append(manga_id)
+            blocks.extend(
+                self.model(manga_id=manga_id, block_key=key)
+                for key in title_block_keys(title, author)
+            )
+        if not manga_ids:
+            return 0
+        self.filter(manga_id__in=manga_ids).delete()
+        self.bulk_create(blocks, batch_size=1000, ignore_conflicts=True)
+        return len(manga_ids)
+
+    def build_missing(self, manga_ids=None):
+        """
+        ブロッキングキーが未作成のマンガについて作成する
+
+        Args:
+            manga_ids (iterable, optional): 対象のマンガID。省略時は全マンガ
+
+        Returns:
+            int: 作成したマンガの件数
+        """
+        mangas = Manga.objects.using(self.db).filter(title_blocks__isnull=True)
+        if manga_ids is not None:
+            manga_ids = list(manga_ids)
+            if not manga_ids:
+                return 0
+            mangas = mangas.filter(id__in=manga_ids)
+        built = 0
+        batch = []
+        for row in mangas.order_by().values_list('id', 'title', 'author').iterator():
+            batch.append(row)
+            if len(batch) >= 1000:
+                built += self.rebuild(batch)
+                batch = []
+        built += self.rebuild(batch)
+        return built
+
+
+class MangaTitleBlock(models.Model):
+    """
+    重複タイトル検出用のブロッキングキー
+
+    シリーズタイトルと著者から計算したMinHash LSHのバンドを保持し、
+    同じキーを共有するマンガ同士だけを重複候補として比較します。
+    """
+    manga = models.ForeignKey('Manga', on_delete=models.CASCADE, related_name='title_blocks', verbose_name='マンガ')
+    block_key = models.CharField(max_length=24, db_index=True, verbose_name='ブロッキングキー')
+    
+    objects = MangaTitleBlockManager()
+    
+    def __str__(self):
+        return f"{self.manga_id} - {self.block_key}"
+    
+    class Meta:
+        verbose_name = '重複検出ブロッキングキー'
+        verbose_name_plural = '重複検出ブロッキングキー'
+        unique_together = ['manga', 'block_key']
+
+
+class DataGenerationManager(models.Manager):
+    """データ世代のマネージャ"""
+
+    def get_generation(self, name):
+        """指定したデータの現在の世代を取得する（未作成の場合は0）"""
+        return self.filter(name=name).values_list('generation', flat=True).first() or 0
+
+    def bump(self, name):
+        """
+        指定したデータの世代を1つ進める
+
+        Returns:
+            int: 新しい世代
+        """
+        self.get_or_create(name=name)
+        self.filter(name=name).update(generation=models.F('generation') + 1, updated_at=timezone.now())
+        return self.get_generation(name)
+
+
+class DataGeneration(models.Model):
+    """
+    データの世代
+
+    バッチ処理でデータを更新したときに世代を進め、各ワーカーのメモリ上のキャッシュ
+    （入力補完の索引など）は世代が変わったときに作り直します。
+    """
+    # レーティング更新ジョブ（scripts/update_manga_ratings.py）が更新するデータ
+    RATINGS = 'ratings'
+
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='データ名')
+    generation = models.PositiveBigIntegerField(default=0, verbose_name='世代')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日時')
+    
+    objects = DataGenerationManager()
+    
+    def __str__(self):
+        return f"{self.name} ({self.generation})"
+    
+    class Meta:
+        verbose_name = 'データ世代'
+        verbose_name_plural = 'データ世代'
+
+
+class MangaDailyRankingManager(models.Manager):
+    """マンガの日次ランキング集計のマネージャ"""
+
+    def summarize_date(self, scraping_date, ratings=None):
+        """
+        指定した日のスクレイピングデータ（ScrapedManga）をマンガごとの日次集計にまとめる
+
+        成功したスクレイピング履歴のみを対象とし、同じストアの履歴が複数ある場合は最新のものを使います。
+        すでに集計がある場合はストア別の順位を統合して更新します（何度実行しても同じ結果になります）。
+
+        Args:
+            scraping_date (date): スクレイピング日
+            ratings (dict, optional): マンガID → その日に計算したレーティング（レーティング更新ジョブから指定）
+
+        Returns:
+            int: 作成・更新した集計の件数
+        """
+        # ストアごとの最新の成功した履歴（失敗した実行の途中までのデータは集計しない）
+        history_ids = {}
+        for history_id, store_id in (
+            ScrapingHistory.objects.using(self.db)
+            .filter(scraping_date=scraping_date, is_success=True)
+            .order_by('store_id', '-started_at', '-id')
+            .values_list('id', 'store_id')
+        ):
+            history_ids.setdefault(store_id, history_id)
+
+        summaries = {}
+        for manga_id, store_id, rank, free_chapters, free_books in (
+            ScrapedManga.objects.using(self.db)
+            .filter(scraping_history_id__in=list(history_ids.values()))
+            .order_by()
+            .values_list('manga_id', 'scraping_history__store_id', 'rank', 'free_chapters', 'free_books')
+            .iterator()
+        ):
+            summary = summaries.setdefault(manga_id, {'ranks': {}, 'free_chapters': 0, 'free_books': 0})
+            summary['ranks'][str(store_id)] = rank
+            summary['free_chapters'] = max(summary['free_chapters'], free_chapters)
+            summary['free_books'] = max(summary['free_books'], free_books)
+        if not summaries:
+            return 0
+
+        existing = {
+            row.manga_id: row
+            for row in self.filter(date=scraping_date, manga_id__in=list(summaries))
+        }
+        to_create = []
+        to_update = []
+        for manga_id, summary in summaries.items():
+            row = existing.get(manga_id)
+            if row is None:
+                row = self.model(manga_id=manga_id, date=scraping_date, ranks={})
+                to_create.append(row)
+            else:
+                to_update.append(row)
+            row.ranks = {**row.ranks, **summary['ranks']}
+            row.best_rank = min(row.ranks.values())
+            row.free_chapters = max(row.free_chapters, summary['free_chapters'])
+            row.free_books = max(row.free_books, summary['free_books'])
+            if ratings and manga_id in ratings:
+                row.rating = ratings[manga_id]
+        self.bulk_create(to_create, batch_size=1000)
+        self.bulk_update(to_update, ['ranks', 'best_rank', 'free_chapters', 'free_books', 'rating'], batch_size=1000)
+        return len(summaries)
+
+
+class MangaDailyRanking(models.Model):
+    """
+    マンガの日次ランキング集計
+
+    レーティング更新ジョブがその日の順位とレーティングを追記し、順位推移API（/manga/{id}/history/）で参照します。
+    ScrapedManga はストア・日ごとに1行ずつ増え続けるため、保持期間を過ぎた行は
+    scripts/compact_scraped_mangas.py でマンガ・日ごとの1行にまとめてから削除します。
+    （ScrapedManga の主キーは id のみで、MySQLのパーティショニングに必要な「パーティションキーを含む主キー」に
+    できないため、日付によるパーティショニングの代わりにこの集計テーブルへ移し替えます）
+    """
+    manga = models.ForeignKey('Manga', on_delete=models.CASCADE, related_name='daily_rankings', verbose_name='マンガ')
+    date = models.DateField(verbose_name='日付')
+    # ストアID（文字列）→ 順位
+    ranks = models.JSONField(default=dict, verbose_name='ストア別順位')
+    best_rank = models.PositiveIntegerField(verbose_name='最高順位')
+    rating = models.PositiveIntegerField(default=0, verbose_name='レーティング')
+    free_chapters = models.IntegerField(default=0, verbose_name='無料話数')
+    free_books = models.IntegerField(default=0, verbose_name='無料冊数')
+    
+    objects = MangaDailyRankingManager()
+    
+    def __str__(self):
+        return f"{self.manga_id} - {self.date} (Rank: {self.best_rank})"
+    
+    class Meta:
+        verbose_name = 'マンガ日次ランキング'
+        verbose_name_plural = 'マンガ日次ランキング'
+        ordering = ['manga', 'date']
+        # (manga, date) の一意インデックスでマンガごとの期間指定を1回の範囲検索で取得できる
+        unique_together = ['manga', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='manga_daily_date_idx'),
+        ]
+
+
+class TrendingMangaManager(models.Manager):
+    """急上昇マンガのマネージャ"""
+
+    # 順位を比較する日数
+    TRENDING_DAYS = 7
+
+    # カテゴリごとに保持する件数
+    TRENDING_LIMIT = 100
+
+    def rebuild(self, target_date, days=TRENDING_DAYS, limit=TRENDING_LIMIT):
+        """
+        日次ランキング集計（MangaDailyRanking）から急上昇マンガを計算し、テーブルを作り直す
+
+        対象日の最高順位と days 日前（その日の集計がない場合はそれ以前で最も近い日）の最高順位を比べ、
+        順位が上がったマンガを上昇幅の大きい順にカテゴリごとに limit 件保存します。
+        比較する日に順位がなかったマンガは、その日の最下位の次の順位から上がったものとして扱います。
+
+        Args:
+            target_date (date): 対象日
+            days (int): 順位を比較する日数
+            limit (int): カテゴリごとに保存する件数
+
+        Returns:
+            int: 保存した件数
+        """
+        daily = MangaDailyRanking.objects.using(self.db)
+        previous_date = (
+            daily.filter(date__lte=target_date - timedelta(days=days), date__gt=target_date - timedelta(days=days * 2))
+            .order_by('-date')
+            .values_list('date', flat=True)
+            .first()
+        )
+        current = {}
+        previous = {}
+        if previous_date is not None:
+            for manga_id, day, best_rank in (
+                daily.filter(date__in=[previous_date, target_date])
+                .order_by()
+                .values_list('manga_id', 'date', 'best_rank')
+                .iterator()
+            ):
+                (current if day == target_date else previous)[manga_id] = best_rank
+
+        # 順位の変化を1回のループでまとめて計算する
+        out_of_rank = max(previous.values(), default=0) + 1
+        rising = {}
+        for manga_id, rank in current.items():
+            previous_rank = previous.get(manga_id)
+            delta = (previous_rank or out_of_rank) - rank
+            if delta > 0:
+                rising[manga_id] = (rank, previous_rank, delta)
+
+        candidates = {'all': list(rising)}
+        for manga_id, category_id in (
+            Manga.categories.through.objects.using(self.db)
+            .filter(manga_id__in=list(rising))
+            .values_list('manga_id', 'category_id')
+        ):
+            if category_id != 'all':
+                candidates.setdefault(category_id, []).append(manga_id)
+
+        entries = []
+        for category_id, manga_ids in candidates.items():
+            manga_ids.sort(key=lambda manga_id: (-rising[manga_id][2], rising[manga_id][0], manga_id))
+            for position, manga_id in enumerate(manga_ids[:limit], start=1):
+                rank, previous_rank, delta = rising[manga_id]
+                entries.append(self.model(
+                    category=category_id, manga_id=manga_id, position=position, date=target_date,
+                    current_rank=rank, previous_rank=previous_rank, rank_delta=delta,
+                ))
+
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create(entries, batch_size=1000)
+        return len(entries)
+
+
+class TrendingManga(models.Model):
+    """
+    カテゴリ別の急上昇マンガ
+
+    レーティング更新ジョブが日次ランキング集計から計算して作り直し、
+    急上昇マンガリストAPI（/manga/trending/{カテゴリ}/）で参照します。
+    """
+    category = models.CharField(max_length=20, choices=Category.CATEGORY_CHOICES, verbose_name='カテゴリ')
+    manga = models.ForeignKey('Manga', on_delete=models.CASCADE, related_name='trending_entries', verbose_name='マンガ')
+    position = models.PositiveIntegerField(verbose_name='表示順')
+    date = models.DateField(verbose_name='対象日')
+    current_rank = models.PositiveIntegerField(verbose_name='現在の順位')
+    previous_rank = models.PositiveIntegerField(null=True, blank=True, verbose_name='比較日の順位')
+    rank_delta = models.IntegerField(verbose_name='順位の上昇幅')
+    
+    objects = TrendingMangaManager()
+    
+    def __str__(self):
+        return f"{self.category} #{self.position}: {self.manga_id} (+{self.rank_delta})"
+    
+    class Meta:
+        verbose_name = '急上昇マンガ'
+        verbose_name_plural = '急上昇マンガ'
+        ordering = ['category', 'position']
+        unique_together = ['category', 'manga']
+        indexes = [
+            models.Index(fields=['category', 'position'], name='manga_trending_position_idx'),
+        ]
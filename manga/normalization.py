@@ -0,0 +1,152 @@
+"""
+タイトルの正規化処理
+"""
+import hashlib
+import re
+import unicodedata
+import zlib
+from functools import lru_cache
+
+
+@lru_cache(maxsize=8192)
+def normalize_title_key(title):
+    """
+    重複判定用のタイトルキーを生成する
+
+    NFKCで全角・半角を統一し、大文字小文字を揃えたうえで
+    空白と句読点・記号類を取り除きます。
+    記号のみのタイトルなどでキーが空になる場合はNFKC正規化のみの値を返します。
+
+    Args:
+        title (str): タイトル
+
+    Returns:
+        str: 正規化したキー
+    """
+    if not title:
+        return ''
+    normalized = unicodedata.normalize('NFKC', title).casefold()
+    key = ''.join(
+        ch for ch in normalized
+        if not ch.isspace() and unicodedata.category(ch)[0] not in ('P', 'Z')
+    )
+    # Manga.normalized_title の最大長に合わせる
+    return (key or normalized.strip())[:255]
+
+
+# 巻数・話数などシリーズ内で変化する末尾表記
+_VOLUME_SUFFIX_RE = re.compile(
+    r'(?:\s*(?:第?\d+(?:巻|話|集)?|vol\.?\s*\d+|上|中|下|前編|後編))+\s*$',
+    re.IGNORECASE
+)
+# 【分冊版】（1）[単話] などの括弧で囲まれた付加情報
+_BRACKET_RE = re.compile(r'[【\[［(（〔<＜].*?[】\]］)）〕>＞]')
+
+# タイトルの一部として続けて書かれた数字（「ゴルゴ13」の13など）
+# 第N・N巻・N話・N集・vol.N の巻数表記と、空白で区切られた数字は含めない
+_TITLE_NUMBER_RE = re.compile(r'(?<=[^\s\d第.])(?<!vol)(?<!vol\.)\d+(?![\d巻話集])', re.IGNORECASE)
+
+# MinHashの設定（変更するとブロッキングキーの再構築が必要）
+MINHASH_PERMUTATIONS = 32
+MINHASH_BANDS = 16
+_MINHASH_PRIME = (1 << 61) - 1
+_MINHASH_SEEDS = [
+    (
+        int.from_bytes(hashlib.blake2b(f'a{i}'.encode(), digest_size=8).digest(), 'big') % _MINHASH_PRIME or 1,
+        int.from_bytes(hashlib.blake2b(f'b{i}'.encode(), digest_size=8).digest(), 'big') % _MINHASH_PRIME,
+    )
+    for i in range(MINHASH_PERMUTATIONS)
+]
+
+
+@lru_cache(maxsize=8192)
+def series_title_key(title):
+    """
+    ストア間で表記揺れするシリーズタイトルのキーを生成する
+
+    括弧で囲まれた付加情報（【分冊版】、（1）など）と末尾の巻数・話数表記を取り除いたうえで
+    normalize_title_key() を適用します。取り除いた結果が空になる場合は元のキーを返します。
+    """
+    if not title:
+        return ''
+    text = unicodedata.normalize('NFKC', title)
+    stripped = _BRACKET_RE.sub(' ', text)
+    stripped = _VOLUME_SUFFIX_RE.sub('', stripped.strip())
+    return normalize_title_key(stripped) if stripped.strip() else normalize_title_key(text)
+
+
+def title_numbers(title):
+    """
+    タイトルの一部として続けて書かれた数字を返す
+
+    series_title_key() は末尾の数字を巻数とみなして取り除くため、「ゴルゴ13」と「ゴルゴ」のように
+    数字だけが異なる別作品も同じキーになります。重複判定ではこの値も比較します。
+
+    Returns:
+        tuple: 数字（int）のタプル
+    """
+    if not title:
+        return ()
+    text = _BRACKET_RE.sub(' ', unicodedata.normalize('NFKC', title))
+    return tuple(int(number) for number in _TITLE_NUMBER_RE.findall(text))
+
+
+def title_shingles(text, size=2):
+    """
+    文字n-gram（既定はbigram）の集合を返す
+    """
+    if not text:
+        return set()
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    """2つの集合のJaccard係数"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signature(shingles):
+    """
+    shingle集合のMinHashシグネチャを計算する
+    プロセスをまたいで同じ値になるよう、組み込みの hash() ではなくCRC32を使います
+    """
+    hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles]
+    if not hashes:
+        return []
+    return [
+        min((a * h + b) % _MINHASH_PRIME for h in hashes)
+        for a, b in _MINHASH_SEEDS
+    ]
+
+
+def title_block_keys(title, author=None):
+    """
+    重複タイトル検出用のブロッキングキー（MinHash LSHのバンド）を生成する
+
+    シリーズタイトルのbigramに著者キーを1要素として加えた集合からMinHashを計算し、
+    MINHASH_BANDS個のバンドごとにハッシュ化したキーを返します。
+    似たタイトル同士は高い確率で少なくとも1つのキーを共有します。
+
+    Returns:
+        list: ブロッキングキー（最大24文字）のリスト
+    """
+    shingles = title_shingles(series_title_key(title))
+    author_key = normalize_title_key(author) if author and author != '不明' else ''
+    if author_key:
+        shingles.add('@' + author_key)
+    signature = minhash_signature(shingles)
+    if not signature:
+        return []
+    rows = len(signature) // MINHASH_BANDS
+    keys = []
+    for band in range(MINHASH_BANDS):
+        values = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(
+            ','.join(str(v) for v in values).encode(), digest_size=10
+        ).hexdigest()
+        keys.append(f'{band:02d}{digest}')
+    return keys
@@ -0,0 +1,107 @@
+"""
+マンガのレーティングの計算
+
+ストアごとのランキング順位を点数に変換し、ストアの重み（EbookStore.rating_weight）を掛けて合計します。
+対象日にスクレイピングに失敗したストアは、直近 CARRY_FORWARD_DAYS 日以内に成功した日の順位を
+1日ごとに DECAY_PER_DAY を掛けて減衰させて使うため、1つのストアの失敗でレーティングが大きく下がりません。
+"""
+import logging
+from datetime import timedelta
+from .models import ScrapedManga, ScrapingHistory
+
+logger = logging.getLogger(__name__)
+
+# 1〜10位の点数（11位以下は 100-順位点、100位以下は0点）
+RANK_POINTS = {1: 1000, 2: 750, 3: 500, 4: 300, 5: 250, 6: 200, 7: 175, 8: 150, 9: 125, 10: 100}
+
+# レーティングの上限
+MAX_RATING = 100000
+
+# スクレイピングに失敗したストアの順位を引き継ぐ最大日数
+CARRY_FORWARD_DAYS = 3
+
+# 引き継いだ順位の点数に1日ごとに掛ける係数
+DECAY_PER_DAY = 0.5
+
+
+def rank_points(rank):
+    """
+    ランキング順位を点数に変換する
+
+    Args:
+        rank (int): 順位
+
+    Returns:
+        int: 点数
+    """
+    if rank in RANK_POINTS:
+        return RANK_POINTS[rank]
+    if rank >= 11:
+        return max(0, 100 - rank)
+    return 0
+
+
+def latest_histories(target_date, carry_forward_days=CARRY_FORWARD_DAYS):
+    """
+    ストアごとに、対象日以前で直近 carry_forward_days 日以内に成功したスクレイピング履歴を取得する
+
+    Returns:
+        list: ScrapingHistory のリスト（store を select_related 済み）
+    """
+    histories = (
+        ScrapingHistory.objects
+        .filter(
+            is_success=True,
+            scraping_date__lte=target_date,
+            scraping_date__gte=target_date - timedelta(days=carry_forward_days),
+        )
+        .select_related('store')
+        .order_by('store_id', '-scraping_date')
+    )
+    latest = {}
+    for history in histories:
+        latest.setdefault(history.store_id, history)
+    return list(latest.values())
+
+
+def store_factor(history, target_date, decay_per_day=DECAY_PER_DAY):
+    """スクレイピング履歴の順位に掛ける係数（ストアの重み × 経過日数による減衰）"""
+    age = (target_date - history.scraping_date).days
+    return history.store.rating_weight * decay_per_day ** age
+
+
+def compute_ratings(target_date, histories=None):
+    """
+    対象日のレーティングと無料話数・無料巻数をまとめて計算する
+
+    ストアごとの直近の成功したスクレイピングデータを1回のクエリで取得して計算します。
+
+    Args:
+        target_date (date): 対象日
+        histories (list, optional): 使用するスクレイピング履歴（省略時は latest_histories() の結果）
+
+    Returns:
+        dict: マンガID → {'rating', 'free_chapters', 'free_books'}
+    """
+    if histories is None:
+        histories = latest_histories(target_date)
+    factors = {history.id: store_factor(history, target_date) for history in histories}
+    if not factors:
+        return {}
+
+    results = {}
+    for manga_id, history_id, rank, free_chapters, free_books in (
+        ScrapedManga.objects
+        .filter(scraping_history_id__in=list(factors))
+        .order_by()
+        .values_list('manga_id', 'scraping_history_id', 'rank', 'free_chapters', 'free_books')
+        .iterator()
+    ):
+        result = results.setdefault(manga_id, {'rating': 0.0, 'free_chapters': 0, 'free_books': 0})
+        result['rating'] += rank_points(rank) * factors[history_id]
+        result['free_chapters'] = max(result['free_chapters'], free_chapters)
+        result['free_books'] = max(result['free_books'], free_books)
+
+    for result in results.values():
+        result['rating'] = min(MAX_RATING, int(round(result['rating'])))
+    return results
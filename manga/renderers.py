@@ -0,0 +1,34 @@
+"""
+orjson を使った高速なJSONレンダラー
+
+orjson がインストールされていない環境では DRF 標準の JSONRenderer と同じ処理になります。
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    orjson でレスポンスをJSONに変換するレンダラー
+
+    DRF の JSONRenderer と同じく非ASCII文字はエスケープせず、空白なしで出力します。
+    orjson が直接扱えない型（Decimal、遅延翻訳文字列など）は DRF の JSONEncoder で変換します。
+    """
+    _encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=self._encoder.default, option=option)
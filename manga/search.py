@@ -0,0 +1,103 @@
+"""
+マンガのタイトル・著者検索
+
+MySQL では ngram パーサーの FULLTEXT インデックス（manga_manga_title_author_ft、マイグレーション 0012）を使い、
+それ以外のDBや1文字の検索語では LIKE による部分一致で検索します。
+FULLTEXT で検索した場合は関連度の高い順（同じ関連度ではレーティングの高い順）、それ以外はレーティングの高い順に並べます。
+前方一致（入力補完）は一意インデックスのある normalized_title の前方一致で検索するため、著者は対象外です
+（著者も前方一致で検索する場合は /manga/suggest/ を使います）。
+"""
+import unicodedata
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Func, Q
+from .normalization import normalize_title_key
+
+# FULLTEXT インデックスの名前（マイグレーション 0012 で作成）
+FULLTEXT_INDEX_NAME = 'manga_manga_title_author_ft'
+
+# MySQL の ngram_token_size（既定値 2）。これより短い検索語は FULLTEXT では検索できない
+NGRAM_TOKEN_SIZE = 2
+
+# 検索語の最大文字数
+MAX_QUERY_LENGTH = 100
+
+
+def normalize_query(query):
+    """検索語をタイトルと同じくNFKCで正規化し、前後の空白を取り除く"""
+    return unicodedata.normalize('NFKC', query or '').strip()[:MAX_QUERY_LENGTH]
+
+
+def _boolean_mode_phrase(query):
+    """
+    BOOLEAN MODE の検索式を作成する
+
+    演算子として解釈される記号を取り除き、空白で区切られた語をそれぞれフレーズとして必須にします。
+    （ngram パーサーではフレーズ検索により語のbigramが連続して現れるものだけが一致します）
+    """
+    terms = []
+    for term in query.replace('"', ' ').split():
+        term = term.strip('+-<>()~*@')
+        if term:
+            terms.append(f'+"{term}"')
+    return ' '.join(terms)
+
+
+class MatchAgainst(Func):
+    """
+    MATCH (列, ...) AGAINST (検索式 IN BOOLEAN MODE)
+
+    MySQL の FULLTEXT 検索です。既定では関連度（FloatField）を返し、output_field=BooleanField() を指定すると
+    filter() の条件として使えます（WHERE 句では FULLTEXT インデックスで検索されます）。
+    """
+    template = 'MATCH (%(expressions)s) AGAINST (%%s IN BOOLEAN MODE)'
+
+    def __init__(self, *expressions, query, output_field=None):
+        super().__init__(*expressions, output_field=output_field or FloatField())
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, **extra_context)
+        return sql, (*params, self.query)
+
+
+def search_mangas(queryset, query, prefix=False):
+    """
+    タイトル・著者でマンガを検索する
+
+    Args:
+        queryset (QuerySet): 検索対象のマンガのクエリセット
+        query (str): 検索語
+        prefix (bool): Trueの場合はタイトルの前方一致で検索する（入力補完用、著者は対象外）
+
+    Returns:
+        QuerySet: 検索結果（FULLTEXT の場合は関連度の高い順、それ以外はレーティングの高い順）
+    """
+    query = normalize_query(query)
+    if not query:
+        return queryset.none()
+
+    if prefix:
+        key = normalize_title_key(query)
+        return queryset.filter(normalized_title__startswith=key).order_by('-rating', 'id')
+
+    terms = query.split()
+    use_fulltext = (
+        connections[queryset.db].vendor == 'mysql'
+        and all(len(term) >= NGRAM_TOKEN_SIZE for term in terms)
+    )
+    if use_fulltext:
+        phrase = _boolean_mode_phrase(query)
+        if phrase:
+            return (
+                queryset
+                .filter(MatchAgainst('title', 'author', query=phrase, output_field=BooleanField()))
+                .annotate(relevance=MatchAgainst('title', 'author', query=phrase))
+                .order_by('-relevance', '-rating', 'id')
+            )
+
+    # FULLTEXT が使えない場合はすべての語を含むものを部分一致で検索する
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(author__icontains=term)
+    return queryset.filter(condition).order_by('-rating', 'id')
+
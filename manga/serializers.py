@@ -19,7 +19,14 @@ class EbookStoreDetailSerializer(serializers.Serializer):
 
 
 class MangaSerializer(serializers.ModelSerializer):
-    """マンガのシリアライザ"""
+    """
+    マンガのシリアライザ
+
+    fields 引数で出力するフィールドを絞り込めます（例: MangaSerializer(manga, fields=COMPACT_FIELDS)）
+    """
+    # 一覧画面で使用するフィールド（view=compact）
+    COMPACT_FIELDS = ['id', 'title', 'cover_image', 'rating']
+
     # カテゴリーをIDのみで表示するため、StringRelatedFieldを使用
     categories = serializers.StringRelatedField(many=True)
     # 電子書籍ストア情報
@@ -33,10 +40,16 @@ class MangaSerializer(serializers.ModelSerializer):
             'free_chapters', 'free_books', 'ebookstores'
         ]
         read_only_fields = ['id']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
     
     @swagger_serializer_method(serializer_or_field=EbookStoreDetailSerializer(many=True))
     def get_ebookstores(self, obj):
-        detail_urls = MangaEbookStore.objects.filter(manga=obj).select_related('ebookstore')
+        # ビューで prefetch_related('store_detail_urls__ebookstore') されていればクエリは発生しない
         return [
             {
                 'ebookstore_name': d.ebookstore.name,
@@ -44,5 +57,95 @@ class MangaSerializer(serializers.ModelSerializer):
                 'free_chapters': d.free_chapters,
                 'free_books': d.free_books
             }
-            for d in detail_urls
-        ]
\ No newline at end of file
+            for d in obj.store_detail_urls.all()
+        ]
+
+
+class MangaValuesSerializer:
+    """
+    マンガ一覧用の高速なシリアライザ
+
+    MangaSerializer と同じ形式の出力を、モデルインスタンスやDRFのフィールドを経由せずに
+    values() の行と、カテゴリ・ストア情報をまとめて取得した辞書から組み立てます。
+    一覧APIのように多数のマンガを出力する場合に使用します。
+
+    Usage:
+        serializer = MangaValuesSerializer(fields=['id', 'title'])
+        rows = serializer.values_queryset(Manga.objects.order_by('-rating'))[:100]
+        data = serializer.serialize(rows)
+    """
+
+    def __init__(self, fields=None, extra_fields=()):
+        """
+        Args:
+            fields (list, optional): 出力するフィールド（省略時はすべて）
+            extra_fields (iterable): マンガのフィールドの後に出力する annotate() した値の名前
+        """
+        self.fields = [f for f in MangaSerializer.Meta.fields if fields is None or f in fields]
+        self.fields.extend(extra_fields)
+        concrete_fields = {f.name for f in Manga._meta.concrete_fields}
+        self.columns = [f for f in self.fields if f in concrete_fields or f in extra_fields]
+        if 'id' not in self.columns:
+            self.columns.insert(0, 'id')
+
+    def values_queryset(self, queryset):
+        """出力に必要なカラムのみを取得する values() のクエリセットを返す"""
+        return queryset.values(*self.columns)
+
+    def serialize(self, rows):
+        """
+        values() の行を MangaSerializer と同じ形式の辞書のリストに変換する
+
+        Args:
+            rows (iterable): values_queryset() の行
+
+        Returns:
+            list: マンガの辞書のリスト
+        """
+        rows = list(rows)
+        manga_ids = [row['id'] for row in rows]
+        categories = self._categories(manga_ids) if 'categories' in self.fields else None
+        ebookstores = self._ebookstores(manga_ids) if 'ebookstores' in self.fields else None
+
+        fields = self.fields
+        data = []
+        for row in rows:
+            item = {}
+            for field in fields:
+                if field == 'categories':
+                    item[field] = categories.get(row['id'], [])
+                elif field == 'ebookstores':
+                    item[field] = ebookstores.get(row['id'], [])
+                else:
+                    item[field] = row[field]
+            data.append(item)
+        return data
+
+    @staticmethod
+    def _categories(manga_ids):
+        """マンガID → カテゴリ名のリスト"""
+        categories = {}
+        through = Manga.categories.through
+        for manga_id, name in (
+            through.objects.filter(manga_id__in=manga_ids)
+            .order_by('id')
+            .values_list('manga_id', 'category__name')
+        ):
+            categories.setdefault(manga_id, []).append(name)
+        return categories
+
+    @staticmethod
+    def _ebookstores(manga_ids):
+        """マンガID → ストア情報のリスト（EbookStoreDetailSerializer と同じ形式）"""
+        ebookstores = {}
+        for manga_id, name, url, free_chapters, free_books in (
+            MangaEbookStore.objects.filter(manga_id__in=manga_ids)
+            .values_list('manga_id', 'ebookstore__name', 'url', 'free_chapters', 'free_books')
+        ):
+            ebookstores.setdefault(manga_id, []).append({
+                'ebookstore_name': name,
+                'manga_detail_url': url,
+                'free_chapters': free_chapters,
+                'free_books': free_books,
+            })
+        return ebookstores
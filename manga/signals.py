@@ -0,0 +1,27 @@
+"""
+マンガアプリのシグナルハンドラ
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .cache import category_cache
+from .models import Category, EbookStore, EbookStoreCategoryUrl, Manga, MangaTitleBlock
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=EbookStore)
+@receiver([post_save, post_delete], sender=EbookStoreCategoryUrl)
+def invalidate_category_cache(sender, **kwargs):
+    """カテゴリ・ストア・カテゴリURLが変更されたらキャッシュを破棄する"""
+    category_cache.invalidate()
+
+
+@receiver(post_save, sender=Manga)
+def rebuild_title_blocks(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """タイトルまたは著者が保存されたら重複検出用のブロッキングキーを作り直す"""
+    if raw:
+        return
+    if not created and update_fields is not None and not {'title', 'author'} & set(update_fields):
+        return
+    MangaTitleBlock.objects.db_manager(kwargs.get('using')).rebuild(
+        [(instance.id, instance.title, instance.author)]
+    )
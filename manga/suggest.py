@@ -0,0 +1,221 @@
+"""
+入力補完（サジェスト）用のメモリ上の索引
+
+マンガのタイトル・シリーズタイトル・著者の正規化キーをソート済みの配列に持ち、
+二分探索で前方一致する範囲を求めてレーティングの高い順に返します。
+1〜2文字の短い入力は候補が多いため、索引の作成時に上位の候補を計算しておきます。
+それより長い入力でも前方一致する範囲が広い場合は、最初の検索時に範囲全体から上位の候補を計算して保持します。
+
+索引はワーカーごとに最初の利用時に作成し、DataGeneration の世代
+（レーティング更新ジョブが進める）が変わったときはバックグラウンドのスレッドで作り直します。
+作り直している間は古い索引を返し、作成が終わったら新しい索引に切り替えます。
+"""
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from django.db import connections
+from .cache import generation_cache
+from .models import DataGeneration, Manga
+from .normalization import normalize_title_key, series_title_key
+
+logger = logging.getLogger(__name__)
+
+# 索引の作成時に上位の候補を計算しておく入力の文字数
+PRECOMPUTED_PREFIX_LENGTH = 2
+
+# 返す候補の最大件数
+MAX_SUGGESTIONS = 20
+
+# 前方一致する範囲がこれより広い場合は、範囲全体から計算した上位の候補を入力ごとに保持する
+MAX_SCAN = 5000
+
+# 索引の作り直しに失敗した場合に再試行するまでの秒数
+REBUILD_RETRY_SECONDS = 60
+
+# 前方一致の範囲の終端（どの文字よりも大きい文字）
+_MAX_CHAR = '\U0010ffff'
+
+
+class SuggestIndex:
+    """
+    前方一致検索用のソート済み配列
+
+    mangas は (id, title, author, rating) のタプル、keys と refs は
+    正規化キーとそのキーを持つマンガの位置をキーの順に並べた配列です。
+    """
+
+    def __init__(self, rows, generation=0):
+        """
+        Args:
+            rows (iterable): (id, title, author, rating) のタプル
+            generation (int): 索引を作成したときのデータの世代
+        """
+        self.generation = generation
+        self.mangas = []
+        entries = []
+        for row in rows:
+            position = len(self.mangas)
+            self.mangas.append(tuple(row))
+            manga_id, title, author, rating = row
+            keys = {normalize_title_key(title), series_title_key(title)}
+            if author and author != '不明':
+                keys.add(normalize_title_key(author))
+            entries.extend((key, position) for key in keys if key)
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.refs = [position for _, position in entries]
+        self.top = self._precompute_top()
+        # 前方一致する範囲が MAX_SCAN より広い入力ごとの上位の候補（最初の検索時に計算する）
+        self.wide_top = {}
+
+    def __len__(self):
+        return len(self.mangas)
+
+    def _precompute_top(self):
+        """短い入力ごとの上位の候補（マンガの位置のリスト）を計算する"""
+        heaps = {}
+        for key, position in zip(self.keys, self.refs):
+            rating = self.mangas[position][3]
+            for length in range(1, min(PRECOMPUTED_PREFIX_LENGTH, len(key)) + 1):
+                heap = heaps.setdefault(key[:length], [])
+                item = (rating, -position)
+                if len(heap) < MAX_SUGGESTIONS * 2:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        # 同じマンガが複数のキーで入っている場合があるため、多めに保持してから重複を除く
+        top = {}
+        for prefix, heap in heaps.items():
+            positions = []
+            for _, negative_position in sorted(heap, reverse=True):
+                if -negative_position not in positions:
+                    positions.append(-negative_position)
+            top[prefix] = positions[:MAX_SUGGESTIONS]
+        return top
+
+    def _top_positions(self, start, end, limit):
+        """keys[start:end] の範囲のマンガの位置をレーティングの高い順に返す"""
+        candidates = set(self.refs[start:end])
+        return heapq.nlargest(limit, candidates, key=lambda p: (self.mangas[p][3], -p))
+
+    def suggest(self, text, limit=10):
+        """
+        入力に前方一致するマンガをレーティングの高い順に返す
+
+        Args:
+            text (str): 入力中の文字列
+            limit (int): 最大件数
+
+        Returns:
+            list: {'id', 'title', 'author', 'rating'} の辞書のリスト
+        """
+        key = normalize_title_key(text)
+        if not key:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        if len(key) <= PRECOMPUTED_PREFIX_LENGTH:
+            positions = self.top.get(key, [])[:limit]
+        else:
+            start = bisect_left(self.keys, key)
+            end = bisect_left(self.keys, key + _MAX_CHAR, start)
+            if end - start <= MAX_SCAN:
+                positions = self._top_positions(start, end, limit)
+            else:
+                # 範囲の先頭だけでは評価の高いマンガが漏れるため、範囲全体の上位を一度だけ計算する
+                positions = self.wide_top.get(key)
+                if positions is None:
+                    positions = self.wide_top[key] = self._top_positions(start, end, MAX_SUGGESTIONS)
+                positions = positions[:limit]
+
+        return [
+            {'id': manga_id, 'title': title, 'author': author, 'rating': rating}
+            for manga_id, title, author, rating in (self.mangas[p] for p in positions)
+        ]
+
+    @classmethod
+    def build(cls, generation=None, using=None):
+        """DBのマンガから索引を作成する"""
+        if generation is None:
+            generation = DataGeneration.objects.db_manager(using).get_generation(DataGeneration.RATINGS)
+        rows = (
+            Manga.objects.db_manager(using).order_by()
+            .values_list('id', 'title', 'author', 'rating')
+            .iterator(chunk_size=10000)
+        )
+        return cls(rows, generation)
+
+
+class SuggestIndexHolder:
+    """
+    ワーカーごとの索引を保持する
+
+    最初の利用時に索引を作成し、世代（generation_cache で一定間隔ごとに確認）が
+    変わっていればバックグラウンドのスレッドで作り直します。作り直している間のリクエストには古い索引を返します。
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._retry_at = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def get(self):
+        """現在の索引を取得する（必要に応じて作成・更新する）"""
+        generation = generation_cache.get(DataGeneration.RATINGS)
+        index = self._index
+        if index is None:
+            return self._build_first(generation)
+        if index.generation != generation:
+            self._start_rebuild(generation)
+        return index
+
+    def _build_first(self, generation):
+        """索引がない場合はリクエストのスレッドで作成する（返す索引がないため）"""
+        with self._lock:
+            index = self._index
+            if index is None:
+                index = self._index = self._build(generation)
+            return index
+
+    def _start_rebuild(self, generation):
+        """索引を作り直すスレッドを開始する（作り直し中・再試行の待機中は何もしない）"""
+        with self._lock:
+            if self._rebuilding or time.monotonic() < self._retry_at:
+                return
+            self._rebuilding = True
+        thread = threading.Thread(
+            target=self._rebuild, args=(generation,), name='suggest-index-rebuild', daemon=True
+        )
+        thread.start()
+
+    def _rebuild(self, generation):
+        try:
+            # 1回の代入で切り替えるため、リクエストのスレッドは古い索引か新しい索引のどちらかを使う
+            self._index = self._build(generation)
+        except Exception:
+            logger.exception("サジェスト索引の作り直しに失敗しました")
+            self._retry_at = time.monotonic() + REBUILD_RETRY_SECONDS
+        finally:
+            self._rebuilding = False
+            # スレッドで開いたDB接続は再利用されないため閉じる
+            connections.close_all()
+
+    def _build(self, generation):
+        start = time.perf_counter()
+        index = SuggestIndex.build(generation)
+        logger.info(
+            f"サジェスト索引を作成しました（{len(index)}件、世代: {index.generation}、"
+            f"{time.perf_counter() - start:.2f}秒）"
+        )
+        return index
+
+
+# プロセス内で共有する索引
+suggest_index = SuggestIndexHolder()
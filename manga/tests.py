@@ -0,0 +1,792 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.db.models import BooleanField
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.utils.crypto import get_random_string
+from rest_framework.request import Request
+
+from config import metrics
+from config.db.stats import count as count_connection, get_connection_stats
+from config.middleware import CompressionMiddleware, ReplicaRoutingMiddleware
+from config.query_profiler import profile_buffer
+from config.routers import ReplicaRouter, reset_use_replica, use_replica
+from manga.admin import EstimatedCountPaginator
+from manga.cache import CompressedResponseCache, category_cache
+from manga.models import (
+    Category, DataGeneration, EbookStore, Manga, MangaDailyRanking, MangaEbookStore, ScrapedManga, ScrapingHistory,
+    TrendingManga, TrendingMangaManager,
+)
+from manga.normalization import normalize_title_key, title_numbers
+from manga.ratings import (
+    CARRY_FORWARD_DAYS, DECAY_PER_DAY, RANK_POINTS, compute_ratings, latest_histories, rank_points,
+)
+from manga.search import MatchAgainst
+from manga.serializers import MangaSerializer, MangaValuesSerializer
+from manga.suggest import SuggestIndex, SuggestIndexHolder
+from manga.views import MangaViewSet, PopularMangaListView
+from scripts.merge_duplicate_mangas import find_duplicate_groups, merge_mangas
+from scripts.scrapers.base import BaseStoreScraper
+from scripts import compact_scraped_mangas, update_manga_ratings
+from scripts.update_manga_ratings import publish_ratings, update_ratings
+from scripts.utils import get_or_create_manga_id, manga_identity_map
+
+try:
+    from config.db.backends.mysql.base import ConnectionPool
+except ImproperlyConfigured:  # mysqlclient がインストールされていない
+    ConnectionPool = None
+
+
+class MangaIdentityMapTests(TestCase):
+    """スクレイピング実行単位のタイトル → マンガIDの対応表（scripts/utils.py）"""
+
+    def setUp(self):
+        manga_identity_map.clear()
+        self.category = Category.objects.create(id='shounen', name='少年マンガ')
+
+    def tearDown(self):
+        manga_identity_map.clear()
+
+    def test_get_or_create_manga_id_creates_once(self):
+        # 新規作成したマンガはコミット後に対応表へ登録される
+        with self.captureOnCommitCallbacks(execute=True):
+            manga_id, created = get_or_create_manga_id('ワンピース', '尾田栄一郎', [self.category])
+        self.assertTrue(created)
+        same_id, created = get_or_create_manga_id('ワンピース', '尾田栄一郎', [self.category])
+        self.assertFalse(created)
+        self.assertEqual(same_id, manga_id)
+        self.assertEqual(Manga.objects.count(), 1)
+        self.assertEqual(list(Manga.objects.get(id=manga_id).categories.values_list('id', flat=True)), ['shounen'])
+
+    def test_lookup_hits_map_without_query(self):
+        manga = Manga.objects.create(title='呪術廻戦', author='芥見下々')
+        manga_identity_map.preload(['呪術廻戦'])
+        with self.assertNumQueries(0):
+            manga_id, created = get_or_create_manga_id('呪術廻戦', '芥見下々', [])
+        self.assertEqual(manga_id, manga.id)
+        self.assertFalse(created)
+
+    def test_invalid_title_or_author_is_not_created(self):
+        self.assertEqual(get_or_create_manga_id('不明', '作者', []), (None, False))
+        self.assertEqual(get_or_create_manga_id('新作', '不明', []), (None, False))
+        self.assertFalse(Manga.objects.exists())
+
+
+class NormalizedTitleTests(TestCase):
+    """Manga.normalized_title の一意制約と upsert_by_normalized_title"""
+
+    def test_save_sets_normalized_title(self):
+        manga = Manga.objects.create(title='ＳＰＹ×ＦＡＭＩＬＹ', author='遠藤達哉')
+        self.assertEqual(manga.normalized_title, 'spy×family')
+
+    def test_legacy_duplicate_can_be_saved(self):
+        Manga.objects.create(title='進撃の巨人', author='諫山創')
+        # マイグレーション 0010 で正規化タイトルをNULLのまま残した重複
+        duplicate = Manga.objects.create(title='仮タイトル', author='諫山創')
+        Manga.objects.filter(id=duplicate.id).update(title='進撃の巨人 ', normalized_title=None)
+        duplicate.refresh_from_db()
+
+        duplicate.description = '概要'
+        duplicate.full_clean(exclude=['cover_image'])
+        duplicate.save()
+        duplicate.refresh_from_db()
+        self.assertIsNone(duplicate.normalized_title)
+
+        # 重複しないタイトルに変更した場合は設定される
+        duplicate.title = '進撃の巨人 外伝'
+        duplicate.save()
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.normalized_title, '進撃の巨人外伝')
+
+    def test_clean_rejects_colliding_title(self):
+        Manga.objects.create(title='鬼滅の刃', author='吾峠呼世晴')
+        other = Manga.objects.create(title='チェンソーマン', author='藤本タツキ')
+        other.title = '鬼滅の刃！'
+        with self.assertRaises(ValidationError) as context:
+            other.full_clean(exclude=['cover_image'])
+        self.assertIn('title', context.exception.message_dict)
+
+    def test_upsert_does_not_duplicate(self):
+        ids = Manga.objects.upsert_by_normalized_title([
+            {'title': 'ブルーロック', 'author': '金城宗幸'},
+            {'title': 'ブルー ロック', 'author': '金城宗幸'},
+            {'title': '葬送のフリーレン', 'author': '山田鐘人', 'first_book_title': '葬送のフリーレン 1'},
+        ])
+        self.assertEqual(set(ids), {'ブルーロック', '葬送のフリーレン'})
+        again, created = Manga.objects.upsert_by_normalized_title([
+            {'title': '葬送のフリーレン', 'author': '別の著者', 'first_book_title': ''},
+            {'title': '呪術廻戦', 'author': '芥見下々'},
+        ], return_created=True)
+        self.assertEqual(again['葬送のフリーレン'], ids['葬送のフリーレン'])
+        self.assertEqual(created, {'呪術廻戦'})
+        self.assertEqual(Manga.objects.count(), 3)
+        manga = Manga.objects.get(id=ids['葬送のフリーレン'])
+        self.assertEqual(manga.author, '山田鐘人')
+        self.assertEqual(manga.first_book_title, '葬送のフリーレン 1')
+
+
+class StubScraper(BaseStoreScraper):
+    """保存処理のテスト用スクレイパー（スクレイピングは行わない）"""
+
+    def _scrape(self):
+        return []
+
+
+class ScraperSaveDataTests(TestCase):
+    """BaseStoreScraper._save_data() のマンガの一括登録とトランザクション"""
+
+    def setUp(self):
+        manga_identity_map.clear()
+        category_cache.invalidate()
+        Category.objects.create(id='all', name='全て')
+        self.store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.scraper = StubScraper(self.store.id)
+        self.scraper.history = ScrapingHistory.objects.create(store=self.store)
+
+    def tearDown(self):
+        manga_identity_map.clear()
+        category_cache.invalidate()
+
+    def test_failed_item_does_not_leave_orphan_manga(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.scraper._save_data([
+                {'title': '薬屋のひとりごと', 'author': '日向夏', 'free_chapters': 3, 'free_books': 1, 'rank': 1,
+                 'detail_url': 'https://store.example.com/1'},
+                # free_chapters がないため保存に失敗する
+                {'title': '怪獣8号', 'author': '松本直也', 'free_books': 0, 'rank': 2},
+            ])
+        self.assertEqual(list(Manga.objects.values_list('title', flat=True)), ['薬屋のひとりごと'])
+        manga = Manga.objects.get()
+        self.assertEqual(ScrapedManga.objects.get().manga_id, manga.id)
+        self.assertEqual(MangaEbookStore.objects.get().url, 'https://store.example.com/1')
+        self.assertEqual(self.scraper.metrics.saved, 1)
+
+        # 取り消したマンガは対応表に残らず、コミットしたマンガのみ登録される
+        self.assertIsNone(manga_identity_map.lookup(normalize_title_key('怪獣8号')))
+        self.assertEqual(manga_identity_map.lookup(normalize_title_key('薬屋のひとりごと')), manga.id)
+        self.assertEqual(manga_identity_map._pending, {})
+
+    def test_failed_item_keeps_manga_created_by_another_worker(self):
+        preload = manga_identity_map.preload
+
+        def preload_then_other_worker_creates(titles):
+            # 読み込み後、一括登録の前に他のワーカーが同じタイトルを作成した場合
+            preload(titles)
+            Manga.objects.create(title='怪獣8号', author='松本直也')
+
+        with mock.patch.object(manga_identity_map, 'preload', side_effect=preload_then_other_worker_creates), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.scraper._save_data([
+                # free_chapters がないため保存に失敗する
+                {'title': '怪獣8号', 'author': '松本直也', 'free_books': 0, 'rank': 1},
+            ])
+        self.assertEqual(list(Manga.objects.values_list('title', flat=True)), ['怪獣8号'])
+        self.assertEqual(self.scraper.metrics.saved, 0)
+
+
+class MergeDuplicateMangasTests(TestCase):
+    """重複マンガの検出・統合（scripts/merge_duplicate_mangas.py）"""
+
+    def test_variant_titles_are_grouped(self):
+        canonical = Manga.objects.create(title='ダンジョン飯', author='九井諒子')
+        variant = Manga.objects.create(title='ダンジョン飯【分冊版】 3巻', author='九井諒子')
+        groups, unconfirmed = find_duplicate_groups()
+        self.assertEqual([sorted(group) for group in groups], [sorted([canonical.id, variant.id])])
+        self.assertEqual(unconfirmed, [])
+
+    def test_number_only_difference_requires_confirmation(self):
+        golgo = Manga.objects.create(title='ゴルゴ13', author='さいとう・たかを')
+        other = Manga.objects.create(title='ゴルゴ', author='さいとう・たかを')
+        self.assertEqual(title_numbers(golgo.title), (13,))
+        groups, unconfirmed = find_duplicate_groups()
+        self.assertEqual(groups, [])
+        self.assertEqual(unconfirmed, [(golgo.id, other.id)])
+
+        groups, unconfirmed = find_duplicate_groups(confirmed_pairs=[(other.id, golgo.id)])
+        self.assertEqual([sorted(group) for group in groups], [[golgo.id, other.id]])
+        self.assertEqual(unconfirmed, [])
+
+    def test_merge_keeps_trending_entries(self):
+        canonical = Manga.objects.create(title='ハイキュー!!', author='古舘春一', rating=100)
+        duplicate = Manga.objects.create(title='ハイキュー!! 1巻', author='古舘春一', rating=10)
+        today = date.today()
+        TrendingManga.objects.create(category='all', manga=canonical, position=5, date=today,
+                                     current_rank=20, previous_rank=40, rank_delta=20)
+        TrendingManga.objects.create(category='all', manga=duplicate, position=2, date=today,
+                                     current_rank=3, previous_rank=50, rank_delta=47)
+        TrendingManga.objects.create(category='shounen', manga=duplicate, position=1, date=today,
+                                     current_rank=3, previous_rank=50, rank_delta=47)
+
+        merge_mangas(canonical, [duplicate])
+
+        self.assertFalse(Manga.objects.filter(id=duplicate.id).exists())
+        entries = {t.category: t for t in TrendingManga.objects.filter(manga=canonical)}
+        self.assertEqual(set(entries), {'all', 'shounen'})
+        self.assertEqual((entries['all'].position, entries['all'].rank_delta), (2, 47))
+        self.assertEqual(entries['shounen'].position, 1)
+        self.assertEqual(TrendingManga.objects.count(), 2)
+
+
+class SearchTests(TestCase):
+    """マンガの検索（manga/search.py と /manga/search/）"""
+
+    def setUp(self):
+        Manga.objects.create(title='転生したらスライムだった件', author='川上泰樹', rating=50)
+        Manga.objects.create(title='無職転生', author='フジカワユカ', rating=80)
+        Manga.objects.create(title='薬屋のひとりごと', author='転生太郎', rating=10)
+
+    def _titles(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        results = data['results'] if isinstance(data, dict) else data
+        return [item['title'] for item in results]
+
+    @skipIf(connection.vendor == 'mysql', 'InnoDBのFULLTEXTインデックスはコミット前の行を検索できないため')
+    def test_search_matches_title_and_author(self):
+        response = self.client.get('/api/v1/manga/search/', {'q': '転生'})
+        self.assertEqual(
+            self._titles(response), ['無職転生', '転生したらスライムだった件', '薬屋のひとりごと']
+        )
+
+    def test_prefix_matches_title_only(self):
+        response = self.client.get('/api/v1/manga/search/', {'q': '転生', 'prefix': 'true'})
+        self.assertEqual(self._titles(response), ['転生したらスライムだった件'])
+
+    def test_match_against_sql(self):
+        queryset = Manga.objects.filter(
+            MatchAgainst('title', 'author', query='+"転生"', output_field=BooleanField())
+        ).annotate(relevance=MatchAgainst('title', 'author', query='+"転生"')).order_by('-relevance')
+        sql, params = queryset.query.sql_with_params()
+        quote = connection.ops.quote_name
+        table = quote(Manga._meta.db_table)
+        self.assertIn(
+            f"MATCH ({table}.{quote('title')}, {table}.{quote('author')}) AGAINST (%s IN BOOLEAN MODE)", sql
+        )
+        self.assertEqual(params, ('+"転生"', '+"転生"'))
+
+
+class SuggestIndexTests(TestCase):
+    """入力補完の索引（manga/suggest.py）"""
+
+    def test_wide_prefix_returns_top_rated(self):
+        # 前方一致する範囲が MAX_SCAN より広い場合も、範囲の末尾にある評価の高いマンガを返す
+        rows = [(n, f'あいう{n:03d}', '作者', n) for n in range(1, 21)]
+        index = SuggestIndex(rows)
+        with mock.patch('manga.suggest.MAX_SCAN', 5):
+            titles = [item['title'] for item in index.suggest('あいう', limit=3)]
+        self.assertEqual(titles, ['あいう020', 'あいう019', 'あいう018'])
+        self.assertIn('あいう', index.wide_top)
+
+    def test_stale_index_is_served_while_rebuilding(self):
+        holder = SuggestIndexHolder()
+        old_index = SuggestIndex([(1, '古い索引', '作者', 1)], generation=1)
+        new_index = SuggestIndex([(2, '新しい索引', '作者', 1)], generation=2)
+        holder._index = old_index
+        release = threading.Event()
+
+        def build(generation):
+            release.wait(5)
+            return new_index
+
+        with mock.patch('manga.suggest.generation_cache.get', return_value=2), \
+                mock.patch.object(SuggestIndex, 'build', side_effect=build):
+            # 作り直しが終わるまでは古い索引を返す
+            self.assertIs(holder.get(), old_index)
+            self.assertIs(holder.get(), old_index)
+            release.set()
+            for _ in range(100):
+                if holder._index is new_index and not holder._rebuilding:
+                    break
+                time.sleep(0.01)
+            self.assertIs(holder.get(), new_index)
+            self.assertEqual(SuggestIndex.build.call_count, 1)
+
+
+class CompressionMiddlewareTests(TestCase):
+    """レスポンスの圧縮（config/middleware.py の CompressionMiddleware）"""
+
+    def _get(self, path, content_type):
+        body = b'{"title": "\\u30de\\u30f3\\u30ac"}' * 100
+        middleware = CompressionMiddleware(lambda request: HttpResponse(body, content_type=content_type))
+        return middleware(RequestFactory().get(path, HTTP_ACCEPT_ENCODING='gzip'))
+
+    def test_api_json_is_compressed(self):
+        response = self._get('/api/v1/manga/', 'application/json')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_html_is_not_compressed(self):
+        # 管理画面・ブラウザブルAPIのHTMLはCSRFトークンを含むため圧縮しない（BREACH対策）
+        for path in ('/admin/manga/manga/', '/api/v1/manga/'):
+            response = self._get(path, 'text/html; charset=utf-8')
+            self.assertFalse(response.has_header('Content-Encoding'), path)
+
+    def test_json_outside_api_is_not_compressed(self):
+        response = self._get('/admin/query-profiles/', 'application/json')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class RatingsCacheKeyTests(TestCase):
+    """人気・急上昇マンガリストのレスポンスのキャッシュキー（RatingsCachedListMixin）"""
+
+    def _key(self, params, category='all'):
+        view = PopularMangaListView(kwargs={'category': category})
+        view.request = Request(RequestFactory().get('/', params))
+        return view.get_cache_key(view.request)
+
+    def test_key_is_normalized(self):
+        key = self._key({'count': '10', 'fields': 'title,id'})
+        self.assertEqual(key, self._key({'fields': 'id,title,unknown', 'count': '10', 'utm_source': 'x'}))
+        self.assertEqual(self._key({'view': 'compact'}), self._key({'fields': 'rating,cover_image,title,id'}))
+        # 不正な値はデフォルト値と同じキーになる
+        self.assertEqual(self._key({'count': 'abc'}), self._key({'count': '10'}))
+        self.assertNotEqual(key, self._key({'count': '10', 'fields': 'title,id'}, category='shounen'))
+        self.assertNotEqual(key, self._key({'count': '10', 'offset': '10', 'fields': 'title,id'}))
+        self.assertLessEqual(len(key), 64)
+
+    def test_unbounded_values_are_not_cached(self):
+        self.assertIsNone(self._key({}, category='unknown'))
+        self.assertIsNone(self._key({'offset': '100000'}))
+
+
+class UpdateRatingsTests(TestCase):
+    """レーティング更新ジョブ（scripts/update_manga_ratings.py）"""
+
+    def setUp(self):
+        Category.objects.create(id='all', name='全て')
+        self.store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.manga = Manga.objects.create(title='ダンダダン', author='龍幸伸')
+        history = ScrapingHistory.objects.create(store=self.store, is_success=True)
+        ScrapedManga.objects.create(scraping_history=history, manga=self.manga, rank=1, free_chapters=3, free_books=0)
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root)
+
+    def test_update_does_not_publish(self):
+        generation = DataGeneration.objects.get_generation(DataGeneration.RATINGS)
+        with self.settings(SNAPSHOT_ROOT=self.snapshot_root):
+            self.assertEqual(update_ratings(date.today()), 1)
+        self.manga.refresh_from_db()
+        self.assertGreater(self.manga.rating, 0)
+        self.assertEqual(DataGeneration.objects.get_generation(DataGeneration.RATINGS), generation)
+        self.assertEqual(os.listdir(self.snapshot_root), [])
+
+    def test_run_publishes_after_google_books(self):
+        volume = {'items': [{'volumeInfo': {'description': '概要', 'imageLinks': {'thumbnail': 'https://books.example.com/1.jpg'}}}]}
+        generation = DataGeneration.objects.get_generation(DataGeneration.RATINGS)
+        with self.settings(SNAPSHOT_ROOT=self.snapshot_root), \
+                mock.patch('scripts.update_manga_ratings.fetch_google_books_data', return_value=volume), \
+                mock.patch('time.sleep'):
+            update_manga_ratings.run(date.today().isoformat())
+        self.assertEqual(DataGeneration.objects.get_generation(DataGeneration.RATINGS), generation + 1)
+        with open(os.path.join(self.snapshot_root, 'current', 'manga', f'{self.manga.id}.json'), 'rb') as f:
+            self.assertEqual(json.loads(f.read())['cover_image'], 'https://books.example.com/1.jpg')
+
+    def test_export_can_be_skipped(self):
+        with self.settings(SNAPSHOT_ROOT=self.snapshot_root):
+            update_ratings(date.today())
+            publish_ratings(export=False)
+        self.assertEqual(os.listdir(self.snapshot_root), [])
+
+
+class QueryProfilesViewTests(TestCase):
+    """SQLクエリの記録の参照・削除（config/query_profiler.py の query_profiles_view）"""
+
+    def setUp(self):
+        User.objects.create_user('admin', password='password', is_staff=True)
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.login(username='admin', password='password')
+        profile_buffer.clear()
+        profile_buffer.append({'path': '/api/v1/manga/', 'duplicate_queries': []})
+        self.addCleanup(profile_buffer.clear)
+
+    def test_get_does_not_clear(self):
+        response = self.client.get('/admin/query-profiles/', {'clear': '1'})
+        self.assertEqual(len(response.json()['profiles']), 1)
+        self.assertEqual(len(profile_buffer.items()), 1)
+
+    def test_post_clears_with_csrf_token(self):
+        self.assertEqual(self.client.post('/admin/query-profiles/').status_code, 403)
+        self.assertEqual(len(profile_buffer.items()), 1)
+
+        token = get_random_string(64)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = token
+        response = self.client.post('/admin/query-profiles/', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(len(response.json()['profiles']), 1)
+        self.assertEqual(profile_buffer.items(), [])
+
+
+class ReplicaRoutingTests(TestCase):
+    """読み取り専用APIのレプリカDBへの振り分け（config/routers.py・ReplicaRoutingMiddleware）"""
+
+    def test_router_uses_replica_only_inside_use_replica(self):
+        router = ReplicaRouter()
+        with self.settings(REPLICA_DATABASE_ALIAS='default'):
+            self.assertIsNone(router.db_for_read(Manga))
+            with use_replica():
+                self.assertEqual(router.db_for_read(Manga), 'default')
+                self.assertEqual(router.db_for_write(Manga), 'default')
+        # レプリカが設定されていない場合はプライマリを使う
+        with self.settings(REPLICA_DATABASE_ALIAS='replica'), use_replica():
+            self.assertIsNone(router.db_for_read(Manga))
+
+    def test_middleware_routes_read_only_views(self):
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        view = PopularMangaListView.as_view()
+        request = RequestFactory().get('/api/v1/manga/popular-books/all/')
+        with mock.patch('config.middleware.replica_available', return_value=True):
+            middleware.process_view(request, view, (), {})
+            self.assertIsNotNone(request.replica_token)
+            reset_use_replica(request.replica_token)
+
+            # 書き込みを行ったクライアントはプライマリから読み込む
+            request = RequestFactory().get('/api/v1/manga/popular-books/all/')
+            request.COOKIES[ReplicaRoutingMiddleware.cookie_name] = str(int(time.time()) + 60)
+            middleware.process_view(request, view, (), {})
+            self.assertFalse(hasattr(request, 'replica_token'))
+
+    def test_write_sets_primary_cookie(self):
+        middleware = ReplicaRoutingMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().post('/admin/manga/manga/add/'))
+        self.assertIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+        response = middleware(RequestFactory().get('/api/v1/manga/'))
+        self.assertNotIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+
+
+class MangaFieldsTests(TestCase):
+    """fields / view=compact による出力フィールドの絞り込み（MangaFieldsMixin）"""
+
+    def setUp(self):
+        # 人気マンガリストのレスポンスのキャッシュを使わない
+        cache.clear()
+        self.manga = Manga.objects.create(title='ブルーピリオド', author='山口つばさ', rating=30)
+
+    def test_fields_limit_detail_output(self):
+        response = self.client.get(f'/api/v1/manga/{self.manga.id}/', {'fields': 'title,id,unknown'})
+        self.assertEqual(response.json(), {'id': self.manga.id, 'title': 'ブルーピリオド'})
+
+    def test_compact_view(self):
+        response = self.client.get('/api/v1/manga/popular-books/all/', {'view': 'compact'})
+        self.assertEqual(list(response.json()[0]), MangaSerializer.COMPACT_FIELDS)
+
+    def test_unknown_fields_return_all_fields(self):
+        response = self.client.get(f'/api/v1/manga/{self.manga.id}/', {'fields': 'unknown'})
+        self.assertEqual(list(response.json()), MangaSerializer.Meta.fields)
+
+
+class MangaValuesSerializerTests(TestCase):
+    """values() の行から出力するシリアライザ（MangaValuesSerializer）"""
+
+    def setUp(self):
+        category = Category.objects.create(id='seinen', name='青年マンガ')
+        store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.manga = Manga.objects.create(title='ヴィンランド・サガ', author='幸村誠', rating=40, free_chapters=5)
+        self.manga.categories.add(category)
+        MangaEbookStore.objects.create(
+            manga=self.manga, ebookstore=store, url='https://store.example.com/1', free_chapters=5, free_books=1
+        )
+
+    def test_output_matches_model_serializer(self):
+        serializer = MangaValuesSerializer()
+        data = serializer.serialize(serializer.values_queryset(Manga.objects.all()))
+        self.assertEqual(data, [MangaSerializer(self.manga).data])
+
+    def test_fields_are_output_in_canonical_order(self):
+        serializer = MangaValuesSerializer(fields=['rating', 'categories', 'id'])
+        with self.assertNumQueries(2):
+            data = serializer.serialize(serializer.values_queryset(Manga.objects.all()))
+        self.assertEqual(data, [{'id': self.manga.id, 'categories': ['青年マンガ'], 'rating': 40}])
+
+
+class MangaBatchTests(TestCase):
+    """複数のマンガの一括取得（/manga/batch/）"""
+
+    def setUp(self):
+        self.ids = [
+            Manga.objects.create(title=title, author='作者', rating=rating).id
+            for title, rating in (('A', 10), ('B', 30), ('C', 20))
+        ]
+
+    def test_preserves_requested_order(self):
+        a, b, c = self.ids
+        response = self.client.get('/api/v1/manga/batch/', {'ids': f'{c},999999,{a},{c},{b}', 'fields': 'id'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()], [c, a, b])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/v1/manga/batch/', {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/manga/batch/').status_code, 400)
+        too_many = ','.join(str(i) for i in range(1, MangaViewSet.BATCH_MAX_IDS + 2))
+        self.assertEqual(self.client.get('/api/v1/manga/batch/', {'ids': too_many}).status_code, 400)
+
+
+class CompactScrapedMangasTests(TestCase):
+    """日次ランキング集計（MangaDailyRanking.objects.summarize_date）と scripts/compact_scraped_mangas.py"""
+
+    def setUp(self):
+        self.old_date = date.today() - timedelta(days=100)
+        self.store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.failed_store = EbookStore.objects.create(name='失敗ストア', url='https://failed.example.com/')
+        self.manga = Manga.objects.create(title='ブルーピリオド', author='山口つばさ')
+        self.other = Manga.objects.create(title='宝石の国', author='市川春子')
+        history = ScrapingHistory.objects.create(store=self.store, is_success=True)
+        ScrapedManga.objects.create(scraping_history=history, manga=self.manga, rank=2, free_chapters=5, free_books=1)
+        failed = ScrapingHistory.objects.create(store=self.failed_store, is_success=False)
+        ScrapedManga.objects.create(scraping_history=failed, manga=self.manga, rank=1, free_chapters=9, free_books=9)
+        ScrapedManga.objects.create(scraping_history=failed, manga=self.other, rank=3, free_chapters=0, free_books=0)
+        ScrapingHistory.objects.update(scraping_date=self.old_date)
+
+    def test_summarize_date_uses_only_successful_histories(self):
+        self.assertEqual(MangaDailyRanking.objects.summarize_date(self.old_date, {self.manga.id: 42}), 1)
+        ranking = MangaDailyRanking.objects.get()
+        self.assertEqual(ranking.manga_id, self.manga.id)
+        self.assertEqual(ranking.ranks, {str(self.store.id): 2})
+        self.assertEqual(
+            (ranking.best_rank, ranking.free_chapters, ranking.free_books, ranking.rating), (2, 5, 1, 42)
+        )
+
+    def test_apply_summarizes_before_deleting(self):
+        compact_scraped_mangas.run('apply')
+        self.assertFalse(ScrapedManga.objects.exists())
+        self.assertEqual(
+            list(MangaDailyRanking.objects.values_list('manga_id', 'date', 'best_rank')),
+            [(self.manga.id, self.old_date, 2)],
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        compact_scraped_mangas.run()
+        self.assertEqual(ScrapedManga.objects.count(), 3)
+        self.assertFalse(MangaDailyRanking.objects.exists())
+
+
+class MangaHistoryTests(TestCase):
+    """マンガの順位・レーティングの推移（/manga/{id}/history/）"""
+
+    def setUp(self):
+        self.store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.manga = Manga.objects.create(title='SAKAMOTO DAYS', author='鈴木祐斗')
+        for day, rank in ((1, 5), (2, 3), (5, 1)):
+            MangaDailyRanking.objects.create(
+                manga=self.manga, date=date(2025, 5, day), ranks={str(self.store.id): rank}, best_rank=rank,
+                rating=100 - rank,
+            )
+
+    def test_history_in_date_range(self):
+        response = self.client.get(
+            f'/api/v1/manga/{self.manga.id}/history/', {'days': '4', 'to': '2025-05-05'}
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['from'], data['to']), ('2025-05-02', '2025-05-05'))
+        self.assertEqual(data['stores'], {str(self.store.id): 'テストストア'})
+        self.assertEqual(
+            [(item['date'], item['best_rank'], item['rating']) for item in data['history']],
+            [('2025-05-02', 3, 97), ('2025-05-05', 1, 99)],
+        )
+
+    def test_unknown_manga_and_invalid_params(self):
+        self.assertEqual(self.client.get('/api/v1/manga/999999/history/').status_code, 404)
+        url = f'/api/v1/manga/{self.manga.id}/history/'
+        self.assertEqual(self.client.get(url, {'days': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'to': '2025/05/05'}).status_code, 400)
+        # 推移のないマンガは空のリストを返す
+        self.assertEqual(self.client.get(url, {'to': '2024-01-01'}).json()['history'], [])
+
+
+class TrendingMangaTests(TestCase):
+    """急上昇マンガの計算（TrendingManga.objects.rebuild）と /manga/trending/{カテゴリ}/"""
+
+    def setUp(self):
+        cache.clear()
+        shounen = Category.objects.create(id='shounen', name='少年マンガ')
+        self.target_date = date(2025, 5, 10)
+        previous_date = self.target_date - timedelta(days=TrendingMangaManager.TRENDING_DAYS)
+        self.rising = Manga.objects.create(title='上昇', author='作者')
+        self.new = Manga.objects.create(title='新登場', author='作者')
+        self.falling = Manga.objects.create(title='下降', author='作者')
+        self.rising.categories.add(shounen)
+        for manga, previous_rank, rank in ((self.rising, 10, 1), (self.new, None, 3), (self.falling, 1, 5)):
+            if previous_rank:
+                MangaDailyRanking.objects.create(manga=manga, date=previous_date, best_rank=previous_rank)
+            MangaDailyRanking.objects.create(manga=manga, date=self.target_date, best_rank=rank)
+
+    def test_rebuild_orders_by_rank_delta(self):
+        self.assertEqual(TrendingManga.objects.rebuild(self.target_date), 3)
+        entries = TrendingManga.objects.filter(category='all').order_by('position')
+        # 比較日に圏外だったマンガは比較日の最下位の次の順位（11位）から上がったものとして扱う
+        self.assertEqual(
+            [(t.manga_id, t.previous_rank, t.current_rank, t.rank_delta) for t in entries],
+            [(self.rising.id, 10, 1, 9), (self.new.id, None, 3, 8)],
+        )
+        self.assertEqual(
+            list(TrendingManga.objects.filter(category='shounen').values_list('manga_id', flat=True)),
+            [self.rising.id],
+        )
+
+    def test_trending_endpoint(self):
+        TrendingManga.objects.rebuild(self.target_date)
+        response = self.client.get('/api/v1/manga/trending/all/', {'fields': 'id'})
+        self.assertEqual(response.json(), [
+            {'id': self.rising.id, 'previous_rank': 10, 'current_rank': 1, 'rank_delta': 9},
+            {'id': self.new.id, 'previous_rank': None, 'current_rank': 3, 'rank_delta': 8},
+        ])
+
+
+class RatingsTests(TestCase):
+    """ストアの重みと失敗したストアの順位の引き継ぎ（manga/ratings.py）"""
+
+    def _scrape(self, store, manga, rank, days_ago, is_success=True):
+        history = ScrapingHistory.objects.create(store=store, is_success=is_success)
+        ScrapingHistory.objects.filter(id=history.id).update(
+            scraping_date=self.target_date - timedelta(days=days_ago)
+        )
+        ScrapedManga.objects.create(scraping_history=history, manga=manga, rank=rank, free_chapters=0, free_books=0)
+
+    def setUp(self):
+        self.target_date = date.today()
+        self.manga = Manga.objects.create(title='ワンパンマン', author='ONE')
+
+    def test_failed_store_ranks_are_carried_forward_with_decay(self):
+        today = EbookStore.objects.create(name='当日成功', url='https://a.example.com/')
+        failed = EbookStore.objects.create(name='当日失敗', url='https://b.example.com/', rating_weight=2.0)
+        stale = EbookStore.objects.create(name='古いデータ', url='https://c.example.com/')
+        self._scrape(today, self.manga, rank=1, days_ago=0)
+        self._scrape(failed, self.manga, rank=1, days_ago=2)
+        self._scrape(failed, self.manga, rank=1, days_ago=0, is_success=False)
+        self._scrape(stale, self.manga, rank=1, days_ago=CARRY_FORWARD_DAYS + 1)
+
+        histories = latest_histories(self.target_date)
+        self.assertEqual({history.store_id for history in histories}, {today.id, failed.id})
+        # 1000点 + 1000点 × 重み2.0 × 0.5の2乗
+        expected = RANK_POINTS[1] + RANK_POINTS[1] * 2.0 * DECAY_PER_DAY ** 2
+        self.assertEqual(compute_ratings(self.target_date, histories)[self.manga.id]['rating'], int(expected))
+
+    def test_rank_points(self):
+        self.assertEqual(rank_points(1), RANK_POINTS[1])
+        self.assertEqual(rank_points(11), 89)
+        self.assertEqual(rank_points(150), 0)
+
+
+class CompressedResponseCacheTests(TestCase):
+    """圧縮済みのレスポンスのキャッシュ（manga/cache.py の CompressedResponseCache）"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_renders_once_per_key(self):
+        response_cache = CompressedResponseCache('test')
+        render = mock.Mock(return_value=b'{"id": 1}' * 50)
+        identity = response_cache.get_or_render('1:key', None, render)
+        compressed = response_cache.get_or_render('1:key', 'gzip', render)
+        self.assertEqual(response_cache.get_or_render('1:key', 'gzip', render), compressed)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(gzip.decompress(compressed), identity)
+
+        # キーが変わる（世代が進む）とレンダリングし直す
+        response_cache.get_or_render('2:key', 'gzip', render)
+        self.assertEqual(render.call_count, 2)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """管理画面の件数の多いテーブル用のページネータ（manga/admin.py）"""
+
+    def setUp(self):
+        for n in range(3):
+            Manga.objects.create(title=f'マンガ{n}', author='作者')
+
+    def test_exact_count_without_table_statistics(self):
+        # SQLiteにはテーブル統計がないため COUNT(*) で数える
+        self.assertEqual(EstimatedCountPaginator(Manga.objects.all(), 10).count, 3)
+
+    def test_estimated_and_capped_count(self):
+        with mock.patch.object(EstimatedCountPaginator, '_estimated_table_rows', return_value=500000):
+            self.assertEqual(EstimatedCountPaginator(Manga.objects.all(), 10).count, 500000)
+            # 絞り込みがある場合は推定件数を使わず、MAX_COUNT 件までしか数えない
+            with mock.patch.object(EstimatedCountPaginator, 'MAX_COUNT', 2):
+                self.assertEqual(EstimatedCountPaginator(Manga.objects.filter(author='作者'), 10).count, 2)
+
+
+class MetricsViewTests(TestCase):
+    """Prometheus形式のメトリクス（config/metrics.py の /metrics）"""
+
+    def setUp(self):
+        self.store = EbookStore.objects.create(name='テストストア', url='https://store.example.com/')
+        self.other_store = EbookStore.objects.create(name='統計なしストア', url='https://other.example.com/')
+        manga = Manga.objects.create(title='ワールドトリガー', author='葦原大介')
+        ScrapingHistory.objects.create(store=self.store, is_success=True, stats={'items': 40})
+        history = ScrapingHistory.objects.create(store=self.other_store, is_success=True)
+        ScrapedManga.objects.create(scraping_history=history, manga=manga, rank=1, free_chapters=0, free_books=0)
+
+    @skipIf(not metrics.enabled(), 'prometheus_client がインストールされていません')
+    def test_metrics_include_job_and_request_series(self):
+        self.client.get('/api/v1/manga/')
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn('manga_api_request_duration_seconds_bucket{', content)
+        self.assertIn('manga_scrape_last_items{store="テストストア"} 40.0', content)
+        # 実行統計のない履歴はスクレイピングデータの件数を使う
+        self.assertIn('manga_scrape_last_items{store="統計なしストア"} 1.0', content)
+
+    @skipIf(not metrics.enabled(), 'prometheus_client がインストールされていません')
+    def test_job_collector_does_not_count_per_store(self):
+        for n in range(3):
+            store = EbookStore.objects.create(name=f'ストア{n}', url=f'https://store{n}.example.com/')
+            ScrapingHistory.objects.create(store=store, is_success=True)
+        # 履歴・件数の集計・レーティングの世代の取得（世代がないため日次集計は参照しない）
+        with self.assertNumQueries(3):
+            list(metrics.JobCollector().collect())
+
+
+class ConnectionStatsTests(TestCase):
+    """DB接続の統計（config/db/stats.py）と接続プール（config/db/backends/mysql）"""
+
+    def connection_events(self, event):
+        return metrics.prometheus_client.REGISTRY.get_sample_value('manga_db_connection_events_total', {'event': event}) or 0
+
+    @skipIf(not metrics.enabled(), 'prometheus_client がインストールされていません')
+    def test_stats_are_exported_as_counters(self):
+        reused = get_connection_stats()['reused']
+        exported = self.connection_events('reused')
+        count_connection('reused', 2)
+        self.assertEqual(get_connection_stats()['reused'], reused + 2)
+        self.assertEqual(self.connection_events('reused'), exported + 2)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            self.assertIn('manga_db_connection_events_total{event="reused"}', self.client.get('/metrics').content.decode())
+
+    @skipIf(ConnectionPool is None, 'mysqlclient がインストールされていません')
+    def test_pool_reuses_connection(self):
+        pool = ConnectionPool()
+        connection = mock.Mock()
+        created_at = time.monotonic()
+        self.assertTrue(pool.put('default', connection, created_at, size=1))
+        # プールが満杯の場合は返却しない
+        self.assertFalse(pool.put('default', mock.Mock(), created_at, size=1))
+        self.assertEqual(pool.get('default', max_lifetime=60), (connection, created_at))
+        connection.ping.assert_called_once_with()
+        self.assertIsNone(pool.get('default', max_lifetime=60))
+
+    @skipIf(ConnectionPool is None, 'mysqlclient がインストールされていません')
+    def test_pool_closes_connection_past_max_lifetime(self):
+        pool = ConnectionPool()
+        expired = mock.Mock()
+        closed = get_connection_stats()['closed']
+        pool.put('default', expired, time.monotonic() - 120, size=1)
+        self.assertIsNone(pool.get('default', max_lifetime=60))
+        expired.close.assert_called_once_with()
+        expired.ping.assert_not_called()
+        self.assertEqual(get_connection_stats()['closed'], closed + 1)
@@ -1,10 +1,11 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import MangaViewSet, PopularMangaListView
+from .views import MangaViewSet, PopularMangaListView, TrendingMangaListView
 
 router = DefaultRouter()
 router.register('manga', MangaViewSet, basename='manga')
 
 urlpatterns = [
     path('manga/popular-books/<str:category>/', PopularMangaListView.as_view(), name='popular-manga'),
+    path('manga/trending/<str:category>/', TrendingMangaListView.as_view(), name='trending-manga'),
 ] + router.urls
\ No newline at end of file
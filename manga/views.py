@@ -1,60 +1,369 @@
+import hashlib
 from rest_framework import viewsets, generics
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from django_filters import rest_framework as filters
-from .models import Manga, Category
-from .serializers import MangaSerializer, CategorySerializer
+from django.db.models import F
+from datetime import date, datetime, timedelta
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from config.compression import choose_encoding
+from .cache import generation_cache, popular_list_cache, trending_list_cache
+from .models import Manga, Category, DataGeneration, EbookStore, MangaDailyRanking
+from .search import search_mangas
+from .suggest import MAX_SUGGESTIONS, suggest_index
+from .serializers import MangaSerializer, MangaValuesSerializer, CategorySerializer
 
 
-class MangaViewSet(viewsets.ReadOnlyModelViewSet):
+class MangaFieldsMixin:
+    """
+    fields / view クエリパラメータで出力するフィールドを絞り込むMixin
+
+    クエリパラメータ:
+    - fields: 出力するフィールド（カンマ区切り。例: fields=id,title,rating）
+    - view: compact を指定すると一覧画面用のフィールド（id, title, cover_image, rating）のみ出力
+
+    シリアライザの出力を絞り込むだけでなく、SQLで取得するカラムも only() で絞り込み、
+    categories / ebookstores を出力しない場合はそれらの prefetch も行いません。
+    """
+
+    def get_requested_fields(self):
+        """
+        出力するフィールドを取得する
+
+        Returns:
+            list or None: フィールド名のリスト（指定がない場合はNone = すべて）
+        """
+        available = MangaSerializer.Meta.fields
+        fields_param = self.request.query_params.get('fields')
+        if fields_param:
+            fields = [f for f in (f.strip() for f in fields_param.split(',')) if f in available]
+            if fields:
+                return fields
+        if self.request.query_params.get('view') == 'compact':
+            return MangaSerializer.COMPACT_FIELDS
+        return None
+
+    def optimize_queryset(self, queryset):
+        """出力するフィールドに合わせて取得するカラムと prefetch を絞り込む"""
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset.prefetch_related('categories', 'store_detail_urls__ebookstore')
+
+        concrete_fields = {f.name for f in Manga._meta.concrete_fields}
+        queryset = queryset.only('id', *[f for f in fields if f in concrete_fields])
+        if 'categories' in fields:
+            queryset = queryset.prefetch_related('categories')
+        if 'ebookstores' in fields:
+            queryset = queryset.prefetch_related('store_detail_urls__ebookstore')
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_base_queryset(self):
+        """フィールドの絞り込み（optimize_queryset）を行う前のクエリセット"""
+        return super().get_queryset()
+
+    def get_queryset(self):
+        return self.optimize_queryset(self.get_base_queryset())
+
+    def get_values_serializer(self):
+        """一覧の出力に使う MangaValuesSerializer"""
+        return MangaValuesSerializer(fields=self.get_requested_fields())
+
+    def list(self, request, *args, **kwargs):
+        # 一覧は件数が多いため、モデルインスタンスを作らずに values() の行から出力する
+        serializer = self.get_values_serializer()
+        queryset = serializer.values_queryset(self.filter_queryset(self.get_base_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+
+class MangaViewSet(MangaFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """
     マンガ情報を取得するためのViewSet
+
+    fields / view=compact で出力するフィールドを絞り込めます（MangaFieldsMixin を参照）
     """
     queryset = Manga.objects.all()
     serializer_class = MangaSerializer
     lookup_field = 'id'
 
+    # batch で一度に取得できるマンガの最大件数
+    BATCH_MAX_IDS = 100
+
+    # history で取得できる最大日数
+    HISTORY_MAX_DAYS = 365
+
+    @action(detail=True, url_path='history', pagination_class=None)
+    def history(self, request, id=None):
+        """
+        マンガの順位・レーティングの推移を取得する（日付の古い順）
 
-class PopularMangaListView(generics.ListAPIView):
+        日次ランキング集計（MangaDailyRanking）の (manga, date) インデックスの範囲検索1回で取得します。
+
+        クエリパラメータ:
+        - days: 取得する日数（デフォルト・最大: HISTORY_MAX_DAYS）
+        - to: 終了日（YYYY-MM-DD、デフォルト: 当日）
+        """
+        try:
+            days = int(request.query_params.get('days', self.HISTORY_MAX_DAYS))
+        except ValueError:
+            raise ValidationError({'days': '日数は整数で指定してください'})
+        days = max(1, min(days, self.HISTORY_MAX_DAYS))
+        try:
+            end = datetime.strptime(request.query_params['to'], '%Y-%m-%d').date() if 'to' in request.query_params else date.today()
+        except ValueError:
+            raise ValidationError({'to': '日付はYYYY-MM-DD形式で指定してください'})
+        start = end - timedelta(days=days - 1)
+        try:
+            id = int(id)
+        except ValueError:
+            raise Http404
+
+        rows = list(
+            MangaDailyRanking.objects.filter(manga_id=id, date__range=(start, end))
+            .order_by('date')
+            .values_list('date', 'rating', 'best_rank', 'ranks', 'free_chapters', 'free_books')
+        )
+        if not rows and not Manga.objects.filter(id=id).exists():
+            raise Http404
+
+        store_ids = {int(store_id) for row in rows for store_id in row[3]}
+        stores = dict(EbookStore.objects.filter(id__in=store_ids).values_list('id', 'name')) if store_ids else {}
+        return Response({
+            'id': id,
+            'from': start,
+            'to': end,
+            'stores': {str(store_id): name for store_id, name in stores.items()},
+            'history': [
+                {
+                    'date': day,
+                    'rating': rating,
+                    'best_rank': best_rank,
+                    'ranks': ranks,
+                    'free_chapters': free_chapters,
+                    'free_books': free_books,
+                }
+                for day, rating, best_rank, ranks, free_chapters, free_books in rows
+            ],
+        })
+
+    @action(detail=False, url_path='search')
+    def search(self, request):
+        """
+        タイトル・著者でマンガを検索する（MySQLでは関連度の高い順、それ以外はレーティングの高い順）
+
+        クエリパラメータ:
+        - q: 検索語（空白区切りですべての語を含むものを検索）
+        - prefix: true の場合はタイトルのみの前方一致で検索（著者は対象外、レーティングの高い順）
+        - fields / view: 出力するフィールドの絞り込み（MangaFieldsMixin を参照）
+        """
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            raise ValidationError({'q': '検索語を指定してください'})
+        prefix = request.query_params.get('prefix', '').lower() in ('1', 'true', 'yes')
+
+        serializer = MangaValuesSerializer(fields=self.get_requested_fields())
+        queryset = serializer.values_queryset(search_mangas(self.get_base_queryset(), query, prefix=prefix))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
+
+    @action(detail=False, url_path='suggest', pagination_class=None)
+    def suggest(self, request):
+        """
+        入力補完の候補を取得する（タイトル・著者の前方一致、レーティングの高い順）
+
+        DBを検索せず、ワーカーのメモリ上の索引（manga.suggest）から返します。
+
+        クエリパラメータ:
+        - q: 入力中の文字列
+        - limit: 最大件数（デフォルト: 10、最大: MAX_SUGGESTIONS）
+        """
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        return Response(suggest_index.get().suggest(request.query_params.get('q', ''), limit))
+
+    @action(detail=False, url_path='batch')
+    def batch(self, request):
+        """
+        複数のマンガをまとめて取得する（ブックマーク・閲覧履歴画面用）
+
+        クエリパラメータ:
+        - ids: マンガID（カンマ区切り、最大 BATCH_MAX_IDS 件）。指定した順に返し、存在しないIDは除外します
+        - fields / view: 出力するフィールドの絞り込み（MangaFieldsMixin を参照）
+        """
+        ids = []
+        for value in request.query_params.get('ids', '').split(','):
+            value = value.strip()
+            if not value:
+                continue
+            try:
+                manga_id = int(value)
+            except ValueError:
+                raise ValidationError({'ids': f'不正なIDです: {value}'})
+            if manga_id not in ids:
+                ids.append(manga_id)
+        if not ids:
+            raise ValidationError({'ids': 'マンガIDを指定してください'})
+        if len(ids) > self.BATCH_MAX_IDS:
+            raise ValidationError({'ids': f'一度に指定できるIDは{self.BATCH_MAX_IDS}件までです'})
+
+        # 1回の id__in クエリで取得し、指定された順に並べ替えてから出力する
+        serializer = MangaValuesSerializer(fields=self.get_requested_fields())
+        rows = {
+            row['id']: row
+            for row in serializer.values_queryset(self.get_base_queryset().filter(id__in=ids))
+        }
+        return Response(serializer.serialize(rows[i] for i in ids if i in rows))
+
+
+def get_count_offset(request):
+    """
+    リクエストから count（件数、省略時: 100、不正な値の場合: 10、最大: 100）と offset（開始位置、デフォルト: 0）を取得する
+
+    Returns:
+        tuple: (count, offset)
+    """
+    count = request.query_params.get('count', 100)
+    offset = request.query_params.get('offset', 0)
+    
+    # 文字列から整数に変換
+    try:
+        count = int(count)
+        if count <= 0:
+            count = 10
+        elif count > 100:
+            count = 100  # 最大100件まで許容
+    except (TypeError, ValueError):
+        count = 10
+        
+    try:
+        offset = int(offset)
+        if offset < 0:
+            offset = 0
+    except (TypeError, ValueError):
+        offset = 0
+    return count, offset
+
+
+class RatingsCachedListMixin:
+    """
+    レーティング更新ジョブの実行時にのみ変わる一覧のレスポンスをキャッシュするMixin
+
+    データの世代と、出力に影響するクエリパラメータ（count / offset / fields / view）を正規化した値をキーに、
+    レンダリング・圧縮済みのバイト列を response_cache（CompressedResponseCache）に保存します。
+    キャッシュの件数が増え続けないよう、存在しないカテゴリと MAX_CACHED_OFFSET を超える offset はキャッシュしません。
+    """
+    response_cache = None
+
+    # キャッシュする offset の最大値
+    MAX_CACHED_OFFSET = 1000
+
+    CATEGORY_IDS = frozenset(category_id for category_id, _ in Category.CATEGORY_CHOICES)
+
+    def get_cache_key(self, request):
+        """
+        レスポンスのキャッシュキーを作成する
+
+        Returns:
+            str or None: キャッシュキー（キャッシュしない場合はNone）
+        """
+        category = self.kwargs.get('category')
+        count, offset = get_count_offset(request)
+        if category not in self.CATEGORY_IDS or offset > self.MAX_CACHED_OFFSET:
+            return None
+        # 出力はフィールドの指定順によらず MangaSerializer.Meta.fields の順になるため、同じ順に揃える
+        fields = self.get_requested_fields()
+        fields = '*' if fields is None else ','.join(f for f in MangaSerializer.Meta.fields if f in fields)
+        digest = hashlib.sha1(f'{category}:{count}:{offset}:{fields}'.encode()).hexdigest()
+        return f'{generation_cache.get(DataGeneration.RATINGS)}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        # ブラウザブルAPIなどJSON以外の形式はキャッシュしない
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+        def render():
+            data = super(RatingsCachedListMixin, self).list(request, *args, **kwargs).data
+            return request.accepted_renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+
+        body = self.response_cache.get_or_render(key, encoding, render)
+        response = HttpResponse(body, content_type=request.accepted_media_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+class PopularMangaListView(RatingsCachedListMixin, MangaFieldsMixin, generics.ListAPIView):
     """
     カテゴリ別の人気マンガリストを取得するビュー
     
     クエリパラメータ:
     - count: 返すマンガの件数（デフォルト: 10、最大: 100）
     - offset: 開始位置（デフォルト: 0）
+    - fields / view: 出力するフィールドの絞り込み（MangaFieldsMixin を参照）
     """
     serializer_class = MangaSerializer
     pagination_class = None  # デフォルトのページネーションを無効化
+    response_cache = popular_list_cache
     
-    def get_queryset(self):
+    def get_base_queryset(self):
         category = self.kwargs.get('category')
+        count, offset = get_count_offset(self.request)
         
-        # リクエストからcount（件数）とoffset（開始位置）を取得
-        count = self.request.query_params.get('count', 100)
-        offset = self.request.query_params.get('offset', 0)
-        
-        # 文字列から整数に変換
-        try:
-            count = int(count)
-            if count <= 0:
-                count = 10
-            elif count > 100:
-                count = 100  # 最大100件まで許容
-        except (TypeError, ValueError):
-            count = 10
-            
-        try:
-            offset = int(offset)
-            if offset < 0:
-                offset = 0
-        except (TypeError, ValueError):
-            offset = 0
-        
-        # 'all' カテゴリの場合、すべてのマンガを返す
-        if category == 'all':
-            queryset = Manga.objects.all().order_by('-rating')
-        else:
-            # 特定のカテゴリのマンガを返す
-            queryset = Manga.objects.filter(categories__id=category).order_by('-rating')
+        # 'all' カテゴリの場合はすべてのマンガ、それ以外は特定のカテゴリのマンガを返す
+        queryset = Manga.objects.popular(category)
         
         # offset と count を適用
-        return queryset[offset:offset+count]
\ No newline at end of file
+        return queryset[offset:offset+count]
+
+
+class TrendingMangaListView(RatingsCachedListMixin, MangaFieldsMixin, generics.ListAPIView):
+    """
+    カテゴリ別の急上昇マンガリスト（直近7日間で順位が大きく上がった順）を取得するビュー
+
+    レーティング更新ジョブが計算した TrendingManga を参照するため、リクエストごとの集計は行いません。
+    各マンガには previous_rank（比較日の順位、圏外の場合はnull）、current_rank（現在の順位）、
+    rank_delta（順位の上昇幅）が含まれます。
+
+    クエリパラメータ:
+    - count: 返すマンガの件数（デフォルト: 10、最大: 100）
+    - offset: 開始位置（デフォルト: 0）
+    - fields / view: 出力するフィールドの絞り込み（MangaFieldsMixin を参照）
+    """
+    serializer_class = MangaSerializer
+    pagination_class = None  # デフォルトのページネーションを無効化
+    response_cache = trending_list_cache
+
+    # マンガのフィールドに加えて出力する TrendingManga の値
+    TREND_FIELDS = ('previous_rank', 'current_rank', 'rank_delta')
+
+    def get_values_serializer(self):
+        return MangaValuesSerializer(fields=self.get_requested_fields(), extra_fields=self.TREND_FIELDS)
+
+    def get_base_queryset(self):
+        count, offset = get_count_offset(self.request)
+        queryset = (
+            Manga.objects.filter(trending_entries__category=self.kwargs.get('category'))
+            .annotate(**{field: F(f'trending_entries__{field}') for field in self.TREND_FIELDS})
+            .order_by('trending_entries__position')
+        )
+        return queryset[offset:offset+count]
@@ -0,0 +1,233 @@
+"""
+マンガAPIのレイテンシのベンチマーク
+
+マンガ一覧（MangaViewSet list）・マンガ詳細（MangaViewSet retrieve）・人気マンガリスト（PopularMangaListView）、
+"search=" を指定した場合は検索（MangaViewSet search）にリクエストを送り、エンドポイントごとのリクエスト数/秒とレイテンシ（p50/p95/p99）を計測して
+JSONファイルに保存します。保存したファイルを "compare=" で指定すると、前回の結果との差を表示します。
+
+計測には scripts/generate_synthetic_catalogue.py で作成した合成データを使うと、規模を揃えて比較できます。
+
+    mode=client  Djangoのテストクライアントでプロセス内から順にリクエストを送ります（既定）。
+                 ネットワーク・WSGIサーバーを含まないビュー・シリアライザ・DBクエリの時間を計測します。
+    mode=http    起動済みのAPIサーバーに並行してHTTPリクエストを送ります（scripts/load_test.py を使用）。
+
+Usage:
+    python manage.py runscript bench_api [--script-args="mode=client requests=2000 output=benchmarks/before.json"]
+
+    "requests=N" でリクエストの総数（既定1000、一覧・詳細・人気マンガリストに同じ数ずつ）、"warmup=N" で計測前に送るリクエスト数（既定50）、
+    "category=all" で人気マンガリストのカテゴリ、"ids=N" でマンガ詳細に使う人気上位のマンガ数（既定20、mode=client のみ）、
+    "search=語1,語2" で検索APIに使う検索語（カンマ区切り、省略時は検索APIを計測しない）、
+    "cold" でリクエストごとにキャッシュを削除（mode=client のみ）、
+    "base_url=URL" と "concurrency=N" で mode=http の接続先と並行数（既定 http://localhost:8000、8）、
+    "output=パス" で結果の保存先（省略時は BENCHMARK_DIR/api-日時.json）、"compare=パス" で比較する結果を指定できます。
+
+Example:
+    python manage.py runscript generate_synthetic_catalogue --script-args="apply mangas=50000"
+    python manage.py runscript bench_api --script-args="output=benchmarks/before.json"
+    git checkout feature-branch
+    python manage.py runscript bench_api --script-args="output=benchmarks/after.json compare=benchmarks/before.json"
+    python manage.py runscript bench_api --script-args="mode=http base_url=http://localhost:8000 concurrency=16 requests=5000"
+    python manage.py runscript bench_api --script-args="search=転生,スライム"
+"""
+import json
+import os
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from manga.models import Manga, MangaDailyRanking, ScrapedManga
+from scripts.load_test import build_endpoints, print_summary, run_load_test, summarize
+
+BENCHMARK_DIR = os.path.join(settings.BASE_DIR, 'benchmarks')
+
+PERCENTILES = (50, 95, 99)
+
+DEFAULT_BASE_URL = 'http://localhost:8000'
+
+# HTTPクライアント（requests）と同じ圧縮形式を受け付け、両方のモードで同じレスポンスを計測する
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def balance_endpoints(endpoints):
+    """
+    エンドポイントの名前ごとに同じ回数ずつリクエストを送るように並べ替える
+
+    マンガ詳細はマンガIDごとにURLがあるため、そのまま巡回すると詳細のリクエストが大半になります。
+    名前ごとにURLを順番に使い、名前を交互に並べます（例: 一覧, 人気, 詳細1, 一覧, 人気, 詳細2, ...）。
+    """
+    groups = {}
+    for name, url in endpoints:
+        groups.setdefault(name, []).append(url)
+    rounds = max(len(urls) for urls in groups.values())
+    return [
+        (name, urls[index % len(urls)])
+        for index in range(rounds)
+        for name, urls in groups.items()
+    ]
+
+
+def run_client_benchmark(endpoints, total_requests, warmup=0, cold=False):
+    """
+    Djangoのテストクライアントでエンドポイントを順番に巡回してリクエストを送る
+
+    Args:
+        endpoints (list): (名前, パス) のリスト
+        total_requests (int): 計測するリクエストの総数
+        warmup (int): 計測前に送るリクエストの数
+        cold (bool): リクエストごとにキャッシュを削除するかどうか（削除の時間は計測に含めない）
+
+    Returns:
+        dict: scripts/load_test.py の run_load_test() と同じ形式の結果
+    """
+    client = Client(HTTP_ACCEPT_ENCODING=ACCEPT_ENCODING)
+    for index in range(warmup):
+        client.get(endpoints[index % len(endpoints)][1])
+
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0, 'status': defaultdict(int)})
+    elapsed = 0.0
+    for index in range(total_requests):
+        name, path = endpoints[index % len(endpoints)]
+        if cold:
+            cache.clear()
+        start = time.perf_counter()
+        response = client.get(path)
+        latency = time.perf_counter() - start
+        elapsed += latency
+        results[name]['status'][response.status_code] += 1
+        if response.status_code >= 400:
+            results[name]['errors'] += 1
+        else:
+            results[name]['latencies'].append(latency)
+    results = dict(results)
+    results['_elapsed'] = elapsed
+    return results
+
+
+def dataset_counts():
+    """計測に使ったデータの件数"""
+    return {
+        'mangas': Manga.objects.count(),
+        'scraped_mangas': ScrapedManga.objects.count(),
+        'daily_rankings': MangaDailyRanking.objects.count(),
+    }
+
+
+def git_revision():
+    """作業ツリーのコミットID（取得できない場合はNone、未コミットの変更がある場合は末尾に -dirty）"""
+    try:
+        revision = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision or None
+
+
+def compare(rows, baseline_rows):
+    """
+    前回の結果とのエンドポイントごとの差を表示する
+
+    Args:
+        rows (list): 今回の集計結果
+        baseline_rows (list): 比較する集計結果
+    """
+    baseline = {row['endpoint']: row for row in baseline_rows}
+    keys = ['rps'] + [f'p{p}_ms' for p in PERCENTILES]
+    header = f"{'endpoint':<16}" + ''.join(f"{key:>24}" for key in keys)
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        before = baseline.get(row['endpoint'])
+        if before is None:
+            continue
+        line = f"{row['endpoint']:<16}"
+        for key in keys:
+            change = (row[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+            line += f"{before[key]:>8.1f} → {row[key]:>7.1f}{change:>+6.0f}%"
+        print(line)
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: "mode=client|http"、"requests=N"、"output=パス"、"compare=パス" など（モジュールのdocstringを参照）
+    """
+    options = {
+        'mode': 'client',
+        'requests': '1000',
+        'warmup': '50',
+        'category': 'all',
+        'ids': '20',
+        'base_url': DEFAULT_BASE_URL,
+        'concurrency': '8',
+        'output': None,
+        'compare': None,
+        'search': '',
+    }
+    flags = set()
+    for option in ' '.join(args).split():
+        key, sep, value = option.partition('=')
+        if sep:
+            options[key] = value
+        else:
+            flags.add(key)
+    mode = options['mode']
+    if mode not in ('client', 'http'):
+        print(f"mode には client または http を指定してください: {mode}")
+        return 1
+    total_requests = int(options['requests'])
+    warmup = int(options['warmup'])
+    concurrency = int(options['concurrency'])
+    search_terms = [term for term in options['search'].split(',') if term]
+
+    if mode == 'client':
+        manga_ids = list(Manga.objects.popular(options['category']).values_list('id', flat=True)[:int(options['ids'])])
+        endpoints = balance_endpoints(build_endpoints('', options['category'], manga_ids, search_terms=search_terms))
+        if settings.DEBUG:
+            print("DEBUG=True のためSQLの記録などで遅くなります。本番に近い値を計測するには DEBUG=False で実行してください")
+        print(f"テストクライアントで {total_requests}リクエストを計測します")
+        results = run_client_benchmark(endpoints, total_requests, warmup, cold='cold' in flags)
+        target = {'database': connection.vendor, 'debug': settings.DEBUG, 'dataset': dataset_counts()}
+    else:
+        # マンガ詳細には人気マンガリストAPIから取得した上位20件を使う
+        endpoints = balance_endpoints(build_endpoints(options['base_url'], options['category'], search_terms=search_terms))
+        print(f"{options['base_url']} に {concurrency}並行で {total_requests}リクエストを計測します")
+        if warmup:
+            run_load_test(endpoints, concurrency=concurrency, total_requests=warmup)
+        results = run_load_test(endpoints, concurrency=concurrency, total_requests=total_requests)
+        target = {'base_url': options['base_url'], 'concurrency': concurrency}
+
+    rows = summarize(results, PERCENTILES)
+    print_summary(rows, PERCENTILES)
+
+    output = options['output'] or os.path.join(BENCHMARK_DIR, f"api-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'mode': mode,
+        'cold': 'cold' in flags,
+        'requests': total_requests,
+        'warmup': warmup,
+        'category': options['category'],
+        'search': search_terms,
+        'target': target,
+        'results': rows,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {output}")
+
+    if options['compare']:
+        with open(options['compare'], encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n{options['compare']}（{baseline.get('revision')}, {baseline.get('created_at')}）との比較")
+        compare(rows, baseline['results'])
+    return 1 if rows[-1]['requests'] and rows[-1]['errors'] == rows[-1]['requests'] else 0
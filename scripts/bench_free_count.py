@@ -0,0 +1,170 @@
+"""
+無料話数・無料冊数抽出処理のベンチマーク
+
+実際のストアで見られるラベルのサンプルを表形式で定義し、
+scripts/free_count.py の結果が期待値と一致することを確認したうえで、
+従来の「パターンを1つずつ re.search する」実装と処理速度を比較します。
+
+Usage:
+    python manage.py runscript bench_free_count [--script-args="200"]
+    python -m scripts.bench_free_count 200
+
+    引数は計測の繰り返し回数です（省略時は100回）。
+"""
+import re
+import sys
+import time
+from scripts import free_count
+from scripts.free_count import parse_chapter_label, parse_free_counts, first_int
+
+# (ラベル, スキマ形式の無料話数, (N話無料, N冊無料))
+LABEL_SAMPLES = [
+    # スキマ
+    ('1-52話無料', 52, (52, None)),
+    ('11-30話無料', 20, (30, None)),
+    ('全巻無料(19話)', 19, (None, None)),
+    ('全巻12,345話無料', 12345, (345, None)),
+    ('10話まで無料', 10, (None, None)),
+    ('3話分無料', 3, (None, None)),
+    ('第10話まで無料', 10, (None, None)),
+    ('無料30話', 30, (None, None)),
+    ('25話', 25, (None, None)),
+    ('毎日無料 5話', 5, (None, None)),
+    ('待てば無料', 0, (None, None)),
+    ('期間限定\n12話無料', 12, (12, None)),
+    # まんが王国
+    ('3冊無料', 0, (None, 3)),
+    ('じっくり試し読み 2冊無料', 0, (None, 2)),
+    ('10話無料', 10, (10, None)),
+    ('50話無料 3冊無料', 50, (50, 3)),
+    ('最新話まで 80話無料', 80, (80, None)),
+    # ebook japan / めちゃコミ
+    ('12話無料', 12, (12, None)),
+    ('1話無料', 1, (1, None)),
+    ('毎日1話無料', 1, (1, None)),
+    ('無料', 0, (None, None)),
+    ('', 0, (None, None)),
+]
+
+# (文字列, 最初の整数)
+INT_SAMPLES = [
+    ('1位', 1),
+    ('第12位', 12),
+    ('ランキング 100', 100),
+    ('呪術廻戦 3', 3),
+    ('NEW', None),
+]
+
+
+def legacy_chapter_label(text):
+    """従来の実装（パターンを優先度順に1つずつ re.search する）"""
+    patterns = [
+        (r'(\d+)-(\d+)話無料', lambda m: int(m.group(2)) - int(m.group(1)) + 1),
+        (r'全巻無料\((\d+)話\)', lambda m: int(m.group(1))),
+        (r'全巻([\d,]+)話無料', lambda m: int(m.group(1).replace(',', ''))),
+        (r'(\d+)話まで無料', lambda m: int(m.group(1))),
+        (r'(\d+)話分無料', lambda m: int(m.group(1))),
+        (r'第(\d+)話まで無料', lambda m: int(m.group(1))),
+        (r'(\d+)話.*無料', lambda m: int(m.group(1))),
+        (r'無料(\d+)話', lambda m: int(m.group(1))),
+        (r'(\d+)話', lambda m: int(m.group(1))),
+    ]
+    for pattern, extractor in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return extractor(match)
+    return 0
+
+
+def legacy_free_counts(text):
+    """従来の実装（"N話無料" と "N冊無料" を別々に re.search する）"""
+    chapters_match = re.search(r'(\d+)話無料', text)
+    books_match = re.search(r'(\d+)冊無料', text)
+    return (
+        int(chapters_match.group(1)) if chapters_match else None,
+        int(books_match.group(1)) if books_match else None,
+    )
+
+
+def _clear_caches():
+    for func in (free_count.parse_chapter_label, free_count.parse_free_counts,
+                 free_count.parse_volume_count, free_count.first_int):
+        func.cache_clear()
+
+
+def check_samples():
+    """サンプルの期待値と一致するか確認する（不一致の一覧を返す）"""
+    errors = []
+    for label, expected_label, expected_counts in LABEL_SAMPLES:
+        for name, func, expected in (
+            ('parse_chapter_label', parse_chapter_label, expected_label),
+            ('legacy_chapter_label', legacy_chapter_label, expected_label),
+            ('parse_free_counts', parse_free_counts, expected_counts),
+            ('legacy_free_counts', legacy_free_counts, expected_counts),
+        ):
+            actual = func(label)
+            if actual != expected:
+                errors.append(f"{name}({label!r}) = {actual!r}, 期待値 {expected!r}")
+    for text, expected in INT_SAMPLES:
+        actual = first_int(text)
+        if actual != expected:
+            errors.append(f"first_int({text!r}) = {actual!r}, 期待値 {expected!r}")
+    return errors
+
+
+def _measure(func, labels, iterations, clear_cache=False):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            _clear_caches()
+        for label in labels:
+            func(label)
+    elapsed = time.perf_counter() - start
+    return len(labels) * iterations / elapsed if elapsed else float('inf')
+
+
+def benchmark(iterations=100):
+    """
+    各実装の処理速度（ラベル/秒）を計測する
+
+    Returns:
+        list: (名前, ラベル/秒) のリスト
+    """
+    labels = [label for label, _, _ in LABEL_SAMPLES]
+    # 1回の実行で同じラベルが何度も現れる状況を再現するため、サンプルを繰り返す
+    labels = labels * 10
+    return [
+        ('従来: パターンを順に re.search', _measure(legacy_chapter_label, labels, iterations)),
+        ('新: 結合パターン（キャッシュなし）', _measure(parse_chapter_label.__wrapped__, labels, iterations)),
+        ('新: 結合パターン（毎回キャッシュ初期化）', _measure(parse_chapter_label, labels, iterations, clear_cache=True)),
+        ('新: 結合パターン（キャッシュ済み）', _measure(parse_chapter_label, labels, iterations)),
+        ('従来: N話無料/N冊無料 を個別に検索', _measure(legacy_free_counts, labels, iterations)),
+        ('新: N話無料/N冊無料 を1回で検索（キャッシュなし）', _measure(parse_free_counts.__wrapped__, labels, iterations)),
+        ('新: N話無料/N冊無料 を1回で検索（キャッシュ済み）', _measure(parse_free_counts, labels, iterations)),
+    ]
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: 計測の繰り返し回数
+    """
+    iterations = int(args[0]) if args and args[0] else 100
+
+    errors = check_samples()
+    if errors:
+        for error in errors:
+            print(f"NG: {error}")
+        return 1
+    print(f"サンプル {len(LABEL_SAMPLES) + len(INT_SAMPLES)}件の期待値と一致しました")
+
+    print(f"計測回数: {iterations}")
+    for name, per_second in benchmark(iterations):
+        print(f"{name:<45} {per_second:>12,.0f} ラベル/秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -0,0 +1,97 @@
+"""
+マンガ一覧のシリアライズ処理のベンチマーク
+
+DBに登録済みのマンガを使い、MangaSerializer（DRFのModelSerializer）と
+MangaValuesSerializer（values() から組み立てる高速版）の出力が一致することを確認したうえで、
+1秒あたりに処理できるマンガ数を比較します。
+あわせて DRF 標準の JSONRenderer と ORJSONRenderer の処理速度も比較します。
+
+Usage:
+    python manage.py runscript bench_serializers [--script-args="100 20"]
+
+    引数は1回に処理するマンガ数（省略時は100件）と計測の繰り返し回数（省略時は20回）です。
+"""
+import time
+from rest_framework.renderers import JSONRenderer
+from manga.models import Manga
+from manga.renderers import ORJSONRenderer
+from manga.serializers import MangaSerializer, MangaValuesSerializer
+
+
+def _serialize_with_drf(limit):
+    queryset = Manga.objects.prefetch_related('categories', 'store_detail_urls__ebookstore')[:limit]
+    return MangaSerializer(queryset, many=True).data
+
+
+def _serialize_with_values(limit):
+    serializer = MangaValuesSerializer()
+    return serializer.serialize(serializer.values_queryset(Manga.objects.all())[:limit])
+
+
+def check_output(limit):
+    """
+    2つのシリアライザの出力が一致するか確認する
+
+    Returns:
+        list: 一致しなかったマンガIDのリスト
+    """
+    expected = _serialize_with_drf(limit)
+    actual = _serialize_with_values(limit)
+    if len(expected) != len(actual):
+        return ['件数が一致しません']
+    return [e['id'] for e, a in zip(expected, actual) if dict(e) != a]
+
+
+def _measure(func, iterations, size):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return size * iterations / elapsed if elapsed else float('inf')
+
+
+def benchmark(limit=100, iterations=20):
+    """
+    各処理の速度（マンガ/秒）を計測する
+
+    Returns:
+        list: (名前, マンガ/秒) のリスト
+    """
+    data = _serialize_with_values(limit)
+    size = len(data)
+    json_renderer = JSONRenderer()
+    orjson_renderer = ORJSONRenderer()
+    return [
+        ('MangaSerializer（DB取得を含む）', _measure(lambda: _serialize_with_drf(limit), iterations, size)),
+        ('MangaValuesSerializer（DB取得を含む）', _measure(lambda: _serialize_with_values(limit), iterations, size)),
+        ('JSONRenderer', _measure(lambda: json_renderer.render(data), iterations, size)),
+        ('ORJSONRenderer', _measure(lambda: orjson_renderer.render(data), iterations, size)),
+    ]
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: 1回に処理するマンガ数、計測の繰り返し回数
+    """
+    options = ' '.join(args).split()
+    limit = int(options[0]) if len(options) > 0 else 100
+    iterations = int(options[1]) if len(options) > 1 else 20
+
+    total = Manga.objects.count()
+    if not total:
+        print("マンガが登録されていません")
+        return 1
+
+    mismatches = check_output(limit)
+    if mismatches:
+        print(f"NG: 出力が一致しません: {mismatches}")
+        return 1
+    print(f"MangaSerializer と MangaValuesSerializer の出力が一致しました（{min(limit, total)}件）")
+
+    print(f"1回あたり {min(limit, total)}件 × {iterations}回")
+    for name, per_second in benchmark(limit, iterations):
+        print(f"{name:<40} {per_second:>12,.0f} マンガ/秒")
+    return 0
@@ -0,0 +1,115 @@
+"""
+古いスクレイピングデータを日次集計にまとめて削除するスクリプト
+
+保持期間（既定90日）より古い ScrapedManga を MangaDailyRanking（マンガ・日ごとに1行）に集計してから削除し、
+ScrapedManga を直近のデータだけの小さなテーブルに保ちます。
+古い日付の順位は MangaDailyRanking から参照できます。
+
+Usage:
+    python manage.py runscript compact_scraped_mangas [--script-args="apply days=90"]
+
+    引数を省略した場合は対象の件数の表示のみ行います（ドライラン）。
+    "apply" を指定すると集計と削除を実行します。
+    "days=90" で保持期間（日数）を指定できます。
+    "backfill" を指定すると保持期間内の日付も集計します（削除は保持期間より古いデータのみ）。
+
+Example:
+    python manage.py runscript compact_scraped_mangas
+    python manage.py runscript compact_scraped_mangas --script-args="apply days=60"
+"""
+import logging
+from datetime import date, timedelta
+from django.db import transaction
+from manga.models import MangaDailyRanking, ScrapedManga, ScrapingHistory
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+
+# 1回のDELETEで削除する最大行数（ロックの時間を短くするため）
+DELETE_BATCH_SIZE = 5000
+
+
+def _scraped_dates(before=None):
+    """ScrapedManga が残っているスクレイピング日の一覧（古い順）"""
+    histories = ScrapingHistory.objects.filter(scraped_mangas__isnull=False)
+    if before is not None:
+        histories = histories.filter(scraping_date__lt=before)
+    return sorted(set(histories.values_list('scraping_date', flat=True)))
+
+
+def _delete_scraped_mangas(scraping_date):
+    """指定した日の ScrapedManga を分割して削除する"""
+    deleted = 0
+    queryset = ScrapedManga.objects.filter(scraping_history__scraping_date=scraping_date)
+    while True:
+        ids = list(queryset.order_by().values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return deleted
+        deleted += ScrapedManga.objects.filter(id__in=ids).delete()[0]
+
+
+def compact(retention_days=DEFAULT_RETENTION_DAYS, backfill=False):
+    """
+    保持期間より古い ScrapedManga を日次集計にまとめて削除する
+
+    日付ごとにトランザクションを分け、集計に失敗した日のデータは削除しません。
+    失敗したスクレイピング履歴のデータは集計せずに削除します（MangaDailyRanking.objects.summarize_date()）。
+
+    Args:
+        retention_days (int): ScrapedManga を保持する日数
+        backfill (bool): Trueの場合は保持期間内の日付も集計する
+
+    Returns:
+        tuple: (集計した行数, 削除した行数)
+    """
+    cutoff = date.today() - timedelta(days=retention_days)
+    summarized = 0
+    deleted = 0
+
+    if backfill:
+        for scraping_date in _scraped_dates():
+            if scraping_date >= cutoff:
+                summarized += MangaDailyRanking.objects.summarize_date(scraping_date)
+
+    for scraping_date in _scraped_dates(before=cutoff):
+        try:
+            with transaction.atomic():
+                count = MangaDailyRanking.objects.summarize_date(scraping_date)
+                removed = _delete_scraped_mangas(scraping_date)
+            summarized += count
+            deleted += removed
+            logger.info(f"{scraping_date}: {count}件を集計し、{removed}件のスクレイピングデータを削除しました")
+        except Exception as e:
+            logger.error(f"{scraping_date} のスクレイピングデータの集計中にエラーが発生しました: {e}")
+    return summarized, deleted
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: "apply" を含む場合は集計と削除を実行、"days=90" で保持期間、"backfill" で保持期間内も集計
+    """
+    options = ' '.join(args).split()
+    apply = 'apply' in options
+    backfill = 'backfill' in options
+    retention_days = DEFAULT_RETENTION_DAYS
+    for option in options:
+        if option.startswith('days='):
+            retention_days = int(option.split('=', 1)[1])
+
+    cutoff = date.today() - timedelta(days=retention_days)
+    logger.info(f"{cutoff} より前のスクレイピングデータを集計します (保持期間: {retention_days}日, {'実行' if apply else 'ドライラン'})")
+
+    if not apply:
+        dates = _scraped_dates(before=cutoff)
+        count = ScrapedManga.objects.filter(scraping_history__scraping_date__lt=cutoff).count()
+        print(f"対象: {len(dates)}日分、{count}件のスクレイピングデータ")
+        print("ドライランのため集計・削除は行っていません。実行するには --script-args=\"apply\" を指定してください")
+        return
+
+    summarized, deleted = compact(retention_days, backfill)
+    logger.info(f"{summarized}件の日次集計を作成・更新し、{deleted}件のスクレイピングデータを削除しました")
+    print(f"{summarized}件の日次集計を作成・更新し、{deleted}件のスクレイピングデータを削除しました")
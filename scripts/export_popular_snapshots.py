@@ -0,0 +1,198 @@
+"""
+人気マンガリストとマンガ詳細を静的なJSONファイルとして出力するスクリプト
+
+人気マンガリストはレーティング更新ジョブの実行時にのみ変わるため、
+update_manga_ratings の完了時に export_snapshots() でファイルを出力し、
+CDN・エッジサーバー（nginxなど）から直接配信します。件数などを変えて出力し直す場合はこのスクリプトを実行します。APIはファイルがない場合の代替として使用します。
+
+出力先（settings.SNAPSHOT_ROOT）の構成:
+    manifest.json                             現在のバージョンの情報（一時ファイルから置き換えて更新）
+    current -> v{世代}-{日時}/                 現在のバージョンへのシンボリックリンク（置き換えて更新）
+    v{世代}-{日時}/popular-books/{カテゴリ}.json  人気マンガリスト（API の /manga/popular-books/{カテゴリ}/ と同じ内容）
+    v{世代}-{日時}/manga/{ID}.json             マンガ詳細（API の /manga/{ID}/ と同じ内容）
+
+各JSONファイルには圧縮済みのファイル（.gz、brotliが利用可能な場合は .br）も出力します。
+バージョンのディレクトリは新しいものから KEEP_VERSIONS 個を残して削除します。
+
+Usage:
+    python manage.py runscript export_popular_snapshots [--script-args="count=100 details=popular keep=3"]
+
+    count: 人気マンガリストの件数（省略時は100件）
+    details: マンガ詳細を出力する対象（popular: 人気マンガリストに含まれるマンガ、all: すべて、none: 出力しない）
+    keep: 残すバージョン数
+    root: 出力先のディレクトリ（省略時は settings.SNAPSHOT_ROOT）
+"""
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from django.conf import settings
+from config.compression import compress, supported_encodings
+from manga.models import Manga, Category, DataGeneration
+from manga.renderers import ORJSONRenderer
+from manga.serializers import MangaValuesSerializer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNT = 100
+KEEP_VERSIONS = 3
+
+# ファイル名の拡張子（圧縮形式ごと）
+_EXTENSIONS = {'gzip': '.gz', 'br': '.br'}
+
+# マンガ詳細をまとめて取得する件数
+DETAIL_BATCH_SIZE = 1000
+
+
+def _write_json(path, data, renderer=ORJSONRenderer()):
+    """
+    JSONファイルと圧縮済みのファイルを出力する
+
+    Returns:
+        int: 未圧縮のファイルサイズ
+    """
+    content = renderer.render(data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    for encoding in supported_encodings():
+        with open(path + _EXTENSIONS[encoding], 'wb') as f:
+            f.write(compress(content, encoding, best=True))
+    return len(content)
+
+
+def export_popular_lists(version_dir, count=DEFAULT_COUNT):
+    """
+    カテゴリごとの人気マンガリストを出力する
+
+    Returns:
+        set: 出力したマンガのID
+    """
+    serializer = MangaValuesSerializer()
+    manga_ids = set()
+    categories = ['all'] + list(Category.objects.exclude(id='all').values_list('id', flat=True))
+    for category in categories:
+        rows = serializer.values_queryset(Manga.objects.popular(category))[:count]
+        data = serializer.serialize(rows)
+        size = _write_json(os.path.join(version_dir, 'popular-books', f'{category}.json'), data)
+        manga_ids.update(item['id'] for item in data)
+        logger.info(f"人気マンガリスト '{category}' を出力しました（{len(data)}件、{size:,}バイト）")
+    return manga_ids
+
+
+def export_manga_details(version_dir, manga_ids=None):
+    """
+    マンガ詳細を出力する
+
+    Args:
+        manga_ids (iterable, optional): 出力するマンガのID。省略時はすべてのマンガ
+
+    Returns:
+        int: 出力したマンガの件数
+    """
+    serializer = MangaValuesSerializer()
+    if manga_ids is None:
+        manga_ids = Manga.objects.order_by('id').values_list('id', flat=True)
+    manga_ids = list(manga_ids)
+
+    exported = 0
+    for start in range(0, len(manga_ids), DETAIL_BATCH_SIZE):
+        batch = manga_ids[start:start + DETAIL_BATCH_SIZE]
+        rows = serializer.values_queryset(Manga.objects.filter(id__in=batch).order_by())
+        for item in serializer.serialize(rows):
+            _write_json(os.path.join(version_dir, 'manga', f"{item['id']}.json"), item)
+            exported += 1
+    logger.info(f"マンガ詳細を出力しました（{exported}件）")
+    return exported
+
+
+def _swap_current(root, version, manifest):
+    """manifest.json と current シンボリックリンクを新しいバージョンに置き換える（それぞれアトミックに更新）"""
+    manifest_path = os.path.join(root, 'manifest.json')
+    tmp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, manifest_path)
+
+    link_path = os.path.join(root, 'current')
+    tmp_link = f'{link_path}.{os.getpid()}.tmp'
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, link_path)
+
+
+def _remove_old_versions(root, current_version, keep):
+    versions = sorted(
+        (name for name in os.listdir(root)
+         if name.startswith('v') and os.path.isdir(os.path.join(root, name)) and not os.path.islink(os.path.join(root, name))),
+        key=lambda name: os.path.getmtime(os.path.join(root, name)),
+        reverse=True,
+    )
+    for name in versions[keep:]:
+        if name == current_version:
+            continue
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        logger.info(f"古いバージョン {name} を削除しました")
+
+
+def export_snapshots(root=None, count=DEFAULT_COUNT, details='popular', keep=KEEP_VERSIONS):
+    """
+    人気マンガリストとマンガ詳細を新しいバージョンのディレクトリに出力し、現在のバージョンを切り替える
+
+    Returns:
+        dict: manifest.json の内容
+    """
+    root = root or settings.SNAPSHOT_ROOT
+    generation = DataGeneration.objects.get_generation(DataGeneration.RATINGS)
+    created_at = datetime.now()
+    version = f"v{generation}-{created_at.strftime('%Y%m%d%H%M%S')}"
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir, exist_ok=True)
+    logger.info(f"スナップショット {version} を {version_dir} に出力します")
+
+    manga_ids = export_popular_lists(version_dir, count)
+    detail_count = 0
+    if details == 'all':
+        detail_count = export_manga_details(version_dir)
+    elif details == 'popular':
+        detail_count = export_manga_details(version_dir, sorted(manga_ids))
+
+    manifest = {
+        'version': version,
+        'generation': generation,
+        'created_at': created_at.isoformat(),
+        'path': f'{version}/',
+        'popular_count': count,
+        'manga_details': detail_count,
+        'encodings': list(supported_encodings()),
+    }
+    _swap_current(root, version, manifest)
+    _remove_old_versions(root, version, keep)
+    return manifest
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: "count=100 details=popular keep=3 root=/path" 形式のオプション
+    """
+    options = dict(
+        option.split('=', 1) for option in ' '.join(args).split() if '=' in option
+    )
+    details = options.get('details', 'popular')
+    if details not in ('popular', 'all', 'none'):
+        logger.error(f"details には popular / all / none を指定してください: {details}")
+        return
+    manifest = export_snapshots(
+        root=options.get('root'),
+        count=int(options.get('count', DEFAULT_COUNT)),
+        details=details,
+        keep=int(options.get('keep', KEEP_VERSIONS)),
+    )
+    print(f"スナップショット {manifest['version']} を出力しました（マンガ詳細: {manifest['manga_details']}件）")
@@ -0,0 +1,127 @@
+"""
+無料話数・無料冊数の抽出処理
+
+各スクレイパーで共通して使う正規表現をモジュール読み込み時に一度だけコンパイルし、
+同じラベル文字列に対する結果はメモ化します。
+Djangoに依存しないため、ベンチマーク（scripts/bench_free_count.py）から単体で利用できます。
+"""
+import logging
+import re
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# スキマの無料表記のパターン（優先度順）
+# (グループ名, パターン) の組で、パターン内の数値は名前付きグループで取得する
+CHAPTER_LABEL_PATTERNS = [
+    ('range_end', r'(?P<range_start>\d+)-(?P<range_end>\d+)話無料'),  # "1-52話無料" の形式
+    ('all_paren', r'全巻無料\((?P<all_paren>\d+)話\)'),  # "全巻無料(19話)" の形式
+    ('all_comma', r'全巻(?P<all_comma>[\d,]+)話無料'),  # "全巻12,345話無料" の形式
+    ('upto', r'(?P<upto>\d+)話まで無料'),  # "10話まで無料" の形式
+    ('portion', r'(?P<portion>\d+)話分無料'),  # "10話分無料" の形式
+    ('nth_upto', r'第(?P<nth_upto>\d+)話まで無料'),  # "第10話まで無料" の形式
+    ('loose', r'(?P<loose>\d+)話.*無料'),  # "10話無料" の形式
+    ('prefix', r'無料(?P<prefix>\d+)話'),  # "無料10話" の形式
+    ('bare', r'(?P<bare>\d+)話'),  # 単純な "10話" の形式
+]
+
+# 全パターンを1つの選択に結合する
+# 各選択肢の先頭に最短一致の [\s\S]*? を置いて先頭から match することで、
+# 「優先度の高いパターンから順に re.search する」のと同じ結果を1回の照合で得る
+_CHAPTER_LABEL_RE = re.compile(
+    '|'.join(r'[\s\S]*?' + pattern for _, pattern in CHAPTER_LABEL_PATTERNS)
+)
+# 変換に失敗した場合に後続のパターンを順に試すための個別パターン
+_CHAPTER_LABEL_FALLBACKS = [
+    (name, re.compile(pattern)) for name, pattern in CHAPTER_LABEL_PATTERNS
+]
+
+# "N話無料" / "N冊無料" を1回の走査で取得する
+_FREE_COUNT_RE = re.compile(r'(?P<chapters>\d+)話無料|(?P<books>\d+)冊無料')
+_VOLUME_COUNT_RE = re.compile(r'(\d+)冊')
+_INT_RE = re.compile(r'(\d+)')
+
+
+def _convert_chapter_label(name, match):
+    if name == 'range_end':
+        return int(match.group('range_end')) - int(match.group('range_start')) + 1
+    if name == 'all_comma':
+        return int(match.group('all_comma').replace(',', ''))
+    return int(match.group(name))
+
+
+@lru_cache(maxsize=4096)
+def parse_chapter_label(text):
+    """
+    スキマ形式の無料表記から無料話数を取得する
+
+    Args:
+        text (str): 無料表記（例: "1-52話無料", "全巻無料(19話)"）
+
+    Returns:
+        int: 無料話数（該当する表記がない場合は0）
+    """
+    if not text:
+        return 0
+    match = _CHAPTER_LABEL_RE.match(text)
+    if not match:
+        return 0
+    name = match.lastgroup
+    try:
+        return _convert_chapter_label(name, match)
+    except (ValueError, IndexError) as e:
+        logger.warning(f"無料話数の解析エラー: {e}")
+
+    # 変換できなかった場合は後続のパターンを順に試す
+    names = [n for n, _ in _CHAPTER_LABEL_FALLBACKS]
+    for fallback_name, pattern in _CHAPTER_LABEL_FALLBACKS[names.index(name) + 1:]:
+        fallback = pattern.search(text)
+        if fallback:
+            try:
+                return _convert_chapter_label(fallback_name, fallback)
+            except (ValueError, IndexError) as e:
+                logger.warning(f"無料話数の解析エラー: {e}")
+    return 0
+
+
+@lru_cache(maxsize=4096)
+def parse_free_counts(text):
+    """
+    "N話無料" と "N冊無料" の表記をまとめて取得する
+
+    Args:
+        text (str): 対象の文字列
+
+    Returns:
+        tuple: (無料話数, 無料冊数)。表記がない方は None
+    """
+    chapters = None
+    books = None
+    if not text:
+        return chapters, books
+    for match in _FREE_COUNT_RE.finditer(text):
+        if chapters is None and match.group('chapters') is not None:
+            chapters = int(match.group('chapters'))
+        elif books is None and match.group('books') is not None:
+            books = int(match.group('books'))
+        if chapters is not None and books is not None:
+            break
+    return chapters, books
+
+
+@lru_cache(maxsize=4096)
+def parse_volume_count(text):
+    """
+    "N冊" の表記から冊数を取得する（表記がない場合は None）
+    """
+    match = _VOLUME_COUNT_RE.search(text or '')
+    return int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=4096)
+def first_int(text):
+    """
+    文字列に含まれる最初の整数を取得する（順位・巻数など。含まれない場合は None）
+    """
+    match = _INT_RE.search(text or '')
+    return int(match.group(1)) if match else None
@@ -0,0 +1,286 @@
+"""
+ベンチマーク用の合成データを作成するスクリプト
+
+指定した規模のマンガ・ストア・カテゴリと、ストアごとに指定した日数分のランキング（ScrapingHistory / ScrapedManga）を
+乱数で作成し、日ごとにレーティング更新処理（scripts/update_manga_ratings.py）を実行して
+日次ランキング集計・急上昇マンガ・レーティングまで本番と同じ形のデータを揃えます。
+作成したデータは scripts/bench_api.py で計測に使います。
+
+合成データのマンガは SYNTHETIC_TITLE_PREFIX で始まるタイトル、ストアは SYNTHETIC_URL で始まるURLで作成するため、
+"reset" で合成データのみを削除できます。本番のDBでは実行しないでください。
+
+Usage:
+    python manage.py runscript generate_synthetic_catalogue [--script-args="apply mangas=10000 stores=6 days=30"]
+
+    引数を省略した場合は作成する件数の表示のみ行います（ドライラン）。
+    "apply" を指定すると作成します。
+    "mangas=N" でマンガ数（既定10000）、"stores=N" でストア数（既定6）、"days=N" で日数（既定30、最終日は当日）、
+    "ranking=N" でストア・日ごとのランキングの件数（既定100）、"seed=N" で乱数のシード（既定1）を指定できます。
+    "reset" を指定すると作成済みの合成データを削除してから作成します（"apply" なしの場合は件数の表示のみ）。
+
+Example:
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python manage.py migrate
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python manage.py runscript generate_synthetic_catalogue --script-args="apply mangas=50000 days=60"
+"""
+import logging
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from django.db import transaction
+from django.utils import timezone
+from manga.models import Category, DataGeneration, EbookStore, Manga, MangaEbookStore, ScrapedManga, ScrapingHistory
+from manga.normalization import normalize_title_key
+from scripts.update_manga_ratings import publish_ratings, update_ratings
+
+logger = logging.getLogger(__name__)
+
+# 合成データのマンガのタイトル・ストアのURLの先頭
+SYNTHETIC_TITLE_PREFIX = '[synthetic] '
+SYNTHETIC_URL = 'https://synthetic.example.com'
+
+DEFAULT_MANGAS = 10000
+DEFAULT_STORES = 6
+DEFAULT_DAYS = 30
+DEFAULT_RANKING_SIZE = 100
+
+# 1回のINSERTに含める最大行数
+BATCH_SIZE = 1000
+
+# 前日のランキングから入れ替わるマンガの割合と、順位の揺れ（標準偏差）
+RANKING_TURNOVER = 0.1
+RANKING_JITTER = 5.0
+
+FREE_CHAPTER_CHOICES = (0, 1, 3, 5, 10, 20, 50)
+FREE_BOOK_CHOICES = (0, 0, 0, 1, 2, 3)
+
+
+def synthetic_counts():
+    """
+    作成済みの合成データの件数
+
+    Returns:
+        dict: マンガ・ストア・スクレイピング履歴・スクレイピングデータの件数
+    """
+    stores = EbookStore.objects.filter(url__startswith=SYNTHETIC_URL)
+    return {
+        'mangas': Manga.objects.filter(title__startswith=SYNTHETIC_TITLE_PREFIX).count(),
+        'stores': stores.count(),
+        'scraping_histories': ScrapingHistory.objects.filter(store__in=stores).count(),
+        'scraped_mangas': ScrapedManga.objects.filter(scraping_history__store__in=stores).count(),
+    }
+
+
+def reset():
+    """
+    作成済みの合成データを削除する
+
+    ストアを先に削除してスクレイピング履歴・スクレイピングデータを削除し（ScrapedManga.manga は PROTECT のため）、
+    その後マンガと関連するデータ（日次ランキング集計・急上昇マンガ・ストア別URLなど）を削除します。
+    """
+    with transaction.atomic():
+        EbookStore.objects.filter(url__startswith=SYNTHETIC_URL).delete()
+        Manga.objects.filter(title__startswith=SYNTHETIC_TITLE_PREFIX).delete()
+        DataGeneration.objects.bump(DataGeneration.RATINGS)
+
+
+def ensure_categories():
+    """カテゴリを作成し、'all' 以外のカテゴリIDのリストを返す"""
+    for category_id, name in Category.CATEGORY_CHOICES:
+        Category.objects.get_or_create(id=category_id, defaults={'name': name})
+    return [category_id for category_id, _ in Category.CATEGORY_CHOICES if category_id != 'all']
+
+
+def create_stores(count):
+    """合成データのストアを作成する"""
+    EbookStore.objects.bulk_create([
+        EbookStore(name=f"合成ストア{n}", url=f"{SYNTHETIC_URL}/store{n}/")
+        for n in range(1, count + 1)
+    ])
+    return list(EbookStore.objects.filter(url__startswith=SYNTHETIC_URL).order_by('id'))
+
+
+def create_mangas(count, genres, stores, rng):
+    """
+    合成データのマンガと、カテゴリ・ストア別の詳細URLを作成する
+
+    bulk_create は save() を呼ばないため、正規化タイトルはここで設定します。
+
+    Returns:
+        list: 作成したマンガのID
+    """
+    mangas = []
+    for n in range(1, count + 1):
+        title = f"{SYNTHETIC_TITLE_PREFIX}マンガ{n:07d}"
+        mangas.append(Manga(
+            title=title,
+            normalized_title=normalize_title_key(title) or None,
+            author=f"作者{rng.randrange(max(1, count // 20)):05d}",
+            cover_image=f"{SYNTHETIC_URL}/covers/{n}.jpg",
+            description=f"合成データのマンガ{n}の概要です。" * rng.randint(1, 10),
+            first_book_title=f"{title} 1巻",
+        ))
+    Manga.objects.bulk_create(mangas, batch_size=BATCH_SIZE)
+    # MySQLでは bulk_create で主キーが設定されないため、作成後に取得し直す
+    manga_ids = list(
+        Manga.objects.filter(title__startswith=SYNTHETIC_TITLE_PREFIX).order_by('id').values_list('id', flat=True)
+    )
+
+    through = Manga.categories.through
+    through.objects.bulk_create(
+        [through(manga_id=manga_id, category_id=rng.choice(genres)) for manga_id in manga_ids],
+        batch_size=BATCH_SIZE,
+    )
+    MangaEbookStore.objects.bulk_create(
+        [
+            MangaEbookStore(manga_id=manga_id, ebookstore=store, url=f"{store.url}manga/{manga_id}")
+            for manga_id in manga_ids
+            for store in rng.sample(stores, rng.randint(1, min(3, len(stores))))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return manga_ids
+
+
+def next_ranking(previous, manga_ids, rng):
+    """
+    前日のランキングを少し入れ替えた当日のランキングを作成する
+
+    RANKING_TURNOVER の割合のマンガを新しいマンガに入れ替え、各順位を RANKING_JITTER 程度揺らして並べ直すため、
+    急上昇マンガ・順位推移に意味のある変化が出ます。
+    """
+    ranked = set(previous)
+    # ランキングにすべてのマンガが含まれている場合は入れ替えない
+    turnover = RANKING_TURNOVER if len(manga_ids) > len(previous) else 0.0
+    ranking = []
+    for manga_id in previous:
+        if rng.random() < turnover:
+            manga_id = rng.choice(manga_ids)
+            while manga_id in ranked:
+                manga_id = rng.choice(manga_ids)
+            ranked.add(manga_id)
+        ranking.append(manga_id)
+    order = sorted(range(len(ranking)), key=lambda i: i + rng.gauss(0, RANKING_JITTER))
+    return [ranking[i] for i in order]
+
+
+def create_history(store, scraping_date):
+    """
+    成功したスクレイピング履歴を作成する
+
+    scraping_date / started_at は auto_now_add のため、作成後に UPDATE で対象日に書き換えます。
+    """
+    started_at = timezone.make_aware(datetime.combine(scraping_date, dt_time(3, 0)))
+    history = ScrapingHistory.objects.create(store=store, is_success=True, finished_at=started_at + timedelta(minutes=5))
+    ScrapingHistory.objects.filter(id=history.id).update(scraping_date=scraping_date, started_at=started_at)
+    return history
+
+
+def create_rankings(stores, manga_ids, dates, ranking_size, rng):
+    """
+    ストア・日ごとのランキングを作成する
+
+    Returns:
+        int: 作成したスクレイピングデータの件数
+    """
+    created = 0
+    rankings = {store.id: rng.sample(manga_ids, ranking_size) for store in stores}
+    for scraping_date in dates:
+        rows = []
+        for store in stores:
+            ranking = rankings[store.id] = next_ranking(rankings[store.id], manga_ids, rng)
+            history = create_history(store, scraping_date)
+            rows.extend(
+                ScrapedManga(
+                    scraping_history=history,
+                    manga_id=manga_id,
+                    rank=rank,
+                    free_chapters=rng.choice(FREE_CHAPTER_CHOICES),
+                    free_books=rng.choice(FREE_BOOK_CHOICES),
+                )
+                for rank, manga_id in enumerate(ranking, start=1)
+            )
+        ScrapedManga.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        created += len(rows)
+    return created
+
+
+def generate(mangas=DEFAULT_MANGAS, stores=DEFAULT_STORES, days=DEFAULT_DAYS,
+             ranking_size=DEFAULT_RANKING_SIZE, seed=1, end_date=None):
+    """
+    合成データを作成し、日ごとにレーティング更新処理を実行する
+
+    Returns:
+        dict: 作成した件数
+    """
+    rng = random.Random(seed)
+    end_date = end_date or date.today()
+    dates = [end_date - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    ranking_size = min(ranking_size, mangas)
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        genres = ensure_categories()
+        store_objects = create_stores(stores)
+        manga_ids = create_mangas(mangas, genres, store_objects, rng)
+        logger.info(f"マンガ{len(manga_ids)}件、ストア{len(store_objects)}件を作成しました ({time.perf_counter() - start:.1f}秒)")
+        scraped = create_rankings(store_objects, manga_ids, dates, ranking_size, rng)
+        logger.info(f"{len(dates)}日分のスクレイピングデータを{scraped}件作成しました ({time.perf_counter() - start:.1f}秒)")
+
+    # 日次ランキング集計・急上昇マンガ・レーティングを古い日から順に作成する（静的ファイルは出力しない）
+    for scraping_date in dates:
+        update_ratings(scraping_date)
+    publish_ratings(export=False)
+    logger.info(f"レーティングを更新しました ({time.perf_counter() - start:.1f}秒)")
+    return {'mangas': len(manga_ids), 'stores': len(store_objects), 'days': len(dates), 'scraped_mangas': scraped}
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: "apply" を含む場合は作成を実行、"reset" で合成データを削除、"mangas=N" などで規模を指定
+    """
+    options = ' '.join(args).split()
+    apply = 'apply' in options
+    scale = {
+        'mangas': DEFAULT_MANGAS,
+        'stores': DEFAULT_STORES,
+        'days': DEFAULT_DAYS,
+        'ranking': DEFAULT_RANKING_SIZE,
+        'seed': 1,
+    }
+    for option in options:
+        key, _, value = option.partition('=')
+        if key in scale and value:
+            scale[key] = int(value)
+
+    existing = synthetic_counts()
+    if 'reset' in options:
+        print(f"作成済みの合成データ: {existing}")
+        if apply:
+            reset()
+            print("作成済みの合成データを削除しました")
+            existing = synthetic_counts()
+    elif existing['mangas'] or existing['stores']:
+        print(f"合成データが作成済みです: {existing}")
+        print("作り直すには --script-args=\"apply reset\" を指定してください")
+        return
+
+    ranking_size = min(scale['ranking'], scale['mangas'])
+    print(f"マンガ: {scale['mangas']}件、ストア: {scale['stores']}件、"
+          f"日数: {scale['days']}日、スクレイピングデータ: {scale['stores'] * scale['days'] * ranking_size}件 "
+          f"(シード: {scale['seed']})")
+    if not apply:
+        print("ドライランのため作成は行っていません。実行するには --script-args=\"apply\" を指定してください")
+        return
+
+    start = time.perf_counter()
+    created = generate(
+        mangas=scale['mangas'],
+        stores=scale['stores'],
+        days=scale['days'],
+        ranking_size=scale['ranking'],
+        seed=scale['seed'],
+    )
+    print(f"合成データを作成しました: {created} ({time.perf_counter() - start:.1f}秒)")
@@ -0,0 +1,251 @@
+"""
+マンガAPIの負荷テスト
+
+起動済みのAPIサーバーに対して複数スレッドから並行にリクエストを送り、
+エンドポイントごとのリクエスト数/秒とレイテンシのパーセンタイル（p50/p90/p95/p99）を表示します。
+Djangoに依存しないため、APIサーバーとは別のマシン・コンテナからも実行できます。
+
+Usage:
+    python scripts/load_test.py [--base-url URL] [--concurrency N] [--duration 秒] [--requests N]
+                                [--category all] [--manga-ids 1,2,3] [--search 転生,スライム] [--json]
+
+Example:
+    # MySQL（docker-compose）で起動したgunicornに対して実行
+    docker-compose up -d api db
+    python scripts/load_test.py --base-url http://localhost:8000 --concurrency 16 --duration 30
+
+    # SQLiteで起動したサーバーに対して実行
+    DATABASE_URL=sqlite:////tmp/free_manga.sqlite3 python manage.py migrate
+    DATABASE_URL=sqlite:////tmp/free_manga.sqlite3 gunicorn -c config/gunicorn.conf.py
+    python scripts/load_test.py --requests 2000
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote
+
+import requests
+
+DEFAULT_BASE_URL = 'http://localhost:8000'
+DEFAULT_PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """
+    ソート済みのリストからパーセンタイル値を取得する（線形補間）
+
+    Args:
+        sorted_values (list): 昇順にソートされた値
+        p (float): パーセンタイル（0〜100）
+
+    Returns:
+        float: パーセンタイル値（値がない場合は0）
+    """
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def build_endpoints(base_url, category='all', manga_ids=None, session=None, search_terms=None):
+    """
+    負荷をかけるエンドポイントの一覧を作成する
+
+    マンガIDが指定されていない場合は人気マンガリストから取得します。
+    検索語を指定した場合は検索APIも含めます。
+
+    Returns:
+        list: (名前, URL) のリスト
+    """
+    base_url = base_url.rstrip('/')
+    endpoints = [
+        ('manga-list', f'{base_url}/api/v1/manga/'),
+        ('popular-books', f'{base_url}/api/v1/manga/popular-books/{category}/'),
+    ]
+    if manga_ids is None:
+        session = session or requests.Session()
+        try:
+            response = session.get(endpoints[1][1], timeout=10)
+            response.raise_for_status()
+            data = response.json()
+            results = data.get('results', []) if isinstance(data, dict) else data
+            manga_ids = [item['id'] for item in results[:20] if 'id' in item]
+        except (requests.RequestException, ValueError) as e:
+            print(f"マンガIDの取得に失敗しました: {e}", file=sys.stderr)
+            manga_ids = []
+    for manga_id in manga_ids:
+        endpoints.append(('manga-detail', f'{base_url}/api/v1/manga/{manga_id}/'))
+    for term in search_terms or []:
+        endpoints.append(('manga-search', f'{base_url}/api/v1/manga/search/?q={quote(term)}'))
+    return endpoints
+
+
+def run_load_test(endpoints, concurrency=8, duration=10.0, total_requests=None, timeout=10.0):
+    """
+    エンドポイントに並行してリクエストを送る
+
+    各スレッドはKeep-Aliveを有効にしたセッションを使い、エンドポイントを順番に巡回します。
+
+    Args:
+        endpoints (list): (名前, URL) のリスト
+        concurrency (int): 並行スレッド数
+        duration (float): 実行時間（秒）。total_requests を指定した場合は無視
+        total_requests (int or None): 送信するリクエストの総数
+        timeout (float): 1リクエストのタイムアウト（秒）
+
+    Returns:
+        dict: 名前 → {'latencies': [秒], 'errors': int, 'status': {ステータスコード: 件数}} と
+              全体の経過時間 '_elapsed'
+    """
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0, 'status': defaultdict(int)})
+    lock = threading.Lock()
+    counter = {'sent': 0}
+    deadline = time.perf_counter() + duration
+
+    def _next_index():
+        with lock:
+            if total_requests is not None and counter['sent'] >= total_requests:
+                return None
+            index = counter['sent']
+            counter['sent'] += 1
+            return index
+
+    def _worker():
+        session = requests.Session()
+        local = defaultdict(lambda: {'latencies': [], 'errors': 0, 'status': defaultdict(int)})
+        while total_requests is not None or time.perf_counter() < deadline:
+            index = _next_index()
+            if index is None:
+                break
+            name, url = endpoints[index % len(endpoints)]
+            start = time.perf_counter()
+            try:
+                response = session.get(url, timeout=timeout)
+                response.content  # ボディの受信完了までを計測する
+                elapsed = time.perf_counter() - start
+                local[name]['status'][response.status_code] += 1
+                if response.status_code >= 400:
+                    local[name]['errors'] += 1
+                else:
+                    local[name]['latencies'].append(elapsed)
+            except requests.RequestException:
+                local[name]['errors'] += 1
+        session.close()
+        with lock:
+            for name, stats in local.items():
+                results[name]['latencies'].extend(stats['latencies'])
+                results[name]['errors'] += stats['errors']
+                for status, count in stats['status'].items():
+                    results[name]['status'][status] += count
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results = dict(results)
+    results['_elapsed'] = time.perf_counter() - started
+    return results
+
+
+def summarize(results, percentiles=DEFAULT_PERCENTILES):
+    """
+    負荷テストの結果を集計する
+
+    Returns:
+        list: エンドポイントごと（最後に全体 'total'）の集計結果の辞書
+    """
+    elapsed = results['_elapsed']
+    rows = []
+    all_latencies = []
+    total_errors = 0
+    for name, stats in results.items():
+        if name == '_elapsed':
+            continue
+        latencies = sorted(stats['latencies'])
+        all_latencies.extend(latencies)
+        total_errors += stats['errors']
+        rows.append(_summary_row(name, latencies, stats['errors'], elapsed, percentiles))
+        rows[-1]['status'] = dict(stats['status'])
+    rows.append(_summary_row('total', sorted(all_latencies), total_errors, elapsed, percentiles))
+    return rows
+
+
+def _summary_row(name, latencies, errors, elapsed, percentiles):
+    row = {
+        'endpoint': name,
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+    }
+    for p in percentiles:
+        row[f'p{p}_ms'] = percentile(latencies, p) * 1000
+    return row
+
+
+def print_summary(rows, percentiles=DEFAULT_PERCENTILES):
+    header = f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}"
+    header += ''.join(f"{f'p{p}(ms)':>10}" for p in percentiles)
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        line = f"{row['endpoint']:<16}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}"
+        line += ''.join(f"{row[f'p{p}_ms']:>10.1f}" for p in percentiles)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='マンガAPIの負荷テスト')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='APIサーバーのURL')
+    parser.add_argument('--concurrency', type=int, default=8, help='並行スレッド数')
+    parser.add_argument('--duration', type=float, default=10.0, help='実行時間（秒）')
+    parser.add_argument('--requests', type=int, default=None, help='送信するリクエストの総数（指定時は --duration を無視）')
+    parser.add_argument('--category', default='all', help='人気マンガリストのカテゴリ')
+    parser.add_argument('--manga-ids', default=None, help='詳細APIに使うマンガID（カンマ区切り）')
+    parser.add_argument('--search', default=None, help='検索APIに使う検索語（カンマ区切り）')
+    parser.add_argument('--timeout', type=float, default=10.0, help='1リクエストのタイムアウト（秒）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力する')
+    args = parser.parse_args(argv)
+
+    manga_ids = None
+    if args.manga_ids:
+        manga_ids = [int(i) for i in args.manga_ids.split(',') if i.strip()]
+    search_terms = [term for term in (args.search or '').split(',') if term.strip()]
+    endpoints = build_endpoints(args.base_url, args.category, manga_ids, search_terms=search_terms)
+
+    if not args.json:
+        target = f"{args.requests}リクエスト" if args.requests else f"{args.duration}秒"
+        print(f"{args.base_url} に {args.concurrency}並行で {target} の負荷をかけます（エンドポイント: {len(endpoints)}件）")
+    results = run_load_test(
+        endpoints,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        total_requests=args.requests,
+        timeout=args.timeout,
+    )
+    rows = summarize(results)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print_summary(rows)
+    return 1 if rows[-1]['requests'] and rows[-1]['errors'] == rows[-1]['requests'] else 0
+
+
+def run(*args):
+    """
+    runscript から実行する場合のエントリーポイント
+
+    Example:
+        python manage.py runscript load_test --script-args="--concurrency 16 --duration 30"
+    """
+    return main(' '.join(args).split())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,326 @@
+"""
+ストア間で表記揺れしている重複マンガを検出・統合するスクリプト
+
+MangaTitleBlock のブロッキングキー（MinHash LSH）を共有するマンガ同士だけを比較するため、
+全件の総当たりを行わずに重複候補を検出できます。
+
+Usage:
+    python manage.py runscript merge_duplicate_mangas [--script-args="apply"]
+
+    引数を省略した場合は検出結果の表示のみ行います（ドライラン）。
+    "apply" を指定すると重複マンガを統合します。
+    "threshold=0.9" のようにタイトル類似度の閾値を指定できます。
+    「ゴルゴ13」と「ゴルゴ」のようにタイトル中の数字だけが異なるペアは別作品の可能性があるため統合せず、
+    要確認として表示します。確認のうえ統合する場合は "confirm=12:34,56:78" のようにマンガIDのペアを指定してください。
+
+Example:
+    python manage.py runscript merge_duplicate_mangas
+    python manage.py runscript merge_duplicate_mangas --script-args="apply threshold=0.95"
+    python manage.py runscript merge_duplicate_mangas --script-args="apply confirm=12:34"
+"""
+import logging
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count
+from manga.models import (
+    DataGeneration, Manga, MangaTitleBlock, ScrapedManga, MangaEbookStore, MangaDailyRanking, TrendingManga
+)
+from manga.normalization import series_title_key, normalize_title_key, title_numbers, title_shingles, jaccard
+
+logger = logging.getLogger(__name__)
+
+# タイトル類似度（bigramのJaccard係数）の既定の閾値
+DEFAULT_THRESHOLD = 0.9
+
+# これより多くのマンガが共有するブロッキングキーは比較対象外とする（汎用的すぎるキー）
+MAX_BLOCK_SIZE = 50
+
+
+class _UnionFind:
+    """重複候補のクラスタリング用のUnion-Find"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self):
+        groups = defaultdict(list)
+        for x in self.parent:
+            groups[self.find(x)].append(x)
+        return [members for members in groups.values() if len(members) > 1]
+
+
+def _authors_compatible(author_a, author_b):
+    """著者名が同一人物とみなせるか（片方が不明の場合は許容）"""
+    key_a = normalize_title_key(author_a) if author_a and author_a != '不明' else ''
+    key_b = normalize_title_key(author_b) if author_b and author_b != '不明' else ''
+    if not key_a or not key_b:
+        return True
+    if key_a in key_b or key_b in key_a:
+        return True
+    return jaccard(title_shingles(key_a), title_shingles(key_b)) >= 0.5
+
+
+def find_duplicate_groups(threshold=DEFAULT_THRESHOLD, confirmed_pairs=()):
+    """
+    重複しているマンガのグループを検出する
+
+    正規化タイトルが異なり、タイトル中の数字（title_numbers()）も異なるペアは、
+    confirmed_pairs に含まれる場合のみ重複とみなします。
+
+    Args:
+        threshold (float): シリーズタイトルのJaccard係数の閾値
+        confirmed_pairs (iterable): 統合を確認済みのマンガIDのペア
+
+    Returns:
+        tuple: (マンガIDのリストのリスト, 確認が必要なマンガIDのペアのリスト)
+    """
+    confirmed_pairs = {tuple(sorted(pair)) for pair in confirmed_pairs}
+    # ブロッキングキー未作成のマンガ（マイグレーション前の既存データなど）を補完
+    built = MangaTitleBlock.objects.build_missing()
+    if built:
+        logger.info(f"{built}件のマンガのブロッキングキーを作成しました")
+
+    # 複数のマンガが共有するキーのみ取得
+    shared_keys = (
+        MangaTitleBlock.objects.values('block_key')
+        .annotate(n=Count('manga'))
+        .filter(n__gt=1, n__lte=MAX_BLOCK_SIZE)
+        .values_list('block_key', flat=True)
+    )
+    blocks = defaultdict(list)
+    for block_key, manga_id in (
+        MangaTitleBlock.objects.filter(block_key__in=shared_keys)
+        .order_by()
+        .values_list('block_key', 'manga_id')
+        .iterator()
+    ):
+        blocks[block_key].append(manga_id)
+
+    candidate_pairs = set()
+    for members in blocks.values():
+        members.sort()
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                candidate_pairs.add((a, b))
+    logger.info(f"重複候補のペア: {len(candidate_pairs)}件")
+    if not candidate_pairs:
+        return [], []
+
+    manga_ids = {manga_id for pair in candidate_pairs for manga_id in pair}
+    mangas = {}
+    for manga_id, title, author in Manga.objects.filter(id__in=manga_ids).values_list('id', 'title', 'author'):
+        key = series_title_key(title)
+        mangas[manga_id] = (key, title_shingles(key), author, normalize_title_key(title), title_numbers(title))
+
+    union_find = _UnionFind()
+    unconfirmed_pairs = []
+    for a, b in sorted(candidate_pairs):
+        if a not in mangas or b not in mangas:
+            continue
+        key_a, shingles_a, author_a, title_key_a, numbers_a = mangas[a]
+        key_b, shingles_b, author_b, title_key_b, numbers_b = mangas[b]
+        if not _authors_compatible(author_a, author_b):
+            continue
+        if key_a != key_b and jaccard(shingles_a, shingles_b) < threshold:
+            continue
+        # 数字だけが異なるタイトル（「ゴルゴ13」と「ゴルゴ」など）は別作品の可能性があるため確認を求める
+        if title_key_a != title_key_b and numbers_a != numbers_b and (a, b) not in confirmed_pairs:
+            unconfirmed_pairs.append((a, b))
+            continue
+        union_find.union(a, b)
+    return union_find.groups(), unconfirmed_pairs
+
+
+def _choose_canonical(mangas):
+    """統合先のマンガを選ぶ（レーティングが最も高く、同点なら最も古いもの）"""
+    return min(mangas, key=lambda m: (-m.rating, m.id))
+
+
+@transaction.atomic
+def merge_mangas(canonical, duplicates):
+    """
+    重複マンガを統合先のマンガにまとめる
+
+    ScrapedManga・MangaDailyRanking・MangaEbookStore・TrendingManga を統合先に付け替え、同じスクレイピング履歴・日付・
+    ストア・カテゴリのデータが既にある場合は順位の高い方・更新日時の新しい方・表示順の上の方を残します。
+    カテゴリは和集合とし、統合先で空のフィールドは重複マンガの値で補完します。
+
+    Args:
+        canonical (Manga): 統合先のマンガ
+        duplicates (list): 統合するマンガのリスト
+    """
+    duplicate_ids = [m.id for m in duplicates]
+
+    # スクレイピングデータ: (履歴 → 行) で統合先の行と突き合わせる
+    canonical_scraped = {
+        s.scraping_history_id: s for s in ScrapedManga.objects.filter(manga=canonical)
+    }
+    for scraped in ScrapedManga.objects.filter(manga_id__in=duplicate_ids).order_by('rank'):
+        existing = canonical_scraped.get(scraped.scraping_history_id)
+        if existing is None:
+            scraped.manga = canonical
+            scraped.save(update_fields=['manga'])
+            canonical_scraped[scraped.scraping_history_id] = scraped
+            continue
+        existing.rank = min(existing.rank, scraped.rank)
+        existing.free_chapters = max(existing.free_chapters, scraped.free_chapters)
+        existing.free_books = max(existing.free_books, scraped.free_books)
+        existing.save(update_fields=['rank', 'free_chapters', 'free_books'])
+        scraped.delete()
+
+    # 日次ランキング集計: 同じ日の集計がある場合はストア別の順位を統合する
+    canonical_daily = {
+        d.date: d for d in MangaDailyRanking.objects.filter(manga=canonical)
+    }
+    for daily in MangaDailyRanking.objects.filter(manga_id__in=duplicate_ids):
+        existing = canonical_daily.get(daily.date)
+        if existing is None:
+            daily.manga = canonical
+            daily.save(update_fields=['manga'])
+            canonical_daily[daily.date] = daily
+            continue
+        for store_id, rank in daily.ranks.items():
+            existing.ranks[store_id] = min(rank, existing.ranks.get(store_id, rank))
+        existing.best_rank = min(existing.ranks.values())
+        existing.free_chapters = max(existing.free_chapters, daily.free_chapters)
+        existing.free_books = max(existing.free_books, daily.free_books)
+        existing.save(update_fields=['ranks', 'best_rank', 'free_chapters', 'free_books'])
+        daily.delete()
+
+    # ストア別詳細URL: ストアごとに更新日時の新しい方を残す
+    canonical_stores = {
+        d.ebookstore_id: d for d in MangaEbookStore.objects.filter(manga=canonical)
+    }
+    for detail in MangaEbookStore.objects.filter(manga_id__in=duplicate_ids).order_by('-updated_at'):
+        existing = canonical_stores.get(detail.ebookstore_id)
+        if existing is None:
+            detail.manga = canonical
+            detail.save(update_fields=['manga'])
+            canonical_stores[detail.ebookstore_id] = detail
+            continue
+        if detail.updated_at > existing.updated_at:
+            existing.url = detail.url or existing.url
+            existing.free_chapters = detail.free_chapters
+            existing.free_books = detail.free_books
+            existing.save(update_fields=['url', 'free_chapters', 'free_books', 'updated_at'])
+        detail.delete()
+
+    # 急上昇マンガ: カテゴリごとに表示順の上の方を残す
+    canonical_trending = {
+        t.category: t for t in TrendingManga.objects.filter(manga=canonical)
+    }
+    for trending in TrendingManga.objects.filter(manga_id__in=duplicate_ids).order_by('position'):
+        existing = canonical_trending.get(trending.category)
+        if existing is None:
+            trending.manga = canonical
+            trending.save(update_fields=['manga'])
+            canonical_trending[trending.category] = trending
+            continue
+        if trending.position < existing.position:
+            fields = ['position', 'date', 'current_rank', 'previous_rank', 'rank_delta']
+            for field in fields:
+                setattr(existing, field, getattr(trending, field))
+            existing.save(update_fields=fields)
+        trending.delete()
+
+    # カテゴリの和集合
+    category_ids = set(
+        Manga.categories.through.objects.filter(manga_id__in=duplicate_ids)
+        .values_list('category_id', flat=True)
+    )
+    if category_ids:
+        canonical.categories.add(*category_ids)
+
+    # 空のフィールドを補完
+    update_fields = []
+    for field in ('isbn', 'cover_image', 'description', 'first_book_title'):
+        if getattr(canonical, field):
+            continue
+        for duplicate in duplicates:
+            value = getattr(duplicate, field)
+            if value:
+                setattr(canonical, field, value)
+                update_fields.append(field)
+                break
+    for field in ('free_chapters', 'free_books'):
+        value = max([getattr(canonical, field)] + [getattr(d, field) for d in duplicates])
+        if value != getattr(canonical, field):
+            setattr(canonical, field, value)
+            update_fields.append(field)
+    if update_fields:
+        canonical.save(update_fields=update_fields + ['updated_at'])
+
+    Manga.objects.filter(id__in=duplicate_ids).delete()
+
+
+def run(*args):
+    """
+    スクリプト実行のエントリーポイント
+
+    Args:
+        args: "apply" を含む場合は統合を実行、"threshold=0.9" で類似度の閾値を指定、
+            "confirm=12:34,56:78" で統合を確認済みのマンガIDのペアを指定
+    """
+    options = ' '.join(args).split()
+    apply = 'apply' in options
+    threshold = DEFAULT_THRESHOLD
+    confirmed_pairs = []
+    for option in options:
+        if option.startswith('threshold='):
+            threshold = float(option.split('=', 1)[1])
+        elif option.startswith('confirm='):
+            for pair in option.split('=', 1)[1].split(','):
+                a, _, b = pair.partition(':')
+                if a.isdigit() and b.isdigit():
+                    confirmed_pairs.append((int(a), int(b)))
+
+    logger.info(f"重複マンガの検出を開始します (閾値: {threshold}, {'統合を実行' if apply else 'ドライラン'})")
+    groups, unconfirmed_pairs = find_duplicate_groups(threshold, confirmed_pairs)
+    logger.info(f"重複グループ: {len(groups)}件")
+
+    merged_count = 0
+    for manga_ids in groups:
+        mangas = list(Manga.objects.filter(id__in=manga_ids))
+        if len(mangas) < 2:
+            continue
+        canonical = _choose_canonical(mangas)
+        duplicates = [m for m in mangas if m.id != canonical.id]
+        titles = ", ".join(f"「{m.title}」(ID: {m.id})" for m in duplicates)
+        print(f"統合先「{canonical.title}」(ID: {canonical.id}) <- {titles}")
+        if not apply:
+            continue
+        try:
+            merge_mangas(canonical, duplicates)
+            merged_count += len(duplicates)
+        except Exception as e:
+            logger.error(f"マンガ「{canonical.title}」(ID: {canonical.id}) の統合中にエラーが発生しました: {e}")
+
+    if unconfirmed_pairs:
+        titles = dict(Manga.objects.filter(
+            id__in={manga_id for pair in unconfirmed_pairs for manga_id in pair}
+        ).values_list('id', 'title'))
+        print(f"タイトル中の数字だけが異なるため統合しなかったペア（{len(unconfirmed_pairs)}件）:")
+        for a, b in unconfirmed_pairs:
+            print(f"  {a}:{b} 「{titles.get(a)}」「{titles.get(b)}」")
+        print("同じ作品の場合は --script-args=\"confirm=ID:ID,...\" で指定してください")
+
+    if apply and merged_count:
+        # 人気・急上昇マンガのキャッシュを作り直す
+        DataGeneration.objects.bump(DataGeneration.RATINGS)
+    if apply:
+        logger.info(f"{merged_count}件の重複マンガを統合しました")
+        print(f"{merged_count}件の重複マンガを統合しました")
+    else:
+        print("ドライランのため統合は行っていません。統合するには --script-args=\"apply\" を指定してください")
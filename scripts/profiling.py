@@ -0,0 +1,148 @@
+"""
+スクリプト実行時のプロファイリング
+
+runscript の引数に --profile を指定したスクリプト（scraper / test_scraper / update_manga_ratings）の処理を
+プロファイラの下で実行し、結果をファイルに出力します。
+
+    --profile            cProfile で計測し、.pstats ファイルを出力します（python -m pstats や snakeviz で参照）
+    --profile=sample     一定間隔でスタックを記録し、.folded ファイル（flamegraph.pl / speedscope 形式）を出力します
+    --profile-dir=パス   出力先（省略時は PROFILE_DIR）
+
+Example:
+    python manage.py runscript scraper --script-args="--profile"
+    python manage.py runscript test_scraper --script-args="ebookstore_b --profile=sample"
+    flamegraph.pl profiles/scraper-store2-20250510-030000.folded > scraper.svg
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.path.join(settings.BASE_DIR, 'profiles')
+
+# sample モードでスタックを記録する間隔（秒）
+SAMPLE_INTERVAL = 0.005
+
+# cProfile の結果としてログに出力する関数の数
+LOG_TOP_FUNCTIONS = 20
+
+
+def parse_profile_options(args):
+    """
+    runscript の引数からプロファイリングのオプションを取り出す
+
+    Args:
+        args (iterable): runscript の引数
+
+    Returns:
+        tuple: (モード（None / 'cprofile' / 'sample'）, 出力先, プロファイリング以外の引数のリスト)
+    """
+    mode = None
+    directory = PROFILE_DIR
+    remaining = []
+    for option in ' '.join(args).split():
+        key, _, value = option.lstrip('-').partition('=')
+        if key == 'profile':
+            mode = value or 'cprofile'
+        elif key == 'profile-dir':
+            directory = value
+        else:
+            remaining.append(option)
+    if mode not in (None, 'cprofile', 'sample'):
+        raise ValueError(f"--profile には cprofile または sample を指定してください: {mode}")
+    return mode, directory, remaining
+
+
+class StackSampler:
+    """
+    対象のスレッドのスタックを一定間隔で記録するサンプリングプロファイラ
+
+    別スレッドから sys._current_frames() で対象スレッドのフレームを読むため、
+    cProfile より計測による速度低下が小さく、本番に近い条件で計測できます。
+    """
+
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def write_folded(self, path):
+        """スタックごとの記録回数を folded 形式（「関数;関数;関数 回数」）で出力する"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def _run_profiler(name, mode, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    start = time.perf_counter()
+    if mode == 'sample':
+        sampler = StackSampler()
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            sampler.write_folded(path + '.folded')
+            logger.info(f"プロファイル結果を出力しました: {path}.folded "
+                        f"({sum(sampler.samples.values())}サンプル, {time.perf_counter() - start:.1f}秒)")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + '.pstats')
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(LOG_TOP_FUNCTIONS)
+        logger.info(f"プロファイル結果を出力しました: {path}.pstats ({time.perf_counter() - start:.1f}秒)\n{output.getvalue()}")
+
+
+def profile(name, mode, directory=PROFILE_DIR):
+    """
+    with 文の中の処理をプロファイリングする（mode が None の場合は何もしない）
+
+    Args:
+        name (str): 出力ファイル名の先頭（例: scraper-store2）
+        mode (str or None): 'cprofile' / 'sample' / None
+        directory (str): 出力先
+    """
+    if mode is None:
+        return nullcontext()
+    return _run_profiler(name, mode, directory)
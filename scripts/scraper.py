@@ -2,14 +2,18 @@
 マンガデータをスクレイピングするスクリプト
 Django extensionsのrunscriptコマンドで実行する
 例: python manage.py runscript scraper
+    python manage.py runscript scraper --script-args="--profile"  # ストアごとにプロファイル結果を出力（scripts/profiling.py）
 """
 import time
 import logging
 from datetime import datetime, date
-from django.db import transaction
+from django.db import close_old_connections, transaction
+from config.db.stats import get_connection_stats
+from manga.cache import category_cache
 from manga.models import Category, EbookStore, ScrapingHistory
+from scripts.profiling import parse_profile_options, profile
 from scripts.scrapers.registry import ScraperRegistry
-from scripts.utils import get_or_create_manga
+from scripts.utils import manga_identity_map
 
 # ロギングの設定
 logging.basicConfig(
@@ -18,12 +22,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run():
+def run(*args):
     """
     スクリプトのメインエントリポイント
+    
+    Args:
+        args: "--profile" / "--profile=sample" でストアごとのプロファイル結果を出力
     """
+    profile_mode, profile_dir, _ = parse_profile_options(args)
     logger.info("マンガデータスクレイピングを開始します")
     
+    # タイトル→マンガIDの対応表とカテゴリキャッシュは実行単位で共有するため、開始時にクリアする
+    manga_identity_map.clear()
+    category_cache.invalidate()
+    
     try:
         # カテゴリデータが存在しない場合は作成
         create_initial_categories()
@@ -59,7 +71,8 @@ def run():
                     setattr(scraper, 'scraping_history', scraping_history)
                     
                     # スクレイピングを実行
-                    success = scraper.run()
+                    with profile(f"scraper-store{store.id}", profile_mode, profile_dir):
+                        success = scraper.run()
                     scraping_history.is_success = bool(success)
                     scraping_history.finished_at = datetime.now()
                     scraping_history.save()
@@ -74,11 +87,14 @@ def run():
                 
                 # スクレイパー間の待機時間（サーバー負荷軽減のため）
                 time.sleep(5)
+                # 待機中に切断された接続や CONN_MAX_AGE を過ぎた接続を次のストアで使わないようにする
+                close_old_connections()
                 
             except Exception as e:
                 logger.error(f"電子書籍ストア '{store.name}' のスクレイピング中にエラーが発生しました: {e}")
         
         logger.info("すべてのスクレイピングが完了しました")
+        logger.info(f"DB接続の統計: {get_connection_stats()}")
     
     except Exception as e:
         logger.error(f"スクレイピング処理中にエラーが発生しました: {e}")
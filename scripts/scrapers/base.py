@@ -3,12 +3,18 @@
 すべての電子書籍ストア用スクレイパーはこのクラスを継承します
 """
 import logging
+import time
 import traceback
 from abc import ABC, abstractmethod
 from datetime import datetime
+import requests
+from bs4 import BeautifulSoup
 from django.db import transaction
-from manga.models import Category, ScrapingHistory, ScrapedManga, EbookStore, MangaEbookStore
-from scripts.utils import get_or_create_manga
+from manga.cache import category_cache
+from manga.models import Manga, ScrapingHistory, ScrapedManga, EbookStore, MangaEbookStore
+from manga.normalization import normalize_title_key
+from scripts.scrapers.metrics import DETAIL_FETCH, EXTRACT, FETCH, PARSE, SAVE, WAIT, ScrapeMetrics
+from scripts.utils import get_or_create_manga_id, manga_identity_map, bulk_create_missing_mangas
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +33,7 @@ class BaseStoreScraper(ABC):
         """
         self.store = None
         self.history = None
+        self.metrics = ScrapeMetrics()
         
         try:
             self.store = EbookStore.objects.get(id=store_id)
@@ -45,11 +52,15 @@ class BaseStoreScraper(ABC):
             self.history = self.scraping_history
         else:
             self.history = self._create_history()
+        self.metrics = ScrapeMetrics()
         try:
             # スクレイピングを実行
             logger.info(f"{self.store.name} のスクレイピングを開始します")
-            manga_data_list = self._scrape()
-            self._save_data(manga_data_list)
+            with self.metrics.stage(EXTRACT):
+                manga_data_list = self._scrape()
+            self.metrics.items = len(manga_data_list)
+            with self.metrics.stage(SAVE):
+                self._save_data(manga_data_list)
             self._update_history_success()
             logger.info(f"{self.store.name} のスクレイピングが正常に完了しました")
             return True
@@ -70,6 +81,7 @@ class BaseStoreScraper(ABC):
         """スクレイピング履歴を成功として更新"""
         self.history.is_success = True
         self.history.finished_at = datetime.now()
+        self.history.stats = self._collect_stats()
         self.history.save()
     
     def _update_history_failure(self, error_message):
@@ -77,12 +89,55 @@ class BaseStoreScraper(ABC):
         self.history.is_success = False
         self.history.error_message = error_message
         self.history.finished_at = datetime.now()
+        self.history.stats = self._collect_stats()
         self.history.save()
     
+    def _collect_stats(self):
+        """計測結果を取得してログに出力する"""
+        stats = self.metrics.to_dict()
+        stages = ", ".join(f"{name}: {seconds:.1f}秒" for name, seconds in stats['stages'].items())
+        logger.info(f"{self.store.name} の処理時間: 合計 {stats['total_seconds']:.1f}秒 ({stages}), "
+                    f"リクエスト: {stats['requests']}件 (再試行: {stats['retries']}件, エラー: {stats['errors']}件), "
+                    f"ダウンロード: {stats['bytes_downloaded']:,}バイト")
+        return stats
+    
+    def _http_get(self, url, retry=False, **kwargs):
+        """
+        requests.get を実行し、リクエスト数・ステータスコード・ダウンロード量を記録する
+        
+        Args:
+            url (str): URL
+            retry (bool): 再試行のリクエストかどうか
+            kwargs: requests.get に渡す引数
+        
+        Returns:
+            requests.Response: レスポンス
+        """
+        # 詳細ページの取得中の通信は detail_fetch に計上する
+        stage = DETAIL_FETCH if self.metrics.current_stage == DETAIL_FETCH else FETCH
+        with self.metrics.stage(stage):
+            try:
+                response = requests.get(url, **kwargs)
+            except requests.RequestException:
+                self.metrics.record_request(retry=retry, error=True)
+                raise
+        self.metrics.record_request(response.status_code, len(response.content), retry)
+        return response
+    
+    def _parse_html(self, markup, features='html.parser'):
+        """HTMLを解析する（処理時間を parse として記録する）"""
+        with self.metrics.stage(PARSE):
+            return BeautifulSoup(markup, features)
+    
+    def _wait(self, seconds):
+        """サーバー負荷軽減・再試行のために待機する（待機時間を wait として記録する）"""
+        with self.metrics.stage(WAIT):
+            time.sleep(seconds)
+    
     def _save_data(self, manga_data_list):
         """
         スクレイピングしたマンガデータを保存
-        各項目ごとに独立してトランザクションを実行し、一部のデータが失敗しても他のデータが保存されるようにする
+        全体を1つのトランザクションで実行し、各項目はセーブポイントで独立させて一部のデータが失敗しても他のデータが保存されるようにする
         
         Args:
             manga_data_list (list): マンガデータのリスト。各要素は以下のキーを含む辞書:
@@ -97,73 +152,116 @@ class BaseStoreScraper(ABC):
                 - manga (Manga): 既に作成済みのMangaオブジェクト（後方互換性のため）
         """
         created_count = 0
-        for i, manga_data in enumerate(manga_data_list):
-            try:
-                with transaction.atomic():
-                    category_id = manga_data.get('category_id', 'all')
-                    category = Category.objects.get(id=category_id)
-                    
-                    # Mangaオブジェクトの取得または作成
-                    if 'manga' in manga_data:
-                        # 既にMangaオブジェクトが作成済みの場合（後方互換性）
-                        manga = manga_data['manga']
-                    else:
-                        # 生データからMangaオブジェクトを作成
-                        title = manga_data['title']
-                        author = manga_data['author']
-                        first_book_title = manga_data.get('first_book_title', '')
-                        categories = [category]
+        # 候補タイトルをまとめて読み込み、以降の検索を辞書参照で済ませる
+        manga_identity_map.preload(
+            manga_data['title'] for manga_data in manga_data_list if 'title' in manga_data
+        )
+        try:
+            # 一括登録したマンガと、それを参照するデータを同じトランザクションで保存する
+            # （各項目はセーブポイントで独立させ、一部のデータが失敗しても他のデータは保存する）
+            with transaction.atomic():
+                # 未登録のマンガは1回のupsertでまとめて作成する（並列実行でも重複しない）
+                bulk_ids = {}
+                try:
+                    with transaction.atomic():
+                        bulk_ids = bulk_create_missing_mangas(manga_data_list)
+                    if bulk_ids:
+                        logger.info(f"{len(bulk_ids)}件のマンガを一括登録しました")
+                except Exception as e:
+                    # 一括登録に失敗しても各項目ごとの登録処理で作成を試みる
+                    manga_identity_map.discard_pending(bulk_ids)
+                    logger.warning(f"マンガの一括登録中にエラーが発生しました: {str(e)}")
+
+                saved_keys = set()
+                failed_keys = set()
+                for i, manga_data in enumerate(manga_data_list):
+                    key = normalize_title_key(manga_data['title']) if manga_data.get('title') else None
+                    try:
+                        with transaction.atomic():
+                            category_id = manga_data.get('category_id', 'all')
+                            category = category_cache.get_category(category_id)
                         
-                        manga, _ = get_or_create_manga(
-                            title=title,
-                            author=author,
-                            categories=categories,
-                            first_book_title=first_book_title
-                        )
+                            # マンガIDの取得または作成
+                            if 'manga' in manga_data:
+                                # 既にMangaオブジェクトが作成済みの場合（後方互換性）
+                                manga_id = manga_data['manga'].id
+                                title = manga_data['manga'].title
+                            else:
+                                # 生データからマンガを作成
+                                title = manga_data['title']
+                                author = manga_data['author']
+                                first_book_title = manga_data.get('first_book_title', '')
+                                categories = [category]
+                            
+                                manga_id, _ = get_or_create_manga_id(
+                                    title=title,
+                                    author=author,
+                                    categories=categories,
+                                    first_book_title=first_book_title
+                                )
+                            
+                                if not manga_id:
+                                    logger.warning(f"マンガの作成に失敗しました: '{title}' (rank: {manga_data.get('rank', i+1)})")
+                                    continue
                         
-                        if not manga:
-                            logger.warning(f"マンガの作成に失敗しました: '{title}' (rank: {manga_data.get('rank', i+1)})")
-                            continue
-                    
-                    ScrapedManga.objects.update_or_create(
-                        scraping_history=self.history,
-                        manga=manga,
-                        defaults={
-                            'free_chapters': manga_data['free_chapters'],
-                            'free_books': manga_data['free_books'],
-                            'rank': manga_data['rank']
-                        }
-                    )
-                    
-                    # 詳細URLがある場合は保存
-                    detail_url = manga_data.get('detail_url')
-                    free_chapters = manga_data.get('free_chapters', 0)
-                    free_books = manga_data.get('free_books', 0)
-                    if detail_url:
-                        MangaEbookStore.objects.update_or_create(
-                            manga=manga,
-                            ebookstore=self.store,
-                            defaults={
-                                'url': detail_url,
-                                'free_chapters': free_chapters,
-                                'free_books': free_books
-                            }
-                        )
-                        logger.debug(f"詳細URL・無料話数・無料巻数保存: {manga.title} -> {detail_url}, {free_chapters}, {free_books}")
-                    else:
-                        # URLがない場合も無料話数・無料巻数を更新
-                        MangaEbookStore.objects.update_or_create(
-                            manga=manga,
-                            ebookstore=self.store,
-                            defaults={
-                                'free_chapters': free_chapters,
-                                'free_books': free_books
-                            }
-                        )
-                    
-                    created_count += 1
-            except Exception as e:
-                logger.warning(f"マンガデータの保存中にエラーが発生しました (rank: {i+1}): {str(e)}")
+                            ScrapedManga.objects.update_or_create(
+                                scraping_history=self.history,
+                                manga_id=manga_id,
+                                defaults={
+                                    'free_chapters': manga_data['free_chapters'],
+                                    'free_books': manga_data['free_books'],
+                                    'rank': manga_data['rank']
+                                }
+                            )
+                        
+                            # 詳細URLがある場合は保存
+                            detail_url = manga_data.get('detail_url')
+                            free_chapters = manga_data.get('free_chapters', 0)
+                            free_books = manga_data.get('free_books', 0)
+                            if detail_url:
+                                MangaEbookStore.objects.update_or_create(
+                                    manga_id=manga_id,
+                                    ebookstore=self.store,
+                                    defaults={
+                                        'url': detail_url,
+                                        'free_chapters': free_chapters,
+                                        'free_books': free_books
+                                    }
+                                )
+                                logger.debug(f"詳細URL・無料話数・無料巻数保存: {title} -> {detail_url}, {free_chapters}, {free_books}")
+                            else:
+                                # URLがない場合も無料話数・無料巻数を更新
+                                MangaEbookStore.objects.update_or_create(
+                                    manga_id=manga_id,
+                                    ebookstore=self.store,
+                                    defaults={
+                                        'free_chapters': free_chapters,
+                                        'free_books': free_books
+                                    }
+                                )
+                        
+                            created_count += 1
+                        saved_keys.add(key)
+                    except Exception as e:
+                        # ロールバックしたセーブポイント内で作成したマンガは存在しないため登録を取り消す
+                        manga_identity_map.discard_pending([key])
+                        failed_keys.add(key)
+                        logger.warning(f"マンガデータの保存中にエラーが発生しました (rank: {i+1}): {str(e)}")
+
+                # この呼び出しで一括登録したものの、保存に失敗してどのデータからも参照されていないマンガを削除する
+                # （bulk_ids には他のワーカーが作成したマンガは含まれない）
+                orphan_keys = [key for key in failed_keys - saved_keys if key in bulk_ids]
+                if orphan_keys:
+                    Manga.objects.filter(
+                        id__in=[bulk_ids[key] for key in orphan_keys], scraped_mangas__isnull=True
+                    ).delete()
+                    manga_identity_map.discard_pending(orphan_keys)
+                    logger.info(f"保存に失敗した{len(orphan_keys)}件のマンガの登録を取り消しました")
+        except Exception:
+            # トランザクション全体がロールバックされた場合はコミットされていない登録をすべて取り消す
+            manga_identity_map.discard_pending()
+            raise
+        self.metrics.saved = created_count
         logger.info(f"{created_count}件のマンガデータを保存しました")
     
     @abstractmethod
@@ -3,13 +3,12 @@
 URL: https://comic.k-manga.jp/rank/
 """
 import logging
-import time
-import re
 import requests
 import random
-from bs4 import BeautifulSoup
+from scripts.free_count import parse_free_counts, parse_volume_count
 from scripts.scrapers.base import BaseStoreScraper
-from manga.models import Category, EbookStoreCategoryUrl
+from scripts.scrapers.metrics import DETAIL_FETCH, timed_stage
+from manga.cache import category_cache
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +35,7 @@ class MangaOukokuScraper(BaseStoreScraper):
         manga_data = []
         scraping_history = getattr(self, 'scraping_history', None)
         # ストアカテゴリURLごとに処理
-        for cat_url in EbookStoreCategoryUrl.objects.filter(store=self.store):
+        for cat_url in category_cache.get_store_category_urls(self.store.id):
             url = cat_url.url
             category_objs = [cat_url.category]
             logger.info(f"カテゴリ: {cat_url.category.name} / URL: {url} のスクレイピングを開始")
@@ -45,7 +44,7 @@ class MangaOukokuScraper(BaseStoreScraper):
                 if not response:
                     logger.error(f"ページを取得できませんでした: {url}")
                     continue
-                soup = BeautifulSoup(response, 'html.parser')
+                soup = self._parse_html(response, 'html.parser')
                 
                 rank = 1
                 potential_selectors = [
@@ -182,25 +181,23 @@ class MangaOukokuScraper(BaseStoreScraper):
                             free_books = 0
                             free_book_elem = item.select_one('aside.icon-text.icon-text__jikkuri')
                             if free_book_elem and '冊無料' in free_book_elem.text:
-                                books_match = re.search(r'(\d+)冊無料', free_book_elem.text)
-                                if books_match:
-                                    free_books = int(books_match.group(1))
+                                _, books = parse_free_counts(free_book_elem.text)
+                                if books is not None:
+                                    free_books = books
                                     logger.info(f"無料冊数を検出: {free_books}冊 (rank: {i+1})")
                             for text in item.stripped_strings:
-                                chapters_match = re.search(r'(\d+)話無料', text)
-                                if chapters_match:
-                                    free_chapters = int(chapters_match.group(1))
-                                if free_books == 0 and '冊無料' in text:
-                                    books_match = re.search(r'(\d+)冊無料', text)
-                                    if books_match:
-                                        free_books = int(books_match.group(1))
+                                chapters, books = parse_free_counts(text)
+                                if chapters is not None:
+                                    free_chapters = chapters
+                                if free_books == 0 and books is not None:
+                                    free_books = books
                             if free_books == 0:
                                 for book_selector in ['.free-volumes', '.volume-free', '.free-book']:
                                     book_elem = item.select_one(book_selector)
                                     if book_elem and '冊' in book_elem.text:
-                                        books_match = re.search(r'(\d+)冊', book_elem.text)
-                                        if books_match:
-                                            free_books = int(books_match.group(1))
+                                        books = parse_volume_count(book_elem.text)
+                                        if books is not None:
+                                            free_books = books
                                             break
                             
                             # Fetch manga details
@@ -276,7 +273,7 @@ class MangaOukokuScraper(BaseStoreScraper):
         """
         try:
             logger.info(f"ページを取得: {url}")
-            response = requests.get(url, headers=self.HEADERS, timeout=30)
+            response = self._http_get(url, headers=self.HEADERS, timeout=30)
             
             # HTTPステータスコードのチェック
             if response.status_code != 200:
@@ -289,6 +286,7 @@ class MangaOukokuScraper(BaseStoreScraper):
             logger.error(f"ページ取得中にエラーが発生しました: {e}")
             return None
     
+    @timed_stage(DETAIL_FETCH)
     def _fetch_manga_details(self, detail_url):
         """
         Fetch and parse the manga detail page to extract specific fields.
@@ -301,13 +299,13 @@ class MangaOukokuScraper(BaseStoreScraper):
         """
         try:
             logger.info(f"Fetching manga detail page: {detail_url}")
-            time.sleep(random.uniform(1, 3))  # Add a delay between requests
+            self._wait(random.uniform(1, 3))  # Add a delay between requests
             response = self._fetch_page(detail_url)
             if not response:
                 logger.error(f"Failed to fetch manga detail page: {detail_url}")
                 return {}
 
-            soup = BeautifulSoup(response, 'html.parser')
+            soup = self._parse_html(response, 'html.parser')
 
             # Extract the first book title using the chapter-exid="1" selector
             first_book_elem = soup.select_one('div.book-chapter--item[chapter-exid="1"] h2.book-chapter--title a')
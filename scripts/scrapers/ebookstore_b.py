@@ -7,11 +7,11 @@ import random
 import re
 import json
 import requests
-from bs4 import BeautifulSoup
-import time
 from urllib.parse import urljoin
+from scripts.free_count import parse_chapter_label
 from scripts.scrapers.base import BaseStoreScraper
-from manga.models import Category, EbookStoreCategoryUrl
+from scripts.scrapers.metrics import DETAIL_FETCH, timed_stage
+from manga.cache import category_cache
 
 logger = logging.getLogger(__name__)
 
@@ -29,19 +29,6 @@ class EbookStoreBScraper(BaseStoreScraper):
         'Accept-Language': 'ja-JP,ja;q=0.9,en-US;q=0.8,en;q=0.7',
     }
     
-    # 無料表記のパターン
-    FREE_PATTERNS = [
-        (r'(\d+)-(\d+)話無料', lambda m: int(m.group(2)) - int(m.group(1)) + 1),  # "1-52話無料" の形式
-        (r'全巻無料\((\d+)話\)', lambda m: int(m.group(1))),  # "全巻無料(19話)" の形式
-        (r'全巻([\d,]+)話無料', lambda m: int(m.group(1).replace(',', ''))),  # "全巻12,345話無料" の形式
-        (r'(\d+)話まで無料', lambda m: int(m.group(1))),  # "10話まで無料" の形式
-        (r'(\d+)話分無料', lambda m: int(m.group(1))),  # "10話分無料" の形式
-        (r'第(\d+)話まで無料', lambda m: int(m.group(1))),  # "第10話まで無料" の形式
-        (r'(\d+)話.*無料', lambda m: int(m.group(1))),  # "10話無料" の形式
-        (r'無料(\d+)話', lambda m: int(m.group(1))),  # "無料10話" の形式
-        (r'(\d+)話', lambda m: int(m.group(1))),  # 単純な "10話" の形式
-    ]
-    
     def _scrape(self):
         """
         スキマからランキングデータをスクレイピングします
@@ -61,7 +48,7 @@ class EbookStoreBScraper(BaseStoreScraper):
             logger.info(f"テストモードで実行中: 最大 {test_item_limit} アイテムのみ処理します")
         
         # ストアカテゴリURLごとに処理
-        for cat_url in EbookStoreCategoryUrl.objects.filter(store=self.store):
+        for cat_url in category_cache.get_store_category_urls(self.store.id):
             url = cat_url.url
             category_objs = [cat_url.category]
             logger.info(f"カテゴリ: {cat_url.category.name} / URL: {url} のスクレイピングを開始")
@@ -73,7 +60,7 @@ class EbookStoreBScraper(BaseStoreScraper):
                     logger.error(f"ページを取得できませんでした: {url}")
                     continue
                 
-                soup = BeautifulSoup(response, 'html.parser')
+                soup = self._parse_html(response, 'html.parser')
                 
                 # ランキングリストを取得
                 # スキマサイトの構造に合わせて適切なセレクタを使用
@@ -143,7 +130,7 @@ class EbookStoreBScraper(BaseStoreScraper):
                             logger.info(f"処理進捗: {i + 1}/{min(len(ranking_items), 100)} アイテム完了")
                         
                         # 次のリクエスト前に短い待機時間を入れる（サーバー負荷軽減）
-                        time.sleep(random.uniform(0.5, 3.0))
+                        self._wait(random.uniform(0.5, 3.0))
                         
                     except Exception as e:
                         logger.warning(f"マンガアイテムの解析中にエラーが発生しました (rank: {i+1}): {e}")
@@ -285,18 +272,10 @@ class EbookStoreBScraper(BaseStoreScraper):
         free_chapters = 0
         
         # スキマの標準的な無料表示要素を探す
+        # 無料表記のパターンは scripts/free_count.py で事前にコンパイル済み
         free_elem = item.select_one('div.bg-free')
         if free_elem:
-            free_text = free_elem.text.strip()
-            # 複数のパターンを試す
-            for pattern, extractor in self.FREE_PATTERNS:
-                match = re.search(pattern, free_text)
-                if match:
-                    try:
-                        free_chapters = extractor(match)
-                        break
-                    except (ValueError, IndexError) as e:
-                        logger.warning(f"無料話数の解析エラー: {e}")
+            free_chapters = parse_chapter_label(free_elem.text.strip())
         
         # 他の可能性のある要素も確認
         if free_chapters == 0:
@@ -306,14 +285,7 @@ class EbookStoreBScraper(BaseStoreScraper):
                 if elem:
                     # 全テキストノードに対して無料話数パターンを試す
                     for text in elem.stripped_strings:
-                        for pattern, extractor in self.FREE_PATTERNS:
-                            match = re.search(pattern, text)
-                            if match:
-                                try:
-                                    free_chapters = extractor(match)
-                                    break
-                                except (ValueError, IndexError) as e:
-                                    logger.warning(f"無料話数の解析エラー: {e}")
+                        free_chapters = parse_chapter_label(text)
                         if free_chapters > 0:
                             break
         
@@ -321,14 +293,7 @@ class EbookStoreBScraper(BaseStoreScraper):
         if free_chapters == 0:
             for text in item.stripped_strings:
                 if '無料' in text:
-                    for pattern, extractor in self.FREE_PATTERNS:
-                        match = re.search(pattern, text)
-                        if match:
-                            try:
-                                free_chapters = extractor(match)
-                                break
-                            except (ValueError, IndexError) as e:
-                                logger.warning(f"無料話数の解析エラー: {e}")
+                    free_chapters = parse_chapter_label(text)
                     if free_chapters > 0:
                         break
                         
@@ -357,9 +322,9 @@ class EbookStoreBScraper(BaseStoreScraper):
             # ランダムな待機時間を入れてサーバーへの負荷を軽減
             # 詳細ページは通常より長めに待機（サーバー負荷対策）
             if '/book/title/' in url:
-                time.sleep(random.uniform(2.0, 4.0))
+                self._wait(random.uniform(2.0, 4.0))
             else:
-                time.sleep(random.uniform(1.0, 3.0))
+                self._wait(random.uniform(1.0, 3.0))
             
             # カスタムヘッダーでよりブラウザっぽくする
             custom_headers = self.HEADERS.copy()
@@ -367,7 +332,7 @@ class EbookStoreBScraper(BaseStoreScraper):
             custom_headers['Accept'] = 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
             
             # リクエスト実行
-            response = requests.get(url, headers=custom_headers, timeout=30)
+            response = self._http_get(url, headers=custom_headers, timeout=30, retry=retry_count > 0)
             
             # HTTPステータスコードのチェック
             if response.status_code != 200:
@@ -377,21 +342,21 @@ class EbookStoreBScraper(BaseStoreScraper):
                 if response.status_code == 429:
                     retry_after = int(response.headers.get('Retry-After', 60))
                     logger.info(f"レート制限を検出。{retry_after}秒待機します。")
-                    time.sleep(retry_after)
+                    self._wait(retry_after)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 5xx系サーバーエラーの場合は待機してリトライ
                 elif 500 <= response.status_code < 600:
                     wait_time = (retry_count + 1) * 5  # 指数バックオフ
                     logger.info(f"サーバーエラー。{wait_time}秒後に再試行します。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 他のエラーは一度だけ再試行
                 elif retry_count < 1:
                     wait_time = random.uniform(3.0, 5.0)
                     logger.info(f"HTTPエラー後、{wait_time}秒待機してリトライします。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 return None
@@ -405,7 +370,7 @@ class EbookStoreBScraper(BaseStoreScraper):
             if retry_count < 1:
                 wait_time = random.uniform(5.0, 10.0)
                 logger.info(f"接続エラー後、{wait_time}秒待機してリトライします。")
-                time.sleep(wait_time)
+                self._wait(wait_time)
                 return self._fetch_page(url, retry_count + 1, max_retries)
                 
             return None
@@ -452,6 +417,7 @@ class EbookStoreBScraper(BaseStoreScraper):
         logger.warning("詳細ページのURLが見つかりませんでした")
         return None
         
+    @timed_stage(DETAIL_FETCH)
     def _fetch_author_from_detail_page(self, detail_url):
         """
         マンガ詳細ページから著者情報を取得
@@ -470,7 +436,7 @@ class EbookStoreBScraper(BaseStoreScraper):
                 logger.warning(f"詳細ページを取得できませんでした: {detail_url}")
                 return "不明"
                 
-            soup = BeautifulSoup(response, 'html.parser')
+            soup = self._parse_html(response, 'html.parser')
             
             # スキマの標準的な著者リンクを検索 (class="author"があるaタグから最初の一つだけ取得)
             author_link = soup.select_one('a.author')
@@ -509,7 +475,7 @@ class EbookStoreBScraper(BaseStoreScraper):
         category_counts = {}
         for m in manga_data:
             cat_id = m['category_id']
-            cat_name = Category.objects.get(id=cat_id).name
+            cat_name = category_cache.get_category_name(cat_id)
             if cat_name not in category_counts:
                 category_counts[cat_name] = 0
             category_counts[cat_name] += 1
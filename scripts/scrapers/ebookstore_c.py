@@ -6,11 +6,11 @@ import logging
 import random
 import re
 import requests
-from bs4 import BeautifulSoup
-import time
 from urllib.parse import urljoin
+from scripts.free_count import parse_free_counts, first_int
 from scripts.scrapers.base import BaseStoreScraper
-from manga.models import Category, EbookStoreCategoryUrl
+from scripts.scrapers.metrics import DETAIL_FETCH, timed_stage
+from manga.cache import category_cache
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +47,7 @@ class EbookStoreCScraper(BaseStoreScraper):
             logger.info(f"テストモードで実行中: 最大 {test_item_limit} アイテムのみ処理します")
         
         # ストアカテゴリURLごとに処理
-        for cat_url in EbookStoreCategoryUrl.objects.filter(store=self.store):
+        for cat_url in category_cache.get_store_category_urls(self.store.id):
             url = cat_url.url
             category_objs = [cat_url.category]
             logger.info(f"カテゴリ: {cat_url.category.name} / URL: {url} のスクレイピングを開始")
@@ -59,7 +59,7 @@ class EbookStoreCScraper(BaseStoreScraper):
                     logger.error(f"ページを取得できませんでした: {url}")
                     continue
                 
-                soup = BeautifulSoup(response, 'html.parser')
+                soup = self._parse_html(response, 'html.parser')
                 
                 # ランキングリストを取得
                 ranking_items = soup.select('ul.grid-contents__list.contents-list li.contents-list__item.list-item')
@@ -123,7 +123,7 @@ class EbookStoreCScraper(BaseStoreScraper):
                             logger.info(f"処理進捗: {i + 1}/{min(len(ranking_items), items_to_process)} アイテム完了")
                         
                         # 次のリクエスト前に短い待機時間を入れる（サーバー負荷軽減）
-                        time.sleep(random.uniform(0.5, 5.0))
+                        self._wait(random.uniform(0.5, 5.0))
                         
                     except Exception as e:
                         logger.warning(f"マンガアイテムの解析中にエラーが発生しました (rank: {i+1}): {e}")
@@ -155,14 +155,14 @@ class EbookStoreCScraper(BaseStoreScraper):
             logger.info(f"ページを取得: {url} (試行回数: {retry_count + 1})")
             
             # ランダムな待機時間を入れてサーバーへの負荷を軽減
-            time.sleep(random.uniform(1.0, 3.0))
+            self._wait(random.uniform(1.0, 3.0))
             
             # カスタムヘッダーでよりブラウザっぽくする
             custom_headers = self.HEADERS.copy()
             custom_headers['Referer'] = 'https://www.ebookjapan.jp/ebj/ranking/'
             
             # リクエスト実行
-            response = requests.get(url, headers=custom_headers, timeout=30)
+            response = self._http_get(url, headers=custom_headers, timeout=30, retry=retry_count > 0)
             
             # HTTPステータスコードのチェック
             if response.status_code != 200:
@@ -172,21 +172,21 @@ class EbookStoreCScraper(BaseStoreScraper):
                 if response.status_code == 429:
                     retry_after = int(response.headers.get('Retry-After', 60))
                     logger.info(f"レート制限を検出。{retry_after}秒待機します。")
-                    time.sleep(retry_after)
+                    self._wait(retry_after)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 5xx系サーバーエラーの場合は待機してリトライ
                 elif 500 <= response.status_code < 600:
                     wait_time = (retry_count + 1) * 5  # 指数バックオフ
                     logger.info(f"サーバーエラー。{wait_time}秒後に再試行します。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 他のエラーは一度だけ再試行
                 elif retry_count < 1:
                     wait_time = random.uniform(3.0, 5.0)
                     logger.info(f"HTTPエラー後、{wait_time}秒待機してリトライします。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 return None
@@ -200,11 +200,12 @@ class EbookStoreCScraper(BaseStoreScraper):
             if retry_count < 1:
                 wait_time = random.uniform(5.0, 10.0)
                 logger.info(f"接続エラー後、{wait_time}秒待機してリトライします。")
-                time.sleep(wait_time)
+                self._wait(wait_time)
                 return self._fetch_page(url, retry_count + 1, max_retries)
                 
             return None
             
+    @timed_stage(DETAIL_FETCH)
     def _fetch_manga_details(self, detail_url):
         """
         Fetch and parse the manga detail page to extract author, free books, free chapters, and first book title.
@@ -222,7 +223,7 @@ class EbookStoreCScraper(BaseStoreScraper):
                 logger.warning(f"Failed to fetch manga detail page: {detail_url}")
                 return {'author': '不明', 'free_books': 0, 'free_chapters': 0, 'first_book_title': None}
 
-            soup = BeautifulSoup(response, 'html.parser')
+            soup = self._parse_html(response, 'html.parser')
 
             # Extract author
             author_elem = soup.select_one('p.contents-detail__author a')
@@ -234,9 +235,9 @@ class EbookStoreCScraper(BaseStoreScraper):
             for item in free_items:
                 title_elem = item.select_one('p.book-caption__title')
                 if title_elem:
-                    volume_match = re.search(r'(\d+)', title_elem.text.strip())
-                    if volume_match:
-                        free_books.append(int(volume_match.group(1)))
+                    volume = first_int(title_elem.text.strip())
+                    if volume is not None:
+                        free_books.append(volume)
             max_free_books = max(free_books) if free_books else 0
 
             # Extract free chapters
@@ -245,9 +246,9 @@ class EbookStoreCScraper(BaseStoreScraper):
             if serial_item:
                 free_tag = serial_item.select_one('span.tagtext.tagtext--carnation.tagtext--fill.story-caption__tagtext')
                 if free_tag:
-                    chapters_match = re.search(r'(\d+)話無料', free_tag.text)
-                    if chapters_match:
-                        free_chapters = int(chapters_match.group(1))
+                    chapters, _ = parse_free_counts(free_tag.text)
+                    if chapters is not None:
+                        free_chapters = chapters
 
             # Extract first book title
             first_book_elem = soup.select_one('h1.book-main__heading')
@@ -316,7 +317,7 @@ class EbookStoreCScraper(BaseStoreScraper):
         category_counts = {}
         for m in manga_data:
             cat_id = m['category_id']
-            cat_name = Category.objects.get(id=cat_id).name
+            cat_name = category_cache.get_category_name(cat_id)
             if cat_name not in category_counts:
                 category_counts[cat_name] = 0
             category_counts[cat_name] += 1
@@ -6,11 +6,11 @@ import logging
 import random
 import re
 import requests
-from bs4 import BeautifulSoup
-import time
 from urllib.parse import urljoin
+from scripts.free_count import first_int
 from scripts.scrapers.base import BaseStoreScraper
-from manga.models import Category, EbookStoreCategoryUrl
+from scripts.scrapers.metrics import DETAIL_FETCH, timed_stage
+from manga.cache import category_cache
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +50,7 @@ class EbookStoreDScraper(BaseStoreScraper):
             logger.info(f"テストモードで実行中: 最大 {test_item_limit} アイテムのみ処理します")
         
         # ストアカテゴリURLごとに処理
-        for cat_url in EbookStoreCategoryUrl.objects.filter(store=self.store):
+        for cat_url in category_cache.get_store_category_urls(self.store.id):
             url = cat_url.url
             if not url.endswith(self.RANKING_PARAMS):
                 url = url + self.RANKING_PARAMS
@@ -65,7 +65,7 @@ class EbookStoreDScraper(BaseStoreScraper):
                     logger.error(f"ページを取得できませんでした: {url}")
                     continue
                 
-                soup = BeautifulSoup(response, 'html.parser')
+                soup = self._parse_html(response, 'html.parser')
                 
                 # ランキングリストを取得
                 ranking_items = soup.select('ul#ranking_result_list li')
@@ -85,12 +85,10 @@ class EbookStoreDScraper(BaseStoreScraper):
                             continue
                             
                         rank_text = rank_elem.text.strip()
-                        rank_match = re.search(r'(\d+)', rank_text)
-                        if not rank_match:
+                        rank = first_int(rank_text)
+                        if rank is None:
                             logger.warning(f"順位のパースに失敗しました: {rank_text}")
                             continue
-                            
-                        rank = int(rank_match.group(1))
                         
                         # タイトルの取得
                         title_elem = item.select_one('div.search_result_box_right a.title')
@@ -146,7 +144,7 @@ class EbookStoreDScraper(BaseStoreScraper):
                             logger.info(f"処理進捗: {i + 1}/{min(len(ranking_items), items_to_process)} アイテム完了")
                         
                         # 次のリクエスト前に短い待機時間を入れる（サーバー負荷軽減）
-                        time.sleep(random.uniform(0.5, 5.0))
+                        self._wait(random.uniform(0.5, 5.0))
                         
                     except Exception as e:
                         logger.warning(f"マンガアイテムの解析中にエラーが発生しました (rank: {i+1}): {e}")
@@ -178,14 +176,14 @@ class EbookStoreDScraper(BaseStoreScraper):
             logger.info(f"ページを取得: {url} (試行回数: {retry_count + 1})")
             
             # ランダムな待機時間を入れてサーバーへの負荷を軽減
-            time.sleep(random.uniform(1.0, 3.0))
+            self._wait(random.uniform(1.0, 3.0))
             
             # カスタムヘッダーでよりブラウザっぽくする
             custom_headers = self.HEADERS.copy()
             custom_headers['Referer'] = 'https://www.cmoa.jp/ranking/'
             
             # リクエスト実行
-            response = requests.get(url, headers=custom_headers, timeout=30)
+            response = self._http_get(url, headers=custom_headers, timeout=30, retry=retry_count > 0)
             
             # HTTPステータスコードのチェック
             if response.status_code != 200:
@@ -195,21 +193,21 @@ class EbookStoreDScraper(BaseStoreScraper):
                 if response.status_code == 429:
                     retry_after = int(response.headers.get('Retry-After', 60))
                     logger.info(f"レート制限を検出。{retry_after}秒待機します。")
-                    time.sleep(retry_after)
+                    self._wait(retry_after)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 5xx系サーバーエラーの場合は待機してリトライ
                 elif 500 <= response.status_code < 600:
                     wait_time = (retry_count + 1) * 5  # 指数バックオフ
                     logger.info(f"サーバーエラー。{wait_time}秒後に再試行します。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 # 他のエラーは一度だけ再試行
                 elif retry_count < 1:
                     wait_time = random.uniform(3.0, 5.0)
                     logger.info(f"HTTPエラー後、{wait_time}秒待機してリトライします。")
-                    time.sleep(wait_time)
+                    self._wait(wait_time)
                     return self._fetch_page(url, retry_count + 1, max_retries)
                     
                 return None
@@ -223,11 +221,12 @@ class EbookStoreDScraper(BaseStoreScraper):
             if retry_count < 1:
                 wait_time = random.uniform(5.0, 10.0)
                 logger.info(f"接続エラー後、{wait_time}秒待機してリトライします。")
-                time.sleep(wait_time)
+                self._wait(wait_time)
                 return self._fetch_page(url, retry_count + 1, max_retries)
                 
             return None
             
+    @timed_stage(DETAIL_FETCH)
     def _fetch_details_from_page(self, detail_url):
         """
         マンガ詳細ページから著者情報、無料冊数、第1巻タイトルを一度に取得
@@ -246,7 +245,7 @@ class EbookStoreDScraper(BaseStoreScraper):
                 logger.warning(f"詳細ページを取得できませんでした: {detail_url}")
                 return "不明", 0, None
 
-            soup = BeautifulSoup(response, 'html.parser')
+            soup = self._parse_html(response, 'html.parser')
 
             # 著者情報を取得
             author = "不明"
@@ -329,7 +328,7 @@ class EbookStoreDScraper(BaseStoreScraper):
         category_counts = {}
         for m in manga_data:
             cat_id = m['category_id']
-            cat_name = Category.objects.get(id=cat_id).name
+            cat_name = category_cache.get_category_name(cat_id)
             if cat_name not in category_counts:
                 category_counts[cat_name] = 0
             category_counts[cat_name] += 1
@@ -1,8 +1,6 @@
-import time
 import logging
-import requests
-from bs4 import BeautifulSoup
-from manga.models import EbookStoreCategoryUrl
+from manga.cache import category_cache
+from scripts.free_count import parse_free_counts, first_int
 from scripts.scrapers.base import BaseStoreScraper
 
 logger = logging.getLogger(__name__)
@@ -19,14 +17,11 @@ class EbookStoreEScraper(BaseStoreScraper):
         """
         1つのli.p-bookList_itemからマンガ情報を抽出し、登録する
         """
-        import re
         # 順位
         rank_elem = item.select_one('span.p-book_leadItem.p-book_rank')
         rank = 0
         if rank_elem:
-            m = re.search(r'(\d+)', rank_elem.text)
-            if m:
-                rank = int(m.group(1))
+            rank = first_int(rank_elem.text) or 0
         # タイトル
         title_elem = item.select_one('dt.p-book_title a')
         title = title_elem.text.strip() if title_elem else "不明"
@@ -50,9 +45,7 @@ class EbookStoreEScraper(BaseStoreScraper):
         free_chapters = 0
         free_elem = item.select_one('div.btn_free a')
         if free_elem:
-            m = re.search(r'(\d+)話無料', free_elem.text)
-            if m:
-                free_chapters = int(m.group(1))
+            free_chapters = parse_free_counts(free_elem.text)[0] or 0
         # 無料冊数は常に0
         free_books = 0
         logger.info(f"抽出: rank={rank}, title={title}, author={author}, free_chapters={free_chapters}, free_books={free_books}, category={cat_url.category.name}, detail_url={detail_url}")
@@ -73,7 +66,7 @@ class EbookStoreEScraper(BaseStoreScraper):
         scraping_history = getattr(self, 'scraping_history', None)
         test_mode = getattr(self, 'test_mode', False)
         test_item_limit = getattr(self, 'test_item_limit', 100) if test_mode else 100
-        for cat_url in EbookStoreCategoryUrl.objects.filter(store_id=self.STORE_ID):
+        for cat_url in category_cache.get_store_category_urls(self.STORE_ID):
             base_url = cat_url.url
             logger.info(f"カテゴリ: {cat_url.category.name} - ベースURL: {base_url}")
             category_objs = [cat_url.category]
@@ -82,9 +75,9 @@ class EbookStoreEScraper(BaseStoreScraper):
                 page_url = f"{base_url}&page={page}"
                 logger.info(f"フェッチ中: {page_url}")
                 try:
-                    response = requests.get(page_url, timeout=10)
+                    response = self._http_get(page_url, timeout=10)
                     response.raise_for_status()
-                    soup = BeautifulSoup(response.text, "html.parser")
+                    soup = self._parse_html(response.text, "html.parser")
                     manga_items = soup.select('li.p-bookList_item')
                     logger.info(f"ページ{page}で{len(manga_items)}件のマンガデータを検出")
                     for i, item in enumerate(manga_items):
@@ -100,7 +93,7 @@ class EbookStoreEScraper(BaseStoreScraper):
                         break
                 except Exception as e:
                     logger.warning(f"ページ取得失敗: {page_url} ({e})")
-                time.sleep(1)  # サーバー負荷軽減のため1秒待機
+                self._wait(1)  # サーバー負荷軽減のため1秒待機
         logger.info("めちゃコミランキングスクレイピング終了")
         self._report_stats(manga_data)
         return manga_data
@@ -125,11 +118,10 @@ class EbookStoreEScraper(BaseStoreScraper):
         free_books_found = sum(1 for m in manga_data if m['free_books'] > 0)
         
         # カテゴリごとの集計
-        from manga.models import Category
         category_counts = {}
         for m in manga_data:
             cat_id = m['category_id']
-            cat_name = Category.objects.get(id=cat_id).name
+            cat_name = category_cache.get_category_name(cat_id)
             if cat_name not in category_counts:
                 category_counts[cat_name] = 0
             category_counts[cat_name] += 1
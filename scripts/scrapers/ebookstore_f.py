@@ -6,7 +6,6 @@ Vue.jsでレンダリングされるページに対応
 import logging
 import random
 import re
-import time
 from urllib.parse import urljoin
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
@@ -15,9 +14,10 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from bs4 import BeautifulSoup
+from scripts.free_count import first_int
 from scripts.scrapers.base import BaseStoreScraper
-from manga.models import Category, EbookStoreCategoryUrl
+from scripts.scrapers.metrics import FETCH
+from manga.cache import category_cache
 
 logger = logging.getLogger(__name__)
 
@@ -98,8 +98,9 @@ class EbookStoreFScraper(BaseStoreScraper):
         try:
             logger.info(f"Seleniumでページを取得: {url}")
             
-            # ページにアクセス
-            self.driver.get(url)
+            # ページにアクセス（レンダリングの待機を含めて fetch として計測する）
+            with self.metrics.stage(FETCH):
+                self.driver.get(url)
             
             # Vue.jsのレンダリング完了を待機
             # ランキングリストが表示されるまで待機
@@ -110,7 +111,7 @@ class EbookStoreFScraper(BaseStoreScraper):
                 logger.info("Vue.jsのレンダリングが完了しました")
                 
                 # 追加の待機時間でコンテンツの完全読み込みを確保
-                time.sleep(2)
+                self._wait(2)
                 
             except TimeoutException:
                 logger.warning(f"ランキングリストの読み込みがタイムアウトしました: {url}")
@@ -118,6 +119,7 @@ class EbookStoreFScraper(BaseStoreScraper):
             
             # レンダリング後のHTMLを取得
             html_content = self.driver.page_source
+            self.metrics.record_request(size=len(html_content.encode('utf-8')))
             logger.info(f"HTML内容を取得しました（長さ: {len(html_content)}文字）")
             
             return html_content
@@ -149,7 +151,7 @@ class EbookStoreFScraper(BaseStoreScraper):
             self._setup_driver()
             
             # ストアカテゴリURLごとに処理
-            for cat_url in EbookStoreCategoryUrl.objects.filter(store=self.store):
+            for cat_url in category_cache.get_store_category_urls(self.store.id):
                 url = cat_url.url
                 category_objs = [cat_url.category]
                 logger.info(f"カテゴリ: {cat_url.category.name} / URL: {url} のスクレイピングを開始")
@@ -161,7 +163,7 @@ class EbookStoreFScraper(BaseStoreScraper):
                         logger.error(f"ページを取得できませんでした: {url}")
                         continue
                     
-                    soup = BeautifulSoup(html_content, 'html.parser')
+                    soup = self._parse_html(html_content, 'html.parser')
 
                     # <div id="index_vue" class="" data-v-app="">の内容をログ出力（デバッグ用）
                     # index_vue_div = soup.find('div', id='index_vue')
@@ -227,10 +229,7 @@ class EbookStoreFScraper(BaseStoreScraper):
                             free_books = 0
                             free_books_elem = item.select_one('span.p-no-charge-book-item__tag__no-charge-category-count')
                             if free_books_elem:
-                                free_books_text = free_books_elem.text.strip()
-                                free_books_match = re.search(r'(\d+)', free_books_text)
-                                if free_books_match:
-                                    free_books = int(free_books_match.group(1))
+                                free_books = first_int(free_books_elem.text.strip()) or 0
                             
                             # 無料話数は常に0
                             free_chapters = 0
@@ -263,7 +262,7 @@ class EbookStoreFScraper(BaseStoreScraper):
                                 logger.info(f"処理進捗: {i + 1}/{min(len(manga_items), items_to_process)} アイテム完了")
                             
                             # 次のリクエスト前に短い待機時間を入れる（サーバー負荷軽減）
-                            time.sleep(random.uniform(0.5, 2.0))
+                            self._wait(random.uniform(0.5, 2.0))
                             
                         except Exception as e:
                             logger.warning(f"マンガアイテムの解析中にエラーが発生しました (rank: {i+1}): {e}")
@@ -393,7 +392,7 @@ class EbookStoreFScraper(BaseStoreScraper):
         category_counts = {}
         for m in manga_data:
             cat_id = m['category_id']
-            cat_name = Category.objects.get(id=cat_id).name
+            cat_name = category_cache.get_category_name(cat_id)
             if cat_name not in category_counts:
                 category_counts[cat_name] = 0
             category_counts[cat_name] += 1
@@ -0,0 +1,115 @@
+"""
+スクレイピングの処理時間とリクエスト数の計測
+
+スクレイパーの処理を段階（ステージ）ごとに計測し、ScrapingHistory.stats に保存します。
+ステージは入れ子にでき、入れ子の内側で使った時間は外側のステージには含めません
+（例: 詳細ページの取得中の待機は wait に、HTMLの解析は parse に、通信は detail_fetch に計上されます）。
+"""
+import functools
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# ステージ名
+FETCH = 'fetch'                # ランキングページの取得
+PARSE = 'parse'                # HTMLの解析（BeautifulSoup）
+EXTRACT = 'extract'            # 解析結果からの項目の抽出（他のステージ以外の _scrape の処理）
+DETAIL_FETCH = 'detail_fetch'  # 詳細ページの取得
+WAIT = 'wait'                  # サーバー負荷軽減・再試行のための待機
+SAVE = 'save'                  # DBへの保存
+
+STAGES = (FETCH, PARSE, EXTRACT, DETAIL_FETCH, WAIT, SAVE)
+
+
+class ScrapeMetrics:
+    """1回のスクレイピングの計測結果"""
+
+    def __init__(self):
+        self.stage_seconds = defaultdict(float)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes_downloaded = 0
+        self.status_codes = defaultdict(int)
+        self.items = 0
+        self.saved = 0
+        self._stack = []
+        self._started = time.perf_counter()
+
+    @property
+    def current_stage(self):
+        """実行中のステージ名（ステージ外の場合はNone）"""
+        return self._stack[-1][0] if self._stack else None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        ステージの処理時間を計測する
+
+        入れ子になった場合は外側のステージの計測を止め、内側のステージの終了後に再開します。
+        """
+        now = time.perf_counter()
+        if self._stack:
+            outer_name, outer_start = self._stack[-1]
+            self.stage_seconds[outer_name] += now - outer_start
+        self._stack.append((name, now))
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, start = self._stack.pop()
+            self.stage_seconds[name] += now - start
+            if self._stack:
+                self._stack[-1] = (self._stack[-1][0], now)
+
+    def record_request(self, status_code=None, size=0, retry=False, error=False):
+        """
+        HTTPリクエストの結果を記録する
+
+        Args:
+            status_code (int, optional): ステータスコード（Seleniumなどで取得できない場合はNone）
+            size (int): ダウンロードしたバイト数
+            retry (bool): 再試行のリクエストかどうか
+            error (bool): 接続エラー・タイムアウトなどでレスポンスを受け取れなかったかどうか
+        """
+        self.requests += 1
+        if retry:
+            self.retries += 1
+        if error:
+            self.errors += 1
+            self.status_codes['error'] += 1
+        elif status_code is not None:
+            self.status_codes[str(status_code)] += 1
+        self.bytes_downloaded += size
+
+    def to_dict(self):
+        """ScrapingHistory.stats に保存する辞書"""
+        return {
+            'total_seconds': round(time.perf_counter() - self._started, 3),
+            'stages': {name: round(self.stage_seconds.get(name, 0.0), 3) for name in STAGES},
+            'requests': self.requests,
+            'retries': self.retries,
+            'errors': self.errors,
+            'status_codes': dict(self.status_codes),
+            'bytes_downloaded': self.bytes_downloaded,
+            'items': self.items,
+            'saved': self.saved,
+        }
+
+
+def timed_stage(name):
+    """
+    メソッドの処理時間を self.metrics のステージとして計測するデコレータ
+
+    Example:
+        @timed_stage(DETAIL_FETCH)
+        def _fetch_manga_details(self, detail_url):
+            ...
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
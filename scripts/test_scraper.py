@@ -4,12 +4,16 @@ Django extensionsのrunscriptコマンドで実行する
 例: python manage.py runscript test_scraper --script-args="ebookstore_a"
     python manage.py runscript test_scraper --script-args="ebookstore_b"
     python manage.py runscript test_scraper --script-args="ebookstore_c"
+    python manage.py runscript test_scraper --script-args="ebookstore_b --profile"  # プロファイル結果を出力（scripts/profiling.py）
 """
 import logging
 import sys
 from django.db import transaction
+from manga.cache import category_cache
 from manga.models import EbookStore, ScrapingHistory
+from scripts.profiling import parse_profile_options, profile
 from scripts.scrapers.registry import ScraperRegistry
+from scripts.utils import manga_identity_map
 from datetime import datetime
 
 # ロギングの設定
@@ -34,8 +38,9 @@ def run(*args):
     テスト用スクリプトのメインエントリポイント
     
     Args:
-        args: スクリプト引数 (最初の引数は scraper_name)
+        args: スクリプト引数 (最初の引数は scraper_name、"--profile" / "--profile=sample" でプロファイル結果を出力)
     """
+    profile_mode, profile_dir, args = parse_profile_options(args)
     if not args or len(args) < 1:
         logger.error("スクレイパー名を指定してください。例: python manage.py runscript test_scraper --script-args=\"ebookstore_c\"")
         return
@@ -50,6 +55,10 @@ def run(*args):
         
     logger.info(f"スクレイパー '{scraper_name}' をテストモードで実行します")
     
+    # タイトル→マンガIDの対応表とカテゴリキャッシュは実行単位で共有するため、開始時にクリアする
+    manga_identity_map.clear()
+    category_cache.invalidate()
+    
     try:
         store_name = SCRAPER_STORE_MAPPINGS[scraper_name]
         
@@ -101,7 +110,8 @@ def run(*args):
         
         # 制限付きでスクレイピング実行 (テストモードなので一部データのみ)
         logger.info(f"テストモードでスクレイピング実行（5件のみ処理）")
-        success = scraper.run()
+        with profile(f"test_scraper-{scraper_name}", profile_mode, profile_dir):
+            success = scraper.run()
         
         # スクレイピング履歴を更新
         scraping_history.is_success = bool(success)
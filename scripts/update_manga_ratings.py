@@ -2,11 +2,16 @@
 マンガテーブルのRatingを更新するスクリプト
 
 このスクリプトは、スクレイピングされたマンガデータの順位に基づいてRatingを更新します。
+順位の点数にはストアごとの重み（EbookStore.rating_weight）を掛け、対象日にスクレイピングに失敗したストアは
+直近の成功した日の順位を減衰させて使います（計算方法は manga/ratings.py を参照）。
+Google Booksから表紙画像・概要を補完した後に、レーティングの世代を進めて人気マンガリストの静的ファイル
+（scripts/export_popular_snapshots.py）を出力し直します。
 
 Usage:
     python manage.py runscript update_manga_ratings [--script-args="YYYY-MM-DD"]
     
     引数を省略した場合は当日のデータを使用します。
+    "--profile" / "--profile=sample" を指定するとレーティング更新処理のプロファイル結果を出力します（scripts/profiling.py）。
     
 Example:
     python manage.py runscript update_manga_ratings
@@ -18,8 +23,10 @@ import sys
 import os
 import requests
 from django.db import transaction
-from django.db.models import Avg, Min, Max, Case, When, F, Value, IntegerField
-from manga.models import Manga, ScrapedManga, ScrapingHistory, EbookStore
+from manga.models import Manga, ScrapingHistory, DataGeneration, MangaDailyRanking, TrendingManga
+from manga.ratings import compute_ratings, latest_histories, store_factor
+from scripts.export_popular_snapshots import export_snapshots
+from scripts.profiling import parse_profile_options, profile
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +37,8 @@ def update_ratings(target_date=None):
     """
     指定された日付のスクレイピングデータに基づいてマンガのレーティングを更新します
     
+    APIのキャッシュや静的ファイルには反映しないため、更新後に publish_ratings() を呼び出してください。
+    
     Args:
         target_date (date, optional): 集計対象日。指定しない場合は当日を使用します。
     
@@ -47,142 +56,81 @@ def update_ratings(target_date=None):
             logger.error(f"無効な日付形式です: {target_date}. 正しい形式はYYYY-MM-DDです。")
             return 0
     
-    print(f"対象日: {target_date} (type: {type(target_date)})")
     logger.info(f"対象日 {target_date} のスクレイピングデータに基づいてRatingを更新します")
     
-    # 全てのスクレイピング履歴を表示
-    all_histories = ScrapingHistory.objects.all()
-    print(f"データベース内の全スクレイピング履歴: {all_histories.count()}件")
-    for h in all_histories:
-        print(f"- 日付: {h.scraping_date} (type: {type(h.scraping_date)}), ストア: {h.store.name}, 成功: {h.is_success}")
-    
     # 対象日のスクレイピング履歴を取得
-    histories = ScrapingHistory.objects.filter(
-        scraping_date=target_date,
-        is_success=True
-    )
-    print(f"対象日のスクレイピング履歴: {histories.count()}件")
-    
-    if not histories.exists():
+    if not ScrapingHistory.objects.filter(scraping_date=target_date, is_success=True).exists():
         logger.warning(f"対象日 {target_date} の成功したスクレイピング履歴が見つかりません")
         return 0
     
-    # 全ストアのデータを取得
-    stores = [h.store for h in histories]
-    store_names = ", ".join([s.name for s in stores])
-    logger.info(f"ストア ({store_names}) のスクレイピングデータを使用します")
+    # ストアごとの直近の成功したスクレイピング履歴（対象日に失敗したストアは以前の日の順位を減衰させて使う）
+    histories = latest_histories(target_date)
+    for history in histories:
+        if history.scraping_date == target_date:
+            logger.info(f"ストア {history.store.name}: {history.scraping_date} の順位を使用します (重み: {history.store.rating_weight})")
+        else:
+            logger.warning(f"ストア {history.store.name}: 対象日のデータがないため {history.scraping_date} の順位を使用します "
+                           f"(重み: {history.store.rating_weight}, 係数: {store_factor(history, target_date):.3f})")
     
     # トランザクション内でRatingを更新
     with transaction.atomic():
-        # すべてのマンガを取得
-        mangas = Manga.objects.all()
+        results = compute_ratings(target_date, histories)
+        logger.info(f"順位データのあるマンガ: {len(results)}件")
+        # マンガID → 計算したレーティング（日次ランキング集計に記録する）
+        computed_ratings = {manga_id: result['rating'] for manga_id, result in results.items()}
         
-        # 更新対象のマンガの総数
-        manga_count = mangas.count()
-        logger.info(f"更新対象のマンガ: {manga_count}件")
+        # 値が変わったマンガのみまとめて更新する（順位データがないマンガは更新しない）
+        changed = []
+        for manga in Manga.objects.filter(id__in=list(results)).only('id', 'title', 'rating', 'free_chapters', 'free_books').iterator():
+            result = results[manga.id]
+            if (manga.rating, manga.free_chapters, manga.free_books) == (result['rating'], result['free_chapters'], result['free_books']):
+                continue
+            logger.debug(f"マンガ「{manga.title}」の更新: Rating: {manga.rating} -> {result['rating']}, "
+                         f"無料話数: {manga.free_chapters} -> {result['free_chapters']}, "
+                         f"無料巻数: {manga.free_books} -> {result['free_books']}")
+            manga.rating = result['rating']
+            manga.free_chapters = result['free_chapters']
+            manga.free_books = result['free_books']
+            changed.append(manga)
+        Manga.objects.bulk_update(changed, ['rating', 'free_chapters', 'free_books'], batch_size=1000)
+        updated_count = len(changed)
         
-        updated_count = 0
+        # 順位推移API用に、対象日の順位とレーティングを日次ランキング集計に追記する
+        summarized = MangaDailyRanking.objects.summarize_date(target_date, computed_ratings)
+        logger.info(f"日次ランキング集計を{summarized}件作成・更新しました")
         
-        # 各マンガのRatingを計算して更新
-        for manga in mangas:
-            # 該当日のスクレイピングデータをすべて取得
-            scraped_data = ScrapedManga.objects.filter(
-                manga=manga,
-                scraping_history__in=histories
-            )
-            
-            if not scraped_data.exists():
-                # 順位データがない場合はスキップ
-                print(f"マンガ「{manga.title}」の順位データがありません")
-                continue
-            
-            print(f"マンガ「{manga.title}」のスクレイピングデータ: {scraped_data.count()}件")
-            
-            # 各スクレイピングデータの合計を計算
-            # 1位 1000点
-            # 2位 750点
-            # 3位 500点
-            # 4位 300点
-            # 5位 250点
-            # 6位 200点
-            # 7位 175点
-            # 8位 150点
-            # 9位 125点
-            # 10位 100点
-            # 11位以下 100-順位点
-            # ただし、順位が100以上の場合は0点
-            total_rating = 0
-            ranks_info = []
-            
-            for data in scraped_data:
-                print(f"  - スクレイピングID: {data.id}, 順位: {data.rank}, ストア: {data.scraping_history.store.name}")
-                if data.rank == 1:
-                    points = 1000
-                elif data.rank == 2:
-                    points = 750
-                elif data.rank == 3:
-                    points = 500
-                elif data.rank == 4:
-                    points = 300
-                elif data.rank == 5:
-                    points = 250
-                elif data.rank == 6:
-                    points = 200
-                elif data.rank == 7:
-                    points = 175
-                elif data.rank == 8:
-                    points = 150
-                elif data.rank == 9:
-                    points = 125
-                elif data.rank == 10:
-                    points = 100
-                elif data.rank >= 11:
-                    points = max(0, 100 - data.rank)
-                else:
-                    points = 0
-                total_rating += points
-                ranks_info.append(f"{data.scraping_history.store.name} (順位: {data.rank}, 点数: {points})")
-            print(f"  合計Rating: {total_rating}")
-            
-            # 新しいRating値（最大100000に制限）
-            if total_rating > 100000:
-                new_rating = 100000
-            else:
-                new_rating = int(total_rating)
-            
-            print(f"  計算されたRating: {new_rating}, 現在のRating: {manga.rating}, 型: {type(manga.rating)}")
-            
-            # 無料話数と無料巻数の計算（最大値を使用）
-            free_chapters = scraped_data.aggregate(max_chapters=Max('free_chapters'))['max_chapters'] or 0
-            free_books = scraped_data.aggregate(max_books=Max('free_books'))['max_books'] or 0
-            
-            # Ratingまたは無料話数/無料巻数の更新が必要かチェック
-            needs_update = (manga.rating != new_rating or 
-                           manga.free_chapters != free_chapters or 
-                           manga.free_books != free_books)
-                           
-            if needs_update:
-                # 値を更新
-                old_rating = manga.rating
-                old_free_chapters = manga.free_chapters
-                old_free_books = manga.free_books
-                
-                manga.rating = new_rating
-                manga.free_chapters = free_chapters
-                manga.free_books = free_books
-                
-                # 更新するフィールドを指定
-                manga.save(update_fields=['rating', 'free_chapters', 'free_books'])
-                updated_count += 1
-                
-                ranks_detail = ", ".join(ranks_info)
-                logger.info(f"マンガ「{manga.title}」の更新: Rating: {old_rating} -> {new_rating}, "
-                           f"無料話数: {old_free_chapters} -> {free_chapters}, "
-                           f"無料巻数: {old_free_books} -> {free_books} "
-                           f"(順位詳細: {ranks_detail})")
+        # 急上昇マンガリスト用に、日次ランキング集計から順位の上昇幅を計算して保存する
+        trending = TrendingManga.objects.rebuild(target_date)
+        logger.info(f"急上昇マンガを{trending}件保存しました")
         
-        logger.info(f"更新されたマンガ: {updated_count}/{manga_count}件")
-        return updated_count
+        logger.info(f"更新されたマンガ: {updated_count}/{len(results)}件")
+    return updated_count
+
+def publish_ratings(export=True):
+    """
+    レーティングの世代を進め、人気マンガリストの静的ファイルを出力し直します
+    
+    世代をキーにしたAPIのキャッシュや静的ファイルに表紙画像・概要の補完前の内容が残らないよう、
+    ジョブのすべての更新が終わった後に呼び出します。
+    
+    Args:
+        export (bool): 人気マンガリストの静的ファイルを出力し直すかどうか
+    
+    Returns:
+        int: 更新後の世代
+    """
+    # APIワーカーのメモリ上の索引（サジェストなど）とレスポンスのキャッシュを作り直すため世代を進める
+    generation = DataGeneration.objects.bump(DataGeneration.RATINGS)
+    logger.info(f"レーティングの世代を {generation} に更新しました")
+    
+    # 出力に失敗してもレーティングの更新は取り消さない
+    if export:
+        try:
+            manifest = export_snapshots()
+            logger.info(f"スナップショット {manifest['version']} を出力しました")
+        except Exception as e:
+            logger.error(f"スナップショットの出力中にエラーが発生しました: {e}")
+    return generation
 
 def fetch_google_books_data(first_book_title, title):
     """
@@ -261,10 +209,11 @@ def run(*args):
     スクリプト実行のエントリーポイント
     
     Args:
-        args: コマンドライン引数（対象日）
+        args: コマンドライン引数（対象日、"--profile" / "--profile=sample"）
     """
     # デバッグ用に標準出力にもメッセージを出力
     print("スクリプト実行開始")
+    profile_mode, profile_dir, args = parse_profile_options(arg for arg in args if arg)
     
     # 対象日の取得（指定がなければ当日）
     target_date = None
@@ -279,7 +228,8 @@ def run(*args):
     try:
         # Ratingの更新処理を実行
         print("更新処理を実行します...")
-        updated_count = update_ratings(target_date)
+        with profile("update_manga_ratings", profile_mode, profile_dir):
+            updated_count = update_ratings(target_date)
         print(f"Rating更新処理が完了しました。更新件数: {updated_count}件")
         logger.info(f"Rating更新処理が完了しました。更新件数: {updated_count}件")
         
@@ -324,6 +274,9 @@ def run(*args):
         if google_books_quota_exceeded:
             logger.warning(f"Google Books APIクォータ制限により{skipped_due_to_quota}件がスキップされました")
         
+        # レーティングと表紙画像・概要の更新がすべて終わってから世代を進め、静的ファイルを出力する
+        publish_ratings()
+        
         # 明示的に戻り値を指定しない（Noneを返す）
     except Exception as e:
         print(f"ERROR: {e}")
@@ -1,10 +1,137 @@
+from functools import lru_cache
+from django.db import transaction
+from django.utils import timezone
 from manga.models import Manga
+from manga.normalization import normalize_title_key
 import unicodedata
 
-def get_or_create_manga(title, author, categories, cover_image=None, description=None, rating=0, first_book_title=None):
+
+@lru_cache(maxsize=8192)
+def normalize_title(title):
+    """
+    タイトルを全角に正規化する（NFKC）
+    同じタイトルがカテゴリ・ストアをまたいで何度も現れるため結果をキャッシュします
+    """
+    return unicodedata.normalize('NFKC', title)
+
+
+class MangaIdentityMap:
+    """
+    スクレイピング実行単位で共有する 正規化タイトルキー → マンガID の対応表
+    キーは Manga.normalized_title と同じ normalize_title_key() の値です
+
+    同一プロセス内のすべてのスクレイパーで共有し、各タイトルのDB検索は
+    1回の実行につき最大1回になるようにします。
+    """
+
+    # preload時にIN句へ渡すタイトル数の上限
+    PRELOAD_BATCH_SIZE = 500
+
+    def __init__(self):
+        self._ids = {}
+        self._missing = set()
+        # 実行中のトランザクションで作成し、まだコミットされていないマンガ
+        self._pending = {}
+
+    def clear(self):
+        """対応表をクリアする（スクレイピング実行の開始時に呼び出す）"""
+        self._ids.clear()
+        self._missing.clear()
+        self._pending.clear()
+
+    def preload(self, titles):
+        """
+        候補タイトルをまとめてDBから読み込む
+
+        Args:
+            titles (iterable): 正規化前のタイトル
+        """
+        pending = {
+            normalize_title_key(title) for title in titles
+            if isinstance(title, str) and title.strip()
+        }
+        pending -= self._ids.keys()
+        pending -= self._missing
+        if not pending:
+            return
+
+        pending = list(pending)
+        for start in range(0, len(pending), self.PRELOAD_BATCH_SIZE):
+            batch = pending[start:start + self.PRELOAD_BATCH_SIZE]
+            found = dict(
+                Manga.objects.filter(normalized_title__in=batch).values_list('normalized_title', 'id')
+            )
+            self._ids.update(found)
+            self._missing.update(t for t in batch if t not in found)
+
+    def lookup(self, key):
+        """
+        正規化タイトルキーからマンガIDを取得する
+        未読込のタイトルのみDBを検索します
+
+        Returns:
+            int or None: マンガID（存在しない場合はNone）
+        """
+        if key in self._pending:
+            return self._pending[key]
+        if key in self._ids:
+            return self._ids[key]
+        if key in self._missing:
+            return None
+
+        manga_id = (
+            Manga.objects.filter(normalized_title=key)
+            .values_list('id', flat=True)
+            .first()
+        )
+        if manga_id is None:
+            self._missing.add(key)
+        else:
+            self._ids[key] = manga_id
+        return manga_id
+
+    def register(self, key, manga_id):
+        """
+        新規作成したマンガを登録する
+        同じトランザクション内の検索ではすぐに使えるようにし、対応表への反映はコミット後に行います
+        トランザクション（またはセーブポイント）をロールバックした場合は discard_pending() で取り消してください
+        """
+        self._pending[key] = manga_id
+
+        def _register():
+            if self._pending.get(key) != manga_id:
+                return
+            del self._pending[key]
+            self._ids[key] = manga_id
+            self._missing.discard(key)
+        transaction.on_commit(_register)
+
+    def discard_pending(self, keys=None):
+        """
+        コミットされていない登録を取り消す
+
+        Args:
+            keys (iterable, optional): 取り消す正規化タイトルキー（省略時はすべて）
+        """
+        if keys is None:
+            self._pending.clear()
+            return
+        for key in keys:
+            self._pending.pop(key, None)
+
+
+# プロセス内のすべてのスクレイパーで共有する対応表
+manga_identity_map = MangaIdentityMap()
+
+
+def get_or_create_manga_id(title, author, categories, cover_image=None, description=None, rating=0, first_book_title=None):
     """
-    タイトルでマンガを検索し、なければ新規作成する共通関数
+    タイトルでマンガを検索し、なければ新規作成してマンガIDを返す共通関数
     タイトルは全て全角に変換して検索・登録します
+    検索は manga_identity_map を経由するため、同じ実行内で同じタイトルを
+    繰り返し検索してもDBへの問い合わせは発生しません
+    新規作成は正規化タイトルの一意制約を使ったupsertで行うため、並列実行でも重複しません
+    マンガのインスタンスは読み込まないため、関連データの保存には manga_id を指定してください
     :param title: str
     :param author: str
     :param categories: list of Categoryインスタンス
@@ -12,42 +139,92 @@ def get_or_create_manga(title, author, categories, cover_image=None, description
     :param description: str or None
     :param rating: float
     :param first_book_title: str or None
-    :return: Mangaインスタンス, created(bool)
+    :return: マンガID（作成できない場合はNone）, created(bool)
     """
     # 追加バリデーション: 空やNone、空白のみ、または'不明'は作成しない
     if not title or title == "不明":
         return None, False
     if not isinstance(title, str) or not title.strip():
         return None, False
-    
+
     # タイトルを全角に変換
-    normalized_title = unicodedata.normalize('NFKC', title)
-    
+    normalized_title = normalize_title(title)
+    key = normalize_title_key(title)
+
     # タイトルで検索
-    existing_manga = Manga.objects.filter(title=normalized_title).first()
-    
-    if existing_manga:
-        # 既存のマンガが見つかった場合は、それを返す
-        if categories:
-            existing_manga.categories.add(*categories)
-        if first_book_title:
-            existing_manga.first_book_title = first_book_title
-            existing_manga.save()
-        return existing_manga, False
-    
-    # 既存のマンガがない場合のみ新規作成
-    # author のバリデーション
-    if not author or author == "不明" or not isinstance(author, str) or not author.strip():
-        return None, False
-        
-    manga = Manga.objects.create(
-        title=normalized_title,
-        author=author,
-        cover_image=cover_image or '',
-        description=description or '',
-        rating=rating,
-        first_book_title=first_book_title  # New field added
-    )
+    manga_id = manga_identity_map.lookup(key)
+    created = False
+
+    if manga_id is None:
+        # 既存のマンガがない場合のみ新規作成
+        # author のバリデーション
+        if not is_valid_author(author):
+            return None, False
+
+        # 一意制約付きの正規化タイトルでupsertするため、並列実行でも重複は作成されない
+        # （他のワーカーが同時に作成した場合も created は True になります）
+        manga_id = Manga.objects.upsert_by_normalized_title([{
+            'title': normalized_title,
+            'author': author,
+            'cover_image': cover_image,
+            'description': description,
+            'rating': rating,
+            'first_book_title': first_book_title,
+        }])[key]
+        manga_identity_map.register(key, manga_id)
+        created = True
+
     if categories:
-        manga.categories.set(categories)
-    return manga, True
+        # 既存の関連は一意制約で無視されるため、事前のSELECTなしで1回のINSERTで追加する
+        through = Manga.categories.through
+        through.objects.bulk_create(
+            [through(manga_id=manga_id, category_id=category.pk) for category in categories],
+            ignore_conflicts=True
+        )
+    if first_book_title and not created:
+        Manga.objects.filter(id=manga_id).exclude(first_book_title=first_book_title).update(
+            first_book_title=first_book_title,
+            updated_at=timezone.now()
+        )
+    return manga_id, created
+
+
+def is_valid_author(author):
+    """新規作成に使える著者名かどうか"""
+    return bool(author) and isinstance(author, str) and author != "不明" and bool(author.strip())
+
+
+def bulk_create_missing_mangas(manga_data_list):
+    """
+    スクレイピング結果のうち未登録のマンガを1回のupsertでまとめて作成する
+    事前に manga_identity_map.preload() でタイトルを読み込んでおく必要があります
+    作成したマンガを参照するデータと同じトランザクション内で呼び出してください（BaseStoreScraper._save_data()）
+
+    Args:
+        manga_data_list (list): BaseStoreScraper._save_data() に渡されるマンガデータのリスト
+
+    Returns:
+        dict: 正規化タイトル → この呼び出しで新規作成したマンガID
+        （他のワーカーが同時に作成したマンガは対応表に登録しますが、戻り値には含めません）
+    """
+    rows = []
+    for manga_data in manga_data_list:
+        title = manga_data.get('title')
+        if not title or title == "不明" or not isinstance(title, str) or not title.strip():
+            continue
+        if not is_valid_author(manga_data.get('author')):
+            continue
+        if manga_identity_map.lookup(normalize_title_key(title)) is not None:
+            continue
+        rows.append({
+            'title': normalize_title(title),
+            'author': manga_data['author'],
+            'first_book_title': manga_data.get('first_book_title'),
+        })
+    if not rows:
+        return {}
+
+    ids, created = Manga.objects.upsert_by_normalized_title(rows, return_created=True)
+    for key, manga_id in ids.items():
+        manga_identity_map.register(key, manga_id)
+    return {key: ids[key] for key in created}